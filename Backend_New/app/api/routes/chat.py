@@ -4,20 +4,32 @@ Chat API Routes
 Streaming chat endpoint with LangGraph agent, cache, and context
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, AsyncGenerator
-import json
+import time
 import uuid
+import asyncio
+import weakref
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
 from app.core.config import settings
 from app.services.session_manager import session_manager
 from app.services.cache_service import query_cache
+from app.services.negative_cache import negative_cache
+from app.services.single_flight import single_flight
+from app.services.sse import Event, Status, CacheHit, Query, Chunk, Done, Error, sse_frames, unnumbered
+from app.services.stream_replay import stream_replay
+from app.services.job_queue import job_queue, JobRejected
+from app.services.graph_runner import stream_graph
+from app.services.admission import admission, AdmissionRejected, AdmissionTimeout
+from app.services.llm_gateway import request_deadline
 from app.services.context_manager import context_manager
+from app.services.template_store import template_store
+from app.services.tracing import tracer
+from app.services.metrics import STREAM_RESUMES, VALIDATION_RETRIES
 
-from app.core.router import determine_database, get_agent_for_database, get_answer_generator
+from app.core.router import REGISTERED_DOMAINS, adetermine_database, get_agent_for_database, get_answer_generator
 from app.core.auth import require_admin
 
 router = APIRouter(dependencies=[Depends(require_admin)])
@@ -26,12 +38,103 @@ class ChatRequest(BaseModel):
     question: str
     session_id: Optional[str] = None
 
-async def stream_agent_response(question: str, session_id: str) -> AsyncGenerator[str, None]:
+# Domains probed speculatively in the cache while the router is in flight
+DOMAIN_NAMES = [meta["name"] for meta, _ in REGISTERED_DOMAINS]
+
+async def _timed(span_name: str, func, *args, **attributes):
+    """Await func(*args) inside a trace span and return (result, elapsed_ms)"""
+    started = time.perf_counter()
+    with tracer.span(span_name, **attributes):
+        result = await func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+async def _probe_cache(question: str, db_name: str):
+    """Cache probe for one domain (embedding and search run in the vector executor)"""
+    candidate = await query_cache.aprobe(question, db_name)
+    tracer.set_attribute("cache.similarity", round(candidate["similarity"], 4) if candidate else 0.0)
+    return candidate
+
+def _start_speculation(question: str):
+    """Fan out routing and per-domain cache probes concurrently"""
+    route_task = asyncio.create_task(_timed("route", adetermine_database, question))
+    probe_tasks = {
+        name: asyncio.create_task(_timed("cache_lookup", _probe_cache, question, name, **{"cache.domain": name}))
+        for name in DOMAIN_NAMES
+    }
+    return route_task, probe_tasks
+
+def _cancel_tasks(*tasks):
+    for task in tasks:
+        if task and not task.done():
+            task.cancel()
+
+def _match_template(question: str):
+    """Template lookup (runs in a worker thread, inside its span)"""
+    match = template_store.match(question)
+    tracer.set_attribute("template.matched", match is not None)
+    if match:
+        tracer.set_attribute("template.id", match["template_id"])
+        tracer.set_attribute("template.similarity", match["similarity"])
+    return match
+
+def _confident_probe(probe_tasks) -> Optional[str]:
+    """Domain whose finished probe is confident enough to skip routing (single clear winner only)"""
+    confident = []
+    for name, task in probe_tasks.items():
+        candidate, _ = task.result()
+        if query_cache.is_hit(candidate) and candidate["similarity"] >= settings.CACHE_SHORTCIRCUIT_THRESHOLD:
+            confident.append(name)
+    return confident[0] if len(confident) == 1 else None
+
+async def _resolve_route(route_task, probe_tasks):
+    """
+    Wait for the first decisive result: the router's answer, or - if every
+    cache probe finishes first - a single confident cache hit.
+    Returns (db_name, reasoning, clarification, route_ms or None).
+    """
+    pending = {route_task, *probe_tasks.values()}
+    while not route_task.done():
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if route_task in done:
+            break
+        if all(task.done() for task in probe_tasks.values()):
+            winner = _confident_probe(probe_tasks)
+            if winner:
+                _cancel_tasks(route_task)
+                return winner, "Confident cache match - routing skipped.", "", None
+            await asyncio.wait({route_task})
+    
+    (db_name, reasoning, clarification_question), route_ms = route_task.result()
+    return db_name, reasoning, clarification_question, route_ms
+
+async def _answer_from_rows(question: str, db_name: str, session_id: str, sql: str, result) -> AsyncGenerator[Event, None]:
+    """Stream the answer for rows of an already-known SQL (negative-cache re-run)"""
+    total_count = len(result)
+    display_result = result if result else "[]  (No matching records found)"
+    if total_count > 15:
+        display_result = result[:15]
+        yield Status(f'📊 Showing 15/{total_count:,} rows...')
+    
+    yield Status('💬 Generating answer...')
+    async for chunk in get_answer_generator(db_name)(question, str(display_result), sql):
+        yield Chunk(chunk)
+    
+    context_manager.extract_and_store(session_id, question, sql)
+    yield Done()
+
+async def stream_agent_response(question: str, session_id: str) -> AsyncGenerator[Event, None]:
     """Stream agent responses with cache and context"""
 
+    # A template match answers without any LLM but the answer generator, so
+    # routing + cache probes only start speculatively when there is none
+    history_task = asyncio.create_task(_timed("history", asyncio.to_thread, session_manager.get_session_messages, session_id))
+    template, template_ms = await _timed("template_match", asyncio.to_thread, _match_template, question)
+    route_task, probe_tasks = (None, {}) if template else _start_speculation(question)
+
     # 0. Context Fusion (Handle Clarification Replies)
     try:
-        messages = session_manager.get_session_messages(session_id)
+        messages, history_ms = await history_task
+        yield Status('📚 Session history loaded', stage='history', elapsed_ms=round(history_ms, 1))
         # Structure: [..., User_Org, Bot_Ask, User_Current (Added in Line 312)]
         if len(messages) >= 3:
             last_bot_msg = messages[-2]['content']
@@ -47,47 +150,128 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
                 question = f"{original_user_msg} (Context: {question})"
                 print(f"[CONTEXT FUSION] Fused Query: {question}")
                 
-                yield f"data: {json.dumps({'type': 'status', 'message': '🔗 Connecting context...'})}\n\n"
+                # Template and speculation were for the unfused question - restart
+                _cancel_tasks(route_task, *probe_tasks.values())
+                template = None
+                route_task, probe_tasks = _start_speculation(question)
+                
+                yield Status('🔗 Connecting context...')
     except Exception as e:
         print(f"[CONTEXT FUSION ERROR] {e}")
 
-    # 1. Determine Target Database (Router)
-    db_name, reasoning, clarification_question = determine_database(question)
+    # 0b. Parameterised SQL template (skips router, generator and validator)
+    if template:
+        db_name = template["domain"]
+        yield Status(f"🧩 Matched template {template['template_id']}", stage='template', elapsed_ms=round(template_ms, 1))
+        yield Query(template['sql'])
+        
+        from app.services.db_service import execute_query
+        try:
+            with tracer.span("run_query", **{"db.template_id": template["template_id"]}):
+                result = await asyncio.to_thread(execute_query, template['sql'])
+                tracer.set_attribute("db.rows", len(result))
+        except Exception as e:
+            print(f"[TEMPLATE ERROR] Template query failed: {e}")
+            template_store.report_failure(template["template_id"])
+            result = None
+            yield Status('🔄 Template failed, generating new query...')
+            route_task, probe_tasks = _start_speculation(question)
+        
+        if result is not None:
+            try:
+                total_count = len(result)
+                display_result = result if result else "[]  (No matching records found)"
+                if total_count > 15:
+                    display_result = result[:15]
+                    yield Status(f'📊 Showing 15/{total_count:,} rows...')
+                
+                yield Status('💬 Generating answer...')
+                answer_gen = get_answer_generator(db_name)(question, str(display_result), template['sql'])
+                async for chunk in answer_gen:
+                    yield Chunk(chunk)
+                
+                context_manager.extract_and_store(session_id, question, template['sql'])
+                yield Done()
+            except Exception as e:
+                yield Error(f'Error: {str(e)}')
+            return
+
+    # 1. Determine Target Database (Router, unless a confident cache hit decides first)
+    db_name, reasoning, clarification_question, route_ms = await _resolve_route(route_task, probe_tasks)
+    tracer.set_attribute("route.domain", db_name)
+    tracer.set_attribute("route.skipped", route_ms is None)
     
     # Show Router's Thinking
-    yield f"data: {json.dumps({'type': 'status', 'message': f'🧠 Router Logic: {reasoning}'})}\n\n"
+    route_timing = {'elapsed_ms': round(route_ms, 1)} if route_ms is not None else {'skipped': True}
+    yield Status(f'🧠 Router Logic: {reasoning}', stage='route', **route_timing)
     
     # Handle Ambiguity / Unsure Router
     if db_name == "AMBIGUOUS":
+        _cancel_tasks(*probe_tasks.values())
         print(f"[ROUTER] Ambiguous query. Asking user for clarification.")
-        yield f"data: {json.dumps({'type': 'status', 'message': '🤔 Query seems ambiguous...'})}\n\n"
-        yield f"data: {json.dumps({'type': 'status', 'message': '❓ Asking for clarification...'})}\n\n"
+        yield Status('🤔 Query seems ambiguous...')
+        yield Status('❓ Asking for clarification...')
         
         clarification_msg = clarification_question
         
         # Stream the clarification question
         for word in clarification_msg.split(" "):
-            yield f"data: {json.dumps({'type': 'chunk', 'content': word + ' '})}\n\n"
-            import asyncio
+            yield Chunk(word + ' ')
             await asyncio.sleep(0.01)
             
-        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        yield Done()
         return
 
     print(f"[ROUTER] Question routed to: '{db_name}' ({reasoning})")
     
-    yield f"data: {json.dumps({'type': 'status', 'message': f'🔀 Routing to {db_name} database...'})}\n\n"
+    yield Status(f'🔀 Routing to {db_name} database...')
 
+    # Context hints make the run session-specific. Otherwise identical questions
+    # share one run with any already in flight (single_flight.py)
+    context_hint = context_manager.build_context_hint(session_id, question)
+    if context_hint:
+        print(f"[CONTEXT] {context_hint[:100]}...")
+        async for event in _run_in_domain(question, session_id, db_name, probe_tasks, context_hint):
+            yield event
+        return
+    
+    key = single_flight.key(question, db_name)
+    coalesced = single_flight.in_flight(key)
+    tracer.set_attribute("request.coalesced", coalesced)
+    if coalesced:
+        _cancel_tasks(*probe_tasks.values())  # The running flight has its own probes
+    
+    last_sql, finished = None, False
+    run = lambda: _run_in_domain(question, session_id, db_name, probe_tasks, "")
+    async for event in single_flight.stream(key, run, db_name):
+        if coalesced:
+            last_sql = event.sql if isinstance(event, Query) else last_sql
+            finished = finished or isinstance(event, Done)
+        yield event
+    
+    if coalesced and finished and last_sql:
+        # The run stored follow-up context for the leader's session only
+        context_manager.extract_and_store(session_id, question, last_sql)
+
+async def _run_in_domain(question: str, session_id: str, db_name: str, probe_tasks, context_hint: str) -> AsyncGenerator[Event, None]:
+    """
+    Everything after routing: cache, negative cache, agent (generate, validate,
+    run) and the answer. Coalesced requests share one run, so its only
+    session-specific inputs are the leader's session_id and context_hint.
+    """
     try:
-        # Check cache first (scoped by DB)
-        yield f"data: {json.dumps({'type': 'status', 'message': '🔍 Checking cache...'})}\n\n"
+        # Cache result for the chosen domain (probe already ran alongside routing)
+        candidate, probe_ms = await probe_tasks[db_name]
+        _cancel_tasks(*probe_tasks.values())
+        yield Status('🔍 Checking cache...', stage='cache_lookup', elapsed_ms=round(probe_ms, 1))
         
-        cached = query_cache.find_similar_query(question, db_name=db_name)
+        cached = query_cache.record_lookup(question, candidate)
+        tracer.set_attribute("cache.hit", cached is not None)
         if cached:
             print(f"[CACHE HIT] Using cached SQL for '{question[:50]}...'")
-            yield f"data: {json.dumps({'type': 'cache_hit', 'value': True})}\n\n"
-            yield f"data: {json.dumps({'type': 'status', 'message': '⚡ Using cached query'})}\n\n"
-            yield f"data: {json.dumps({'type': 'query', 'content': cached['sql']})}\n\n"
+            yield CacheHit(True)
+            yield Status('⚡ Using cached query')
+            yield Query(cached['sql'])
             
             # Execute cached query directly (Using specific DB logic implied by router, but simplified for now)
             # CAUTION: We need to execute against the specific DB here too.
@@ -102,7 +286,9 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
             # Since we only have checklist now (global env), execute_query works.
             from app.services.db_service import execute_query
             try:
-                result = execute_query(cached['sql'])
+                with tracer.span("run_query", **{"db.cached_sql": True}):
+                    result = await asyncio.to_thread(execute_query, cached['sql'])
+                    tracer.set_attribute("db.rows", len(result))
                 
                 # Handle row sampling for large results
                 total_count = len(result) if result else 0
@@ -112,10 +298,10 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
                 if total_count > 15:
                     display_result = result[:15]
                     is_sample = True
-                    yield f"data: {json.dumps({'type': 'status', 'message': f'📊 Showing 15/{total_count:,} rows...'})}\n\n"
+                    yield Status(f'📊 Showing 15/{total_count:,} rows...')
                 
                 # Generate answer with cached result using DB-specific generator
-                yield f"data: {json.dumps({'type': 'status', 'message': '💬 Generating answer...'})}\n\n"
+                yield Status('💬 Generating answer...')
                 
                 # Dynamic Answer Streaming
                 # For now using the logic from router helper (blocking), but to keep streaming we might inline specific logic
@@ -127,27 +313,62 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
                 full_answer = ""
                 async for chunk in answer_gen:
                     full_answer += chunk
-                    yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
+                    yield Chunk(chunk)
                 
                 # Store context
                 context_manager.extract_and_store(session_id, question, cached['sql'])
                 
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                yield Done()
                 return
             except Exception as e:
                 print(f"[CACHE ERROR] Cached query failed: {e}")
-                query_cache.invalidate(question, db_name=db_name)
-                yield f"data: {json.dumps({'type': 'status', 'message': '🔄 Cache failed, generating new query...'})}\n\n"
+                await query_cache.ainvalidate(question, db_name=db_name)
+                yield Status('🔄 Cache failed, generating new query...')
         else:
-            yield f"data: {json.dumps({'type': 'cache_hit', 'value': False})}\n\n"
+            yield CacheHit(False)
         
-        # Get context hints for follow-up queries
-        context_hint = context_manager.build_context_hint(session_id, question)
-        if context_hint:
-            print(f"[CONTEXT] {context_hint[:100]}...")
+        # Recently failing question: re-run its empty SQL, retry with the error, or stop
+        failure = negative_cache.lookup(question, db_name)
+        strategy = negative_cache.strategy(failure)
+        tracer.set_attribute("negative_cache.strategy", strategy or "none")
+        if strategy:
+            negative_cache.note(strategy, db_name)
+        
+        if strategy == "short_circuit":
+            print(f"[NEGATIVE CACHE] {failure['count']} recent failures, not retrying: '{question[:50]}...'")
+            yield Error(negative_cache.message(failure))
+            return
+        
+        if strategy == "reuse_sql":
+            yield Status('♻️ This returned no rows a moment ago - re-running the same query...')
+            yield Query(failure['sql'])
+            from app.services.db_service import execute_query
+            try:
+                with tracer.span("run_query", **{"db.negative_cache": True}):
+                    result = await asyncio.to_thread(execute_query, failure['sql'])
+                    tracer.set_attribute("db.rows", len(result))
+            except Exception as e:
+                print(f"[NEGATIVE CACHE] Stored query failed: {e}")
+                negative_cache.clear(question, db_name)
+                failure, result = None, None
+            
+            if result is not None:
+                if result:
+                    # Rows arrived since: a normal success from here on
+                    negative_cache.clear(question, db_name)
+                    await query_cache.acache_query(question, failure['sql'], db_name=db_name)
+                else:
+                    negative_cache.record(question, db_name, "empty", sql=failure['sql'])
+                async for event in _answer_from_rows(question, db_name, session_id, failure['sql'], result):
+                    yield event
+                return
+        
+        failure_hint = negative_cache.hint(failure) if strategy == "retry_hint" else ""
+        if failure_hint:
+            yield Status('🩹 This question failed recently - regenerating with the error in mind...')
         
         # Send initial status
-        yield f"data: {json.dumps({'type': 'status', 'message': f'🔄 Analyzing {db_name} schema...'})}\n\n"
+        yield Status(f'🔄 Analyzing {db_name} schema...')
         
         print(f"[DEBUG] Starting agent for question: {question[:50]}...")
         print(f"[DEBUG] Session ID: {session_id}")
@@ -167,11 +388,15 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
         agent_input_message = question
         if context_hint:
              agent_input_message = f"{context_hint}\n\nUser Question: {question}"
+        if failure_hint:
+            agent_input_message = f"{failure_hint}\n\n{agent_input_message}"
 
         # DYNAMIC AGENT RETRIEVAL
         target_agent = get_agent_for_database(db_name)
 
-        for event in target_agent.stream(
+        # Nodes run on a graph thread; the loop keeps serving other requests
+        async for event in stream_graph(
+            target_agent,
             {"messages": [HumanMessage(content=agent_input_message)]},
             config,
             stream_mode="updates"
@@ -184,16 +409,16 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
                 
                 # Send progress updates
                 if node_name == "list_tables":
-                    yield f"data: {json.dumps({'type': 'status', 'message': '📊 Loading tables...'})}\n\n"
+                    yield Status('📊 Loading tables...')
                 
                 elif node_name == "call_get_schema":
-                    yield f"data: {json.dumps({'type': 'status', 'message': '🔍 Fetching schema...'})}\n\n"
+                    yield Status('🔍 Fetching schema...')
                 
                 elif node_name == "store_schema":
-                    yield f"data: {json.dumps({'type': 'status', 'message': '💾 Storing schema context...'})}\n\n"
+                    yield Status('💾 Storing schema context...')
                 
                 elif node_name == "generate_query":
-                    yield f"data: {json.dumps({'type': 'status', 'message': '🤖 LLM 1: Generating query...'})}\n\n"
+                    yield Status('🤖 LLM 1: Generating query...')
                     
                     # Check if query was generated and capture it
                     if "messages" in node_state and node_state["messages"]:
@@ -210,23 +435,24 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
                         if generated_sql:
                             print(f"[DEBUG] Generated query: {generated_sql[:100]}...")
                             # Show generated query
-                            yield f"data: {json.dumps({'type': 'query', 'content': generated_sql})}\n\n"
+                            yield Query(generated_sql)
                 
                 elif node_name == "validate_query":
-                    yield f"data: {json.dumps({'type': 'status', 'message': '🔍 LLM 2: Validating query...'})}\n\n"
+                    yield Status('🔍 LLM 2: Validating query...')
                     
                     # Check validation result
                     if "last_feedback" in node_state:
                         feedback = node_state.get("last_feedback", "")
                         if feedback:
                             print(f"[DEBUG] Validation feedback: {feedback[:100]}...")
-                            yield f"data: {json.dumps({'type': 'status', 'message': '❌ Validation failed - regenerating...'})}\n\n"
+                            VALIDATION_RETRIES.inc(domain=db_name)
+                            yield Status('❌ Validation failed - regenerating...')
                         else:
-                            yield f"data: {json.dumps({'type': 'status', 'message': '✅ Query approved!'})}\n\n"
+                            yield Status('✅ Query approved!')
                 
                 elif node_name == "run_query":
-                    yield f"data: {json.dumps({'type': 'status', 'message': '🔒 Security check...'})}\n\n"
-                    yield f"data: {json.dumps({'type': 'status', 'message': '⚡ Executing query...'})}\n\n"
+                    yield Status('🔒 Security check...')
+                    yield Status('⚡ Executing query...')
                     
                     # Capture raw result
                     print(f"[DEBUG] run_query node_state keys: {list(node_state.keys())}")
@@ -248,7 +474,7 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
                                 display_result = result_list[:15]
                                 final_result = str(display_result)
                                 is_sample = True
-                                yield f"data: {json.dumps({'type': 'status', 'message': f'📊 Showing 15/{total_count:,} rows...'})}\n\n"
+                                yield Status(f'📊 Showing 15/{total_count:,} rows...')
                         except:
                             pass  # Keep raw result if parsing fails
                     else:
@@ -267,7 +493,8 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
             
             if is_error:
                 print(f"[ERROR] Query execution failed: {final_result[:200]}...")
-                yield f"data: {json.dumps({'type': 'error', 'message': 'Query execution failed. Please try rephrasing your question.'})}\n\n"
+                negative_cache.record(question, db_name, "sql_error", final_result, generated_sql)
+                yield Error('Query execution failed. Please try rephrasing your question.')
                 # DON'T cache failed queries!
                 return
             
@@ -286,11 +513,13 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
             
             if is_empty_result:
                 print(f"[DEBUG] Query returned empty results — generating friendly response...")
+                if generated_sql:
+                    negative_cache.record(question, db_name, "empty", sql=generated_sql)
                 # Pass empty result to the answer generator for a user-friendly message
                 final_result = "[]  (No matching records found)"
             
             print(f"[DEBUG] Generating natural language answer with streaming...")
-            yield f"data: {json.dumps({'type': 'status', 'message': '💬 Generating answer...'})}\n\n"
+            yield Status('💬 Generating answer...')
             
             # Use Dynamic Answer Generator (Real Streaming)
             answer_func = get_answer_generator(db_name)
@@ -300,84 +529,166 @@ async def stream_agent_response(question: str, session_id: str) -> AsyncGenerato
             full_answer = ""
             async for chunk in answer_gen:
                 full_answer += chunk
-                yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
+                yield Chunk(chunk)
             
             # Cache ONLY successful queries (Scoped)
             
             # Cache ONLY successful, non-empty queries (Scoped)
             if generated_sql and not is_empty_result:
-                query_cache.cache_query(question, generated_sql, db_name=db_name)
+                if failure:
+                    negative_cache.clear(question, db_name)
+                await query_cache.acache_query(question, generated_sql, db_name=db_name)
+                template_store.harvest(question, generated_sql, db_name)
             
             # Store context for follow-ups
             if generated_sql:
                 context_manager.extract_and_store(session_id, question, generated_sql)
         else:
             print(f"[DEBUG] ERROR: No result captured from agent graph!")
-            yield f"data: {json.dumps({'type': 'error', 'message': 'The system could not process your query. Please try rephrasing your question.'})}\n\n"
+            negative_cache.record(question, db_name, "no_result", "No result captured from the agent graph", generated_sql)
+            yield Error('The system could not process your query. Please try rephrasing your question.')
         
         # Send completion
-        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        yield Done()
         
     except Exception as e:
+        negative_cache.record(question, db_name, "exception", str(e))
         error_msg = f"Error: {str(e)}"
-        yield f"data: {json.dumps({'type': 'error', 'message': error_msg})}\n\n"
+        yield Error(error_msg)
+
+def _open_session(session_id: Optional[str], question: str) -> str:
+    """Create the session on first use and store the user's message"""
+    session_id = session_id or str(uuid.uuid4())
+    
+    # Check if session exists
+    sessions = session_manager.get_sessions()
+    session_exists = any(s["session_id"] == session_id for s in sessions)
+    
+    if not session_exists:
+        # Auto-create session with first message as title
+        title = question[:50] + "..." if len(question) > 50 else question
+        session_manager.create_session(session_id, title)
+    
+    # Store user message
+    session_manager.add_message(session_id, "user", question)
+    return session_id
+
+async def _answer_and_store(question: str, session_id: str) -> AsyncGenerator[Event, None]:
+    """The pipeline's events; the streamed answer is saved to the session at the end"""
+    full_response = []
+    async for event in stream_agent_response(question, session_id):
+        yield event
+        
+        # Collect full response for storage
+        if isinstance(event, Chunk):
+            full_response.append(event.content)
+    
+    # Store bot response
+    if full_response:
+        bot_message = "".join(full_response)
+        session_manager.add_message(session_id, "assistant", bot_message)
 
 @router.post("/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, user: dict = Depends(require_admin)):
     """
     Stream chat responses with LangGraph agent
     
+    Requests beyond the admission limits wait in a queue (position sent as
+    'admission' status events) or, when the queue is full, get a 429.
+    
     Response format (SSE):
-    - type: 'status' -> Progress updates
+    - type: 'status' -> Progress updates (front stages carry 'stage' + 'elapsed_ms')
     - type: 'cache_hit' -> Cache hit/miss indicator
     - type: 'query' -> Generated SQL query
     - type: 'chunk' -> Answer content (word by word)
     - type: 'done' -> Completion signal
     - type: 'error' -> Error message
-    """
-    
-    # Get or create session
-    session_id = request.session_id or str(uuid.uuid4())
     
-    # Check if session exists
-    sessions = session_manager.get_sessions()
-    session_exists = any(s["session_id"] == session_id for s in sessions)
+    Events carry SSE ids; after a dropped connection GET /chat/stream/{X-Request-ID}
+    with Last-Event-ID returns the missed events (the pipeline keeps running).
+    """
     
-    if not session_exists:
-        # Auto-create session with first message as title
-        title = request.question[:50] + "..." if len(request.question) > 50 else request.question
-        session_manager.create_session(session_id, title)
+    # Take a place in line before doing any work
+    owner = user.get("user_id") or user.get("email")
+    try:
+        ticket = admission.enqueue(owner)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     
-    # Store user message
-    session_manager.add_message(session_id, "user", request.question)
+    # Get or create session
+    session_id = _open_session(request.session_id, request.question)
+    request_id = uuid.uuid4().hex
     
     # Stream response
     async def generate():
-        full_response = []
-        
-        async for chunk in stream_agent_response(request.question, session_id):
-            yield chunk
-            
-            # Collect full response for storage
-            try:
-                data = json.loads(chunk.split("data: ")[1])
-                if data.get("type") == "chunk":
-                    full_response.append(data["content"])
-            except:
-                pass
+        try:
+            with tracer.start_trace(request_id, **{"session.id": session_id, "question.length": len(request.question)}):
+                # Wait for a free slot, reporting the queue position as it changes
+                admitted = True
+                with tracer.span("admission"):
+                    try:
+                        async for position in admission.wait(ticket):
+                            yield Status(f'⏳ Queued: position {position}', stage='admission', position=position)
+                    except AdmissionTimeout as e:
+                        admitted = False
+                        tracer.set_attribute("admission.timeout", True)
+                        yield Error(f'Server busy: {e}. Please try again.')
+                
+                if admitted:
+                    # The LLM budget starts once the request is admitted
+                    with request_deadline(settings.LLM_REQUEST_BUDGET_SECONDS):
+                        async for event in _answer_and_store(request.question, session_id):
+                            yield event
+        finally:
+            admission.release(ticket)
         
-        # Store bot response
-        if full_response:
-            bot_message = "".join(full_response)
-            session_manager.add_message(session_id, "assistant", bot_message)
+        await asyncio.to_thread(tracer.finish_trace, request_id)
+    
+    if stream_replay.enabled:
+        # Runs detached from this connection, which is just its first subscriber
+        stream_replay.start(request_id, generate, owner=owner)
+        frames = sse_frames(stream_replay.subscribe(request_id))
+    else:
+        stream = generate()
+        # A client gone before the stream starts never runs generate()'s finally
+        weakref.finalize(stream, admission.release, ticket)
+        frames = sse_frames(unnumbered(stream))
     
     return StreamingResponse(
-        generate(),
+        frames,
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
-            "X-Session-ID": session_id
+            "X-Session-ID": session_id,
+            "X-Request-ID": request_id
+        }
+    )
+
+@router.get("/stream/{request_id}")
+async def resume_stream(request_id: str, last_event_id: Optional[str] = Header(None), user: dict = Depends(require_admin)):
+    """
+    Resume a dropped /chat/stream response: the events after Last-Event-ID
+    (all of them without the header), then the live ones until 'done'.
+    Available until STREAM_RESUME_TTL_SECONDS after the request finished.
+    """
+    try:
+        after = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid Last-Event-ID '{last_event_id}'")
+    
+    stream = stream_replay.get(request_id)
+    if stream is None or stream.owner != (user.get("user_id") or user.get("email")):
+        STREAM_RESUMES.inc(outcome="expired" if stream is None else "forbidden")
+        raise HTTPException(status_code=404, detail=f"No resumable stream '{request_id}' (finished too long ago or unknown)")
+    
+    return StreamingResponse(
+        sse_frames(stream_replay.subscribe(request_id, after=after, resumed=True)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Request-ID": request_id
         }
     )
 
@@ -391,9 +702,133 @@ async def get_cache_stats():
         "cache_misses": stats.get("cache_misses", 0),
         "hit_rate": stats.get("hit_rate", 0.0),
         "similarity_threshold": stats.get("threshold", 0.85),
-        "enabled": stats.get("enabled", False)
+        "threshold_by_domain": stats.get("threshold_by_domain"),
+        "enabled": stats.get("enabled", False),
+        "backend": stats.get("backend"),
+        "max_entries": stats.get("max_entries"),
+        "eviction_policy": stats.get("eviction_policy"),
+        "lifetime": stats.get("lifetime"),
+        "last_compaction": stats.get("last_compaction"),
+        "embeddings": stats.get("embeddings"),
+        "negative_cache": negative_cache.get_stats(),
+        "coalescing": single_flight.get_stats()
     }
 
+@router.post("/cache/compact")
+async def compact_cache():
+    """Write back hit counts, expire and evict cache entries now"""
+    summary = await asyncio.to_thread(query_cache.compact)
+    if summary is None:
+        return {"status": "skipped", "message": "Cache disabled or compaction already running"}
+    return {"status": "success", **summary}
+
+@router.get("/templates")
+async def list_templates():
+    """List SQL templates (built-in + promoted), harvested candidates and match stats"""
+    return {**template_store.list_templates(), "stats": template_store.get_stats()}
+
+@router.post("/templates/{template_id}/promote")
+async def promote_template(template_id: str):
+    """Promote a harvested candidate to a live template"""
+    if not template_store.promote(template_id):
+        raise HTTPException(status_code=404, detail=f"No template candidate '{template_id}'")
+    return {"status": "success", "message": f"Template {template_id} promoted"}
+
+@router.delete("/templates/{template_id}")
+async def delete_template(template_id: str):
+    """Remove a promoted template or a harvested candidate"""
+    if not template_store.delete(template_id):
+        raise HTTPException(status_code=404, detail=f"No promoted template or candidate '{template_id}'")
+    return {"status": "success", "message": f"Template {template_id} deleted"}
+
+@router.post("/jobs", status_code=202)
+async def submit_job(request: ChatRequest, user: dict = Depends(require_admin)):
+    """
+    Queue a long-running question as a background job and return its id.
+    Poll GET /chat/jobs/{job_id} or subscribe to GET /chat/jobs/{job_id}/events.
+    """
+    if not job_queue.enabled:
+        raise HTTPException(status_code=404, detail="Background jobs are disabled")
+    
+    owner = user.get("user_id") or user.get("email")
+    job_id = uuid.uuid4().hex
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    async def run():
+        with tracer.start_trace(job_id, **{"session.id": session_id, "question.length": len(request.question), "job": True}):
+            # Jobs skip admission (the job pool bounds them) and get a longer LLM budget
+            with request_deadline(settings.JOB_LLM_BUDGET_SECONDS):
+                async for event in _answer_and_store(request.question, session_id):
+                    yield event
+        await asyncio.to_thread(tracer.finish_trace, job_id)
+    
+    try:
+        job = job_queue.submit(job_id, request.question, session_id, owner, run)
+    except JobRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    _open_session(session_id, request.question)
+    return {k: v for k, v in job.items() if k != "events"}
+
+@router.get("/jobs")
+async def list_jobs(user: dict = Depends(require_admin)):
+    """The user's retained background jobs, newest first (without their events)"""
+    return {"jobs": job_queue.list_jobs(user.get("user_id") or user.get("email"))}
+
+def _owned_job(job_id: str, user: dict) -> dict:
+    job = job_queue.get(job_id)
+    if job is None or job["owner"] != str(user.get("user_id") or user.get("email")):
+        raise HTTPException(status_code=404, detail=f"No job '{job_id}' (expired or unknown)")
+    return job
+
+@router.get("/jobs/stats")
+async def get_job_stats():
+    """Get background job pool state for this worker (queued, running, outcomes)"""
+    return job_queue.get_stats()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, user: dict = Depends(require_admin)):
+    """Job status, progress events, SQL and answer (position while queued on this worker)"""
+    job = _owned_job(job_id, user)
+    return {**job, "position": job_queue.position(job_id)}
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, last_event_id: Optional[str] = Header(None), user: dict = Depends(require_admin)):
+    """
+    Subscribe to a job: its events after Last-Event-ID as SSE, then the live
+    ones until it finishes. Same event format as /chat/stream.
+    """
+    try:
+        after = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid Last-Event-ID '{last_event_id}'")
+    _owned_job(job_id, user)
+    
+    return StreamingResponse(
+        sse_frames(job_queue.follow(job_id, after=after)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Job-ID": job_id
+        }
+    )
+
+@router.get("/streams/stats")
+async def get_stream_stats():
+    """Get resumable stream state for this worker (running, detached, retained, resumes)"""
+    return stream_replay.get_stats()
+
+@router.get("/admission/stats")
+async def get_admission_stats():
+    """Get admission control state for this worker (in flight, queued, rejections)"""
+    return admission.get_stats()
+
+@router.get("/context/stats")
+async def get_context_stats():
+    """Get conversation context store statistics"""
+    return context_manager.get_stats()
+
 @router.post("/cache/clear")
 async def clear_cache():
     """Clear cache"""
@@ -412,7 +847,7 @@ async def invalidate_session_cache(session_id: str):
         invalidated = 0
         for msg in messages:
             if msg['role'] == 'user':
-                if query_cache.invalidate(msg['content']):
+                if await query_cache.ainvalidate(msg['content']):
                     invalidated += 1
         return {
             "status": "success",
@@ -0,0 +1,29 @@
+"""
+Debug Routes
+============
+Inspect recorded request traces and LLM client pools (admin only)
+"""
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Depends
+
+from app.services.tracing import tracer
+from app.services.llm_gateway import llm_gateway
+from app.services.model_tiering import model_tiering
+from app.core.auth import require_admin
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/traces/{request_id}")
+async def get_trace(request_id: str):
+    """Get the OTLP/JSON trace for a request (id from the X-Request-ID header)"""
+    trace = await asyncio.to_thread(tracer.get_trace, request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace '{request_id}' not found")
+    return trace
+
+@router.get("/llm")
+async def get_llm_stats():
+    """Per-model LLM client pools (connection reuse, slots, waits) and model tiers (cost, latency, escalations)"""
+    return {**llm_gateway.get_stats(), "tiering": model_tiering.get_stats()}
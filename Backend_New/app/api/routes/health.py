@@ -4,8 +4,11 @@ Health Check Routes
 """
 
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
 from datetime import datetime
 
+from app.services.metrics import metrics
+
 router = APIRouter()
 
 @router.get("/health")
@@ -21,3 +24,8 @@ async def health_check():
 async def ping():
     """Simple ping endpoint"""
     return {"ping": "pong"}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (aggregated across workers)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -45,7 +45,7 @@ async def delete_session(session_id: str):
         invalidated = 0
         for msg in messages:
             if msg['role'] == 'user':
-                if query_cache.invalidate(msg['content']):
+                if await query_cache.ainvalidate(msg['content']):
                     invalidated += 1
         
         session_manager.delete_session(session_id)
@@ -65,7 +65,7 @@ async def clear_session(session_id: str):
         invalidated = 0
         for msg in messages:
             if msg['role'] == 'user':
-                if query_cache.invalidate(msg['content']):
+                if await query_cache.ainvalidate(msg['content']):
                     invalidated += 1
         
         session_manager.clear_session(session_id)
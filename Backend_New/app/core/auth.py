@@ -9,8 +9,8 @@ import jwt
 import datetime
 from fastapi import Request, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy import create_engine, text
-from app.core.config import settings
+from sqlalchemy import text
+from app.core.database import get_engine
 
 # JWT Configuration
 JWT_SECRET = "sagar-tmt-db-assistant-secret-key-2026"
@@ -25,10 +25,8 @@ def authenticate_admin(email_or_username: str, password: str) -> dict:
     Authenticate against the users table in checklist DB.
     Only allows admin role AND specifically AAKASH AGRAWAL (id=835).
     """
-    engine = create_engine(settings.DB_CHECKLIST_URL)
-    
     try:
-        with engine.connect() as conn:
+        with get_engine().connect() as conn:
             result = conn.execute(
                 text("""
                     SELECT id, user_name, email_id, department, role
@@ -58,8 +56,6 @@ def authenticate_admin(email_or_username: str, password: str) -> dict:
     except Exception as e:
         print(f"[AUTH ERROR] {e}")
         return None
-    finally:
-        engine.dispose()
 
 
 def create_jwt_token(user_data: dict) -> str:
@@ -31,6 +31,52 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     LLM_MODEL: str = os.getenv("MODEL_NAME", "gpt-4o-mini")  # OpenAI GPT-4o-mini
     LLM_TEMPERATURE: float = 0.0
+    LLM_FAST_MODEL: str = os.getenv("LLM_FAST_MODEL", "gpt-4o-mini")  # Routing
+    
+    # LLM gateway: one pooled keep-alive HTTP client per model, shared by every
+    # call site. Requests above a model's concurrency limit wait for a slot
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    LLM_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_HTTP2: bool = os.getenv("LLM_HTTP2", "true").lower() == "true"  # Needs the h2 package
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))  # Per model and client (sync/async)
+    LLM_KEEPALIVE_SECONDS: float = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # Per model
+    LLM_MAX_CONCURRENCY_BY_MODEL: str = os.getenv("LLM_MAX_CONCURRENCY_BY_MODEL", "")  # e.g. "gpt-4o=8,gpt-4o-mini=32"
+    
+    # Tail latency: LLM calls of a chat request share LLM_REQUEST_BUDGET_SECONDS
+    # (0 = no deadline). Query generation/validation sends a hedged duplicate
+    # once an attempt is slower than the observed p95, and switches to
+    # LLM_FALLBACK_MODEL when less than LLM_FALLBACK_BELOW_SECONDS is left
+    LLM_REQUEST_BUDGET_SECONDS: float = float(os.getenv("LLM_REQUEST_BUDGET_SECONDS", "45"))
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # Before that, no hedging
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+    LLM_HEDGE_WORKERS: int = int(os.getenv("LLM_HEDGE_WORKERS", "16"))
+    LLM_LATENCY_WINDOW: int = int(os.getenv("LLM_LATENCY_WINDOW", "200"))  # Recent calls per model and stage
+    LLM_FALLBACK_MODEL: str = os.getenv("LLM_FALLBACK_MODEL", os.getenv("LLM_FAST_MODEL", "gpt-4o-mini"))
+    LLM_FALLBACK_BELOW_SECONDS: float = float(os.getenv("LLM_FALLBACK_BELOW_SECONDS", "10"))
+    
+    # Model tiering: SQL generation for simple questions uses LLM_FAST_MODEL
+    # (with only the matched tables of the schema when TIERING_SLIM_PROMPT);
+    # complex questions and validator rejections use LLM_STRONG_MODEL
+    MODEL_TIERING_ENABLED: bool = os.getenv("MODEL_TIERING_ENABLED", "true").lower() == "true"
+    LLM_STRONG_MODEL: str = os.getenv("LLM_STRONG_MODEL", os.getenv("MODEL_NAME", "gpt-4o-mini"))
+    TIERING_COMPLEXITY_THRESHOLD: int = int(os.getenv("TIERING_COMPLEXITY_THRESHOLD", "3"))
+    TIERING_SLIM_PROMPT: bool = os.getenv("TIERING_SLIM_PROMPT", "true").lower() == "true"
+    LLM_PRICES: str = os.getenv("LLM_PRICES", "")  # USD per 1M tokens, e.g. "gpt-4o=2.5/10,gpt-4o-mini=0.15/0.6"
+    
+    # SQL generation mode (HR): "fast" returns only the tool call (no intent
+    # analysis, output capped at SQL_FAST_MAX_TOKENS); "reasoning" keeps the
+    # analysis. Retries after a validator rejection always use reasoning
+    SQL_GENERATION_MODE: str = os.getenv("SQL_GENERATION_MODE", "fast").lower()
+    SQL_FAST_MAX_TOKENS: int = int(os.getenv("SQL_FAST_MAX_TOKENS", "512"))
+    
+    # SSE transport: answer chunks are coalesced and frames written together
+    # every SSE_FLUSH_MS (0 = one write per event) or at SSE_FLUSH_BYTES
+    SSE_FLUSH_MS: float = float(os.getenv("SSE_FLUSH_MS", "25"))
+    SSE_FLUSH_BYTES: int = int(os.getenv("SSE_FLUSH_BYTES", "4096"))
     
     # ────────────────────────────────────────────────────────
     # DATABASE CONNECTION (SINGLE DATABASE)
@@ -53,6 +99,13 @@ class Settings(BaseSettings):
         )
     )
     
+    # Connection Pool (ONE shared engine per process for all domains)
+    # Connections to the database = workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Recycle connections after 30 min
+
     # Legacy aliases (for backward compatibility - all point to same DB)
     @property
     def DB_CHECKLIST_URL(self) -> str:
@@ -100,7 +153,118 @@ class Settings(BaseSettings):
     METADATA_FILE: str = "metadata.json"
     
     # Session Settings
-    SESSION_DB_PATH: str = "chat_sessions.db"
+    SESSION_DB_PATH: str = os.getenv("SESSION_DB_PATH", "chat_sessions.db")
+
+    # Conversation Context (follow-up filters per session)
+    CONTEXT_MAX_SESSIONS: int = int(os.getenv("CONTEXT_MAX_SESSIONS", "1000"))
+    CONTEXT_MAX_BYTES: int = int(os.getenv("CONTEXT_MAX_BYTES", str(4 * 1024 * 1024)))
+    CONTEXT_TTL_SECONDS: int = int(os.getenv("CONTEXT_TTL_SECONDS", "7200"))  # Idle sessions expire after 2h
+    CONTEXT_HINTS_ENABLED: bool = os.getenv("CONTEXT_HINTS_ENABLED", "false").lower() == "true"
+    
+    # ────────────────────────────────────────────────────────
+    # SHARED STATE (Multi-Worker / Multi-Node Deployment)
+    # ────────────────────────────────────────────────────────
+    # memory: in-process (single worker)
+    # sql:    table in STATE_DATABASE_URL (SQLite for one node, PostgreSQL for many)
+    # redis:  Redis-compatible server at REDIS_URL
+    STATE_BACKEND: str = os.getenv("STATE_BACKEND", "memory")
+    STATE_DATABASE_URL: str = os.getenv("STATE_DATABASE_URL", "sqlite:///shared_state.db")
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    
+    # Query Cache
+    # Hit threshold on 1 / (1 + squared L2 distance), optionally per domain
+    # ("checklist=0.93,sagar_db=0.95"); pick values with benchmarks/cache_eval.py
+    CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("CACHE_SIMILARITY_THRESHOLD", "0.92"))
+    CACHE_THRESHOLD_BY_DOMAIN: str = os.getenv("CACHE_THRESHOLD_BY_DOMAIN", "")
+    # A cache probe at or above this similarity skips the router LLM entirely
+    CACHE_SHORTCIRCUIT_THRESHOLD: float = float(os.getenv("CACHE_SHORTCIRCUIT_THRESHOLD", "0.97"))
+    
+    # Query cache vector store: "chroma" (local persistent client, or a shared
+    # server at CHROMA_HOST) or "numpy" (memory-mapped files under VECTOR_STORE_PATH)
+    CACHE_VECTOR_BACKEND: str = os.getenv("CACHE_VECTOR_BACKEND", "chroma")
+    CHROMA_PERSIST_DIR: str = os.getenv("CHROMA_PERSIST_DIR", "./chroma_cache")
+    CHROMA_HOST: str = os.getenv("CHROMA_HOST", "")
+    CHROMA_PORT: int = int(os.getenv("CHROMA_PORT", "8001"))
+    VECTOR_STORE_PATH: str = os.getenv("VECTOR_STORE_PATH", "./vector_cache")
+    VECTOR_STORE_INT8: bool = os.getenv("VECTOR_STORE_INT8", "false").lower() == "true"  # 4x smaller rows
+    
+    # Query cache size: entries past their TTL are dropped and the least
+    # frequently (lfu) / recently (lru) used evicted above CACHE_MAX_ENTRIES
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+    CACHE_EVICTION_POLICY: str = os.getenv("CACHE_EVICTION_POLICY", "lfu")
+    CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", str(30 * 24 * 3600)))  # 0 = never expire
+    CACHE_TTL_BY_DOMAIN: str = os.getenv("CACHE_TTL_BY_DOMAIN", "")  # e.g. "sagar_db=604800,lead_to_order=86400"
+    CACHE_COMPACTION_INTERVAL_SECONDS: int = int(os.getenv("CACHE_COMPACTION_INTERVAL_SECONDS", "600"))
+    
+    # Admission control for /chat/stream (per worker): in-flight caps, globally
+    # and per user, with a bounded FIFO wait queue; beyond it requests get a 429
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16"))
+    ADMISSION_MAX_PER_USER: int = int(os.getenv("ADMISSION_MAX_PER_USER", "3"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "60"))
+    
+    # Identical concurrent questions (same normalized text, domain and day) share
+    # one pipeline run and its SSE stream
+    REQUEST_COALESCING_ENABLED: bool = os.getenv("REQUEST_COALESCING_ENABLED", "true").lower() == "true"
+    
+    # Resumable streams: the pipeline runs detached from the connection and its
+    # numbered events are kept so a client can reconnect with Last-Event-ID
+    STREAM_RESUME_ENABLED: bool = os.getenv("STREAM_RESUME_ENABLED", "true").lower() == "true"
+    STREAM_RESUME_TTL_SECONDS: int = int(os.getenv("STREAM_RESUME_TTL_SECONDS", "120"))
+    STREAM_RESUME_MAX_STREAMS: int = int(os.getenv("STREAM_RESUME_MAX_STREAMS", "500"))
+    
+    # Background jobs (POST /chat/jobs): a bounded worker pool per process, job
+    # records in the state store for JOB_RETENTION_SECONDS, polled or subscribed
+    JOBS_ENABLED: bool = os.getenv("JOBS_ENABLED", "true").lower() == "true"
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_MAX_QUEUED: int = int(os.getenv("JOB_MAX_QUEUED", "20"))
+    JOB_MAX_PER_USER: int = int(os.getenv("JOB_MAX_PER_USER", "3"))
+    JOB_LLM_BUDGET_SECONDS: float = float(os.getenv("JOB_LLM_BUDGET_SECONDS", "300"))
+    JOB_RETENTION_SECONDS: int = int(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+    JOB_HISTORY_PER_USER: int = int(os.getenv("JOB_HISTORY_PER_USER", "20"))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", "1"))
+    
+    # Domain graphs (sync LangGraph) run on this many threads, off the event loop;
+    # defaults to one per pipeline that can run at once
+    GRAPH_EXECUTOR_WORKERS: int = int(os.getenv("GRAPH_EXECUTOR_WORKERS", str(ADMISSION_MAX_IN_FLIGHT + JOB_WORKERS)))
+    
+    # Negative cache: questions whose SQL failed or returned no rows, kept for a
+    # short TTL after the last failure. A repeat re-runs the empty SQL, retries
+    # once with the error in the prompt, then gets a rephrase reply
+    NEGATIVE_CACHE_ENABLED: bool = os.getenv("NEGATIVE_CACHE_ENABLED", "true").lower() == "true"
+    NEGATIVE_CACHE_TTL_SECONDS: int = int(os.getenv("NEGATIVE_CACHE_TTL_SECONDS", "300"))
+    NEGATIVE_CACHE_MAX_FAILURES: int = int(os.getenv("NEGATIVE_CACHE_MAX_FAILURES", "2"))
+    
+    # Cache embeddings: computed in a dedicated pool (shared with vector search),
+    # concurrent requests within the window batched into one model call
+    VECTOR_EXECUTOR_WORKERS: int = int(os.getenv("VECTOR_EXECUTOR_WORKERS", "4"))
+    EMBEDDING_BATCH_WINDOW_MS: float = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "3"))
+    EMBEDDING_MAX_BATCH: int = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+    EMBEDDING_MEMO_SIZE: int = int(os.getenv("EMBEDDING_MEMO_SIZE", "2048"))  # Recent question strings
+    
+    # SQL templates: vetted parameterised SQL for frequent intents (no generator LLM)
+    TEMPLATES_ENABLED: bool = os.getenv("TEMPLATES_ENABLED", "true").lower() == "true"
+    TEMPLATE_MATCH_THRESHOLD: float = float(os.getenv("TEMPLATE_MATCH_THRESHOLD", "0.5"))
+    TEMPLATE_STORE_PATH: str = os.getenv("TEMPLATE_STORE_PATH", "sql_templates.json")  # Promoted templates
+    TEMPLATE_HARVEST_MIN_QUESTIONS: int = int(os.getenv("TEMPLATE_HARVEST_MIN_QUESTIONS", "3"))  # 0 = no auto-promote
+    TEMPLATE_GAZETTEER_TTL_SECONDS: int = int(os.getenv("TEMPLATE_GAZETTEER_TTL_SECONDS", "3600"))
+    TEMPLATE_GAZETTEER_MAX_VALUES: int = int(os.getenv("TEMPLATE_GAZETTEER_MAX_VALUES", "5000"))  # Per column
+    
+    # ────────────────────────────────────────────────────────
+    # OBSERVABILITY
+    # ────────────────────────────────────────────────────────
+    # Per-request spans, exported as OTLP/JSON lines (OTel Collector `otlpjsonfile` receiver)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    TRACE_EXPORT_PATH: str = os.getenv("TRACE_EXPORT_PATH", "traces/traces.jsonl")
+    TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", "500"))  # Recent traces kept in memory
+    TRACE_EXPORT_MAX_BYTES: int = int(os.getenv("TRACE_EXPORT_MAX_BYTES", "50000000"))  # Then rotated to <path>.1 (0 = never)
+    
+    # Prometheus /metrics. With several workers, point METRICS_MULTIPROC_DIR at a
+    # directory shared by all of them (emptied before start) to aggregate.
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_MULTIPROC_DIR: str = os.getenv("METRICS_MULTIPROC_DIR", "")
+    METRICS_FLUSH_SECONDS: float = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,67 @@
+"""
+Shared Database Engine
+======================
+One SQLAlchemy engine (and one connection pool) per process.
+
+ARCHITECTURE: Single Database, Multiple Domains
+================================================
+All domains query the SAME PostgreSQL database, so they all share this
+engine. Each domain layers its own RestrictedSQLDatabase view on top of it
+(ALLOWED_TABLES), which keeps domain isolation without opening a separate
+pool per domain. Pool sizing is controlled by the DB_POOL_* settings.
+"""
+
+import threading
+from typing import Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def _pool_options(url: str) -> dict:
+    """Pool arguments for the configured backend (SQLite uses its own pool classes)."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def get_engine() -> Engine:
+    """
+    Get the process-wide SQLAlchemy engine for DATABASE_URL.
+
+    Created lazily on first use and reused by every domain, the default
+    agent, direct query execution and authentication.
+    """
+    global _engine
+
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None:
+            url = settings.DATABASE_URL
+            if not url:
+                raise ValueError("DATABASE_URL is not set in configuration.")
+            _engine = create_engine(url, **_pool_options(url))
+    return _engine
+
+
+def dispose_engine() -> None:
+    """Close all pooled connections (called on application shutdown)."""
+    global _engine
+
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
@@ -15,9 +15,11 @@ Domains:
 - maintenance (sagar_db): machine repairs, maintenance tasks
 """
 
+import time
 from typing import Literal, Optional
-from langchain_openai import ChatOpenAI
 from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
+from app.services.tracing import tracer
 
 # Import the workflow apps from the domain modules
 from app.domains.hr_operations.workflow import workflow_app as checklist_app
@@ -29,11 +31,7 @@ from app.domains.hr_operations.workflow import workflow_app as checklist_app
 from langchain_core.messages import SystemMessage, HumanMessage
 
 # Initialize lightweight router LLM (cheap & fast model preferred)
-router_llm = ChatOpenAI(
-    model="gpt-4o-mini",  # Use fast model for routing
-    temperature=0,
-    openai_api_key=settings.OPENAI_API_KEY
-)
+router_llm = llm_gateway.chat(settings.LLM_FAST_MODEL)  # Use fast model for routing
 
 # Import Metadata & Schema for Dynamic Discovery (from domain configs)
 from app.domains.hr_operations.config import ROUTER_METADATA as HR_META, SEMANTIC_SCHEMA as HR_SCHEMA
@@ -100,6 +98,30 @@ Return a valid JSON object.
 }}
 """
 
+def _parse_router_response(content: str) -> tuple[str, str, str]:
+    """Parse the router LLM's JSON into (domain_name, reasoning, clarification_question)"""
+    content = content.strip()
+    
+    # Clean markdown if present
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0].strip()
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0].strip()
+        
+    import json
+    data = json.loads(content)
+    
+    domain_name = data.get("database", "AMBIGUOUS").lower()
+    reason = data.get("reason", "No reason provided.")
+    clarification_question = data.get("clarification_question", "Could you please clarify which domain you mean?")
+    
+    # Check against registered domain names
+    for meta, schema in REGISTERED_DOMAINS:
+        if meta["name"] in domain_name:
+            return meta["name"], reason, ""
+        
+    return "AMBIGUOUS", reason, clarification_question
+
 def determine_database(query: str) -> tuple[str, str, str]:
     """
     Analyzes the user query using LLM to determine target DOMAIN.
@@ -116,28 +138,27 @@ def determine_database(query: str) -> tuple[str, str, str]:
             SystemMessage(content=system_prompt),
             HumanMessage(content=query)
         ])
+        tracer.record_llm_usage(response)
         
-        content = response.content.strip()
-        
-        # Clean markdown if present
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0].strip()
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0].strip()
-            
-        import json
-        data = json.loads(content)
+        return _parse_router_response(response.content)
         
-        domain_name = data.get("database", "AMBIGUOUS").lower()
-        reason = data.get("reason", "No reason provided.")
-        clarification_question = data.get("clarification_question", "Could you please clarify which domain you mean?")
+    except Exception as e:
+        print(f"[ROUTER ERROR] Failed to route query: {e}")
+        return "checklist", "Router encountered an error, defaulting to HR Operations domain.", ""
+
+async def adetermine_database(query: str) -> tuple[str, str, str]:
+    """
+    Async variant of determine_database.
+    Cancelling the awaiting task aborts the in-flight router request.
+    """
+    try:
+        response = await router_llm.ainvoke([
+            SystemMessage(content=_build_router_prompt()),
+            HumanMessage(content=query)
+        ])
+        tracer.record_llm_usage(response)
         
-        # Check against registered domain names
-        for meta, schema in REGISTERED_DOMAINS:
-            if meta["name"] in domain_name:
-                return meta["name"], reason, ""
-            
-        return "AMBIGUOUS", reason, clarification_question
+        return _parse_router_response(response.content)
         
     except Exception as e:
         print(f"[ROUTER ERROR] Failed to route query: {e}")
@@ -169,12 +190,8 @@ def get_agent_for_database(db_name: str = "checklist"):
 # HELPER FOR STREAMING RESPONSES (GENERIC)
 # ============================================================================
 
-# Initialize a dedicated LLM to avoid import loops
-answer_llm = ChatOpenAI(
-    model=settings.LLM_MODEL,
-    temperature=0,
-    openai_api_key=settings.OPENAI_API_KEY
-)
+# Streaming LLM for answers (token counts on the final chunk, for tracing)
+answer_llm = llm_gateway.chat(settings.LLM_MODEL, stream_usage=True)
 
 def create_answer_generator(system_prompt: str):
     """
@@ -190,11 +207,16 @@ def create_answer_generator(system_prompt: str):
             HumanMessage(content=f"Question: {query}\n\nSQL Query: {sql_query}\n\nSQL Result: {sql_result}")
         ]
         
-        try:
-            async for chunk in answer_llm.astream(messages):
-                yield chunk.content
-        except Exception as e:
-            yield f"Error generating answer: {e}"
+        with tracer.span("answer_stream") as span:
+            started = time.perf_counter()
+            try:
+                async for chunk in answer_llm.astream(messages):
+                    if span is not None and "llm.ttft_ms" not in span.attributes and chunk.content:
+                        span.set_attribute("llm.ttft_ms", round((time.perf_counter() - started) * 1000, 1))
+                    tracer.record_llm_usage(chunk, model=settings.LLM_MODEL)
+                    yield chunk.content
+            except Exception as e:
+                yield f"Error generating answer: {e}"
 
         # ----------------------------------------------------
         # 2. TECHNICAL NOTE (The "How")
@@ -216,7 +238,9 @@ Generate ONLY the note:"""
 
         try:
             yield "\n\n" # Spacing
-            technical_note_msg = await answer_llm.ainvoke([HumanMessage(content=note_prompt)])
+            with tracer.span("technical_note"):
+                technical_note_msg = await answer_llm.ainvoke([HumanMessage(content=note_prompt)])
+                tracer.record_llm_usage(technical_note_msg, model=settings.LLM_MODEL)
             yield technical_note_msg.content
         except Exception as e:
             print(f"[NOTE GEN ERROR] {e}")
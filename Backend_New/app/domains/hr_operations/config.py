@@ -8,6 +8,8 @@ Part of Single Database, Multi-Domain Architecture (v2.2)
 All domains share DATABASE_URL with isolation via ALLOWED_TABLES.
 """
 
+import re
+
 # Router Metadata (Used for Auto-Discovery)
 ROUTER_METADATA = {
     "name": "checklist",
@@ -768,6 +770,43 @@ and visitor gate pass tracking (`visitors`).
    - subscription.subscription_no = subscription_renewals.subscription_no
 """
 
+# Question keywords per table (mirrors TABLE ROUTING in the generator prompt).
+# Used by model tiering to estimate complexity and to slim the schema.
+TABLE_KEYWORDS = {
+    "checklist": ["task", "tasks", "checklist", "routine", "daily", "weekly", "pending", "completed",
+                  "performance", "report", "summary"],
+    "delegation": ["delegation", "delegated", "assigned", "one-time", "one time", "planned",
+                   "performance", "report", "summary", "overdue"],
+    "users": ["user", "users", "employee", "employees", "login", "email", "role"],
+    "ticket_book": ["ticket", "tickets", "booking", "bill", "bills", "ticket amount", "charges"],
+    "leave_request": ["leave", "leaves", "absence", "absent", "hr approval"],
+    "request": ["travel", "travel request", "departure", "city", "travel type", "manpower"],
+    "resume_request": ["resume", "candidate", "candidates", "hiring", "interview", "joined"],
+    "subscription": ["subscription", "subscriptions", "subscriber", "renewal", "service"],
+    "approval_history": ["approval history", "subscription approval"],
+    "payment_history": ["payment history", "upi", "bank transfer", "transaction", "transactions"],
+    "subscription_renewals": ["renewal", "renewals", "renewed"],
+    "all_loans": ["loan", "loans", "emi", "loan amount"],
+    "request_forclosure": ["foreclosure", "forclosure", "loan closure"],
+    "collect_noc": ["noc", "no objection"],
+    "documents": ["document", "documents", "certificate", "certificates"],
+    "sharedocuments": ["shared document", "shared documents", "document sharing", "shared"],
+    "payment_fms": ["payment fms", "fms", "pay to", "finance payment"],
+    "master": ["master", "doer", "priority", "task type"],
+    "visitors": ["visitor", "visitors", "gate pass", "person to meet", "visit"],
+}
+
+_TABLE_BLOCK = re.compile(
+    r"^\s*\d+\. \*\*TABLE: `(\w+)`\*\*.*?(?=^\s*\d+\. \*\*TABLE: |^--- |^-{20,})",
+    re.MULTILINE | re.DOTALL
+)
+
+
+def slim_semantic_schema(tables: list) -> str:
+    """SEMANTIC_SCHEMA with only the given tables' blocks (intro and LOGIC sections kept)"""
+    keep = {t.lower() for t in tables}
+    return _TABLE_BLOCK.sub(lambda m: m.group(0) if m.group(1) in keep else "", SEMANTIC_SCHEMA)
+
 def get_column_list(table_name: str) -> list:
     """Get allowed columns for a table"""
     return ALLOWED_COLUMNS.get(table_name.lower(), [])
@@ -10,8 +10,7 @@ NOTE: All domains now use the SAME database (DATABASE_URL).
 """
 
 from langchain_community.utilities import SQLDatabase
-from app.core.config import settings
-import os
+from app.core.database import get_engine
 
 class RestrictedSQLDatabase(SQLDatabase):
     """Database with table restrictions for HR domain"""
@@ -33,17 +32,11 @@ def get_db_instance():
     """
     Get the configured LangChain SQLDatabase instance for Agent usage.
     
-    IMPORTANT: Uses shared DATABASE_URL (same as all other domains).
+    IMPORTANT: Uses the shared engine (same pool as all other domains).
     Domain isolation is enforced via ALLOWED_TABLES in RestrictedSQLDatabase.
     """
-    # Use the shared database URL (single database for all domains)
-    url = settings.DATABASE_URL
-    
-    if not url:
-        raise ValueError("DATABASE_URL is not set in configuration.")
-    
     try:
-        db = RestrictedSQLDatabase.from_uri(url)
+        db = RestrictedSQLDatabase(get_engine())
         return db
     except Exception as e:
         print(f"[ERROR] Failed to connect to HR Operations domain: {e}")
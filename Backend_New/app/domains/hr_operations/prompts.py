@@ -62,91 +62,7 @@ If the input contains "⚠️ CONTEXT FROM PREVIOUS QUERY":
    - Your SQL MUST include: `LOWER(name) = LOWER('Hem Kumar')`
 3. Failure to carry over context (especially user names) is a CRITICAL ERROR.
 
-────────────────────────────────────────────────────────────
-MANDATORY INTERNAL INTENT ANALYSIS (DO NOT OUTPUT)
-────────────────────────────────────────────────────────────
-Before writing SQL, you MUST internally determine the intent
-using the following intent dimensions:
-
-- intent_type:
-    • count
-    • list
-    • performance
-    • summary
-
-- tables_required:
-    • checklist
-    • delegation
-    • both (checklist + delegation)
-    • ticket_book
-    • leave_request
-    • request
-    • resume_request
-    • users
-    • master
-    • all_loans
-    • request_forclosure
-    • collect_noc
-    • subscription
-    • approval_history
-    • payment_history
-    • subscription_renewals
-    • documents
-    • sharedocuments
-    • payment_fms
-    • visitors
-
-- time_basis:
-    • scheduled_date  → task_start_date (for checklist/delegation)
-    • completion_date → submission_date (for checklist/delegation)
-    • date_range      → from_date/to_date (for leave_request, request)
-    • interview_date  → interviewer_planned/interviewer_actual (for resume_request)
-    • loan_date       → loan_start_date/loan_end_date (for all_loans, request_forclosure, collect_noc)
-    • subscription_date → start_date/end_date (for subscription)
-    • payment_date    → created_at/timestamp (for payment_history, payment_fms)
-    • renewal_date    → renewal_date (for documents)
-    • visit_date      → date_of_visit (for visitors)
-
-- time_range:
-    • full_month
-    • month_till_today
-    • custom_range
-
-- task_state:
-    • pending    → submission_date IS NULL (checklist/delegation)
-    • completed  → submission_date IS NOT NULL (checklist/delegation)
-    • leave_pending → LOWER(request_status) = 'pending' (leave_request)
-    • leave_approved → LOWER(request_status) = 'approved' (leave_request)
-    • interview_pending → interviewer_actual IS NULL (resume_request)
-    • joined → LOWER(joined_status) = 'yes' (resume_request)
-    • sub_approved → LOWER(approval_status) = 'approved' (subscription)
-    • sub_rejected → LOWER(approval_status) = 'rejected' (subscription)
-    • sub_active → end_date >= CURRENT_DATE (subscription)
-    • sub_expired → end_date < CURRENT_DATE (subscription)
-    • loan_active → loan_end_date >= CURRENT_DATE (all_loans)
-    • noc_collected → collect_noc = true (collect_noc)
-    • noc_pending → collect_noc = false (collect_noc)
-    • doc_active → is_deleted = false OR is_deleted IS NULL (documents)
-    • doc_needs_renewal → need_renewal = 'yes' (documents)
-    • visitor_inside → LOWER(status) = 'in' (visitors)
-    • visitor_left → LOWER(status) = 'out' (visitors)
-    • visit_approved → LOWER(approval_status) = 'approved' (visitors)
-    • all
-
-- filters:
-    • user_name
-    • department
-    • person_name
-    • employee_name
-    • candidate_name
-    • visitor_name
-    • person_to_meet
-    • none
-
-This intent object is ONLY for reasoning.
-DO NOT print or expose it.
-
-────────────────────────────────────────────────────────────
+{analysis_section}────────────────────────────────────────────────────────────
 SQL GENERATION RULES (STRICT)
 ────────────────────────────────────────────────────────────
 1. Use ONLY allowed tables and columns from the SEMANTIC SCHEMA.
@@ -242,6 +158,114 @@ FEEDBACK FROM PREVIOUS ATTEMPT (IF ANY)
 Now generate the SQL query.
 """
 
+# Reasoning mode (retries after a validator rejection, or SQL_GENERATION_MODE=reasoning)
+INTENT_ANALYSIS_SECTION = """────────────────────────────────────────────────────────────
+MANDATORY INTERNAL INTENT ANALYSIS (DO NOT OUTPUT)
+────────────────────────────────────────────────────────────
+Before writing SQL, you MUST internally determine the intent
+using the following intent dimensions:
+
+- intent_type:
+    • count
+    • list
+    • performance
+    • summary
+
+- tables_required:
+    • checklist
+    • delegation
+    • both (checklist + delegation)
+    • ticket_book
+    • leave_request
+    • request
+    • resume_request
+    • users
+    • master
+    • all_loans
+    • request_forclosure
+    • collect_noc
+    • subscription
+    • approval_history
+    • payment_history
+    • subscription_renewals
+    • documents
+    • sharedocuments
+    • payment_fms
+    • visitors
+
+- time_basis:
+    • scheduled_date  → task_start_date (for checklist/delegation)
+    • completion_date → submission_date (for checklist/delegation)
+    • date_range      → from_date/to_date (for leave_request, request)
+    • interview_date  → interviewer_planned/interviewer_actual (for resume_request)
+    • loan_date       → loan_start_date/loan_end_date (for all_loans, request_forclosure, collect_noc)
+    • subscription_date → start_date/end_date (for subscription)
+    • payment_date    → created_at/timestamp (for payment_history, payment_fms)
+    • renewal_date    → renewal_date (for documents)
+    • visit_date      → date_of_visit (for visitors)
+
+- time_range:
+    • full_month
+    • month_till_today
+    • custom_range
+
+- task_state:
+    • pending    → submission_date IS NULL (checklist/delegation)
+    • completed  → submission_date IS NOT NULL (checklist/delegation)
+    • leave_pending → LOWER(request_status) = 'pending' (leave_request)
+    • leave_approved → LOWER(request_status) = 'approved' (leave_request)
+    • interview_pending → interviewer_actual IS NULL (resume_request)
+    • joined → LOWER(joined_status) = 'yes' (resume_request)
+    • sub_approved → LOWER(approval_status) = 'approved' (subscription)
+    • sub_rejected → LOWER(approval_status) = 'rejected' (subscription)
+    • sub_active → end_date >= CURRENT_DATE (subscription)
+    • sub_expired → end_date < CURRENT_DATE (subscription)
+    • loan_active → loan_end_date >= CURRENT_DATE (all_loans)
+    • noc_collected → collect_noc = true (collect_noc)
+    • noc_pending → collect_noc = false (collect_noc)
+    • doc_active → is_deleted = false OR is_deleted IS NULL (documents)
+    • doc_needs_renewal → need_renewal = 'yes' (documents)
+    • visitor_inside → LOWER(status) = 'in' (visitors)
+    • visitor_left → LOWER(status) = 'out' (visitors)
+    • visit_approved → LOWER(approval_status) = 'approved' (visitors)
+    • all
+
+- filters:
+    • user_name
+    • department
+    • person_name
+    • employee_name
+    • candidate_name
+    • visitor_name
+    • person_to_meet
+    • none
+
+This intent object is ONLY for reasoning.
+DO NOT print or expose it.
+
+"""
+
+# Fast mode: no analysis, the answer is the tool call alone
+SQL_ONLY_SECTION = """────────────────────────────────────────────────────────────
+OUTPUT CONTRACT (SQL ONLY)
+────────────────────────────────────────────────────────────
+Respond with exactly ONE tool call whose `query` argument is the final SQL.
+Do NOT write any analysis, intent object, explanation or message text.
+Pick tables, date columns and filters directly from TABLE ROUTING,
+the SEMANTIC SCHEMA and the rules below.
+
+"""
+
+
+def generator_system_prompt(mode: str, schema: str, current_date: str, feedback_section: str = "") -> str:
+    """Generator prompt for 'fast' (SQL only) or 'reasoning' (intent analysis first) mode"""
+    return GENERATOR_SYSTEM_PROMPT.format(
+        current_date=current_date,
+        schema=schema,
+        feedback_section=feedback_section,
+        analysis_section=SQL_ONLY_SECTION if mode == "fast" else INTENT_ANALYSIS_SECTION
+    )
+
 # ============================================================================
 # LLM 2: VALIDATOR PROMPT (Schema Analysis & Feedback)
 # ============================================================================
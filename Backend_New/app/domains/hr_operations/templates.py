@@ -0,0 +1,226 @@
+"""
+HR Operations Domain - SQL Templates
+====================================
+Vetted SQL for the most frequent intents, answered without the generator
+and validator LLMs (see app/services/template_store.py).
+
+Template fields:
+- examples:  phrasings with slot placeholders ({person}, {department},
+             {division}, {date_range}, {status}, {number})
+- sql:       PostgreSQL with the same placeholders; {date_range} binds
+             {date_from}/{date_to}; [[ ... ]] blocks are dropped when their
+             slots are absent from the question
+- status:    status word -> SQL fragment for {status} ("any" = no status word)
+- count:     True/False = question must/must not ask for a count, None = either
+- requires:  words the question must contain ("a|b" = either)
+
+All SQL follows the generator rules in prompts.py: LOWER() comparisons,
+submission_date for pending/completed, COUNT(*) OVER() + LIMIT 50 for lists.
+"""
+
+from app.domains.hr_operations.config import ROUTER_METADATA
+
+DOMAIN = ROUTER_METADATA["name"]
+
+# Gazetteer sources for slot extraction: slot type -> [(table, column)]
+SLOT_SOURCES = {
+    "person": [("checklist", "name"), ("delegation", "name"), ("users", "user_name"), ("leave_request", "employee_name")],
+    "department": [("checklist", "department"), ("delegation", "department"), ("users", "department")],
+}
+
+TASK_STATUS = {
+    "any": "",
+    "pending": " AND submission_date IS NULL",
+    "completed": " AND submission_date IS NOT NULL",
+}
+
+TASK_FILTERS = (
+    "[[ AND LOWER(name) = LOWER({person})]]"
+    "[[ AND LOWER(department) = LOWER({department})]]"
+    "[[ AND task_start_date >= {date_from} AND task_start_date < {date_to}]]"
+)
+
+SQL_TEMPLATES = [
+    {
+        "id": "hr_tasks_list",
+        "description": "Checklist + delegation tasks, optionally for a person/department/date range",
+        "examples": [
+            "{status} tasks of {person}",
+            "show {status} tasks for {person} {date_range}",
+            "list all {status} tasks in {department} department {date_range}",
+            "what are the {status} tasks {date_range}",
+        ],
+        "sql": (
+            "SELECT COUNT(*) OVER() AS total_actual_count, source_table, name, department, task_description, "
+            "task_start_date, submission_date FROM ("
+            "SELECT 'checklist' AS source_table, name, department, task_description, task_start_date, submission_date "
+            f"FROM checklist WHERE 1 = 1{{status}}{TASK_FILTERS} "
+            "UNION ALL "
+            "SELECT 'delegation' AS source_table, name, department, task_description, task_start_date, submission_date "
+            f"FROM delegation WHERE 1 = 1{{status}}{TASK_FILTERS}"
+            ") AS tasks ORDER BY task_start_date DESC LIMIT 50"
+        ),
+        "status": TASK_STATUS,
+        "count": False,
+        "requires": ["task"],
+    },
+    {
+        "id": "hr_tasks_count",
+        "description": "Number of checklist + delegation tasks per table",
+        "examples": [
+            "how many {status} tasks does {person} have {date_range}",
+            "count of {status} tasks for {person}",
+            "how many tasks are {status} in {department} department {date_range}",
+            "number of {status} tasks {date_range}",
+        ],
+        "sql": (
+            "SELECT source_table, COUNT(*) AS total_tasks FROM ("
+            f"SELECT 'checklist' AS source_table FROM checklist WHERE 1 = 1{{status}}{TASK_FILTERS} "
+            "UNION ALL "
+            f"SELECT 'delegation' AS source_table FROM delegation WHERE 1 = 1{{status}}{TASK_FILTERS}"
+            ") AS tasks GROUP BY source_table"
+        ),
+        "status": TASK_STATUS,
+        "count": True,
+        "requires": ["task"],
+    },
+    {
+        "id": "checklist_tasks_list",
+        "description": "Checklist tasks, optionally for a person/department/date range",
+        "examples": [
+            "{status} checklist tasks of {person}",
+            "show {status} checklist tasks for {person} {date_range}",
+            "list {status} checklist tasks in {department} department {date_range}",
+        ],
+        "sql": (
+            "SELECT COUNT(*) OVER() AS total_actual_count, task_id, name, department, task_description, frequency, "
+            f"task_start_date, submission_date FROM checklist WHERE 1 = 1{{status}}{TASK_FILTERS} "
+            "ORDER BY task_start_date DESC LIMIT 50"
+        ),
+        "status": TASK_STATUS,
+        "count": False,
+        "requires": ["checklist"],
+    },
+    {
+        "id": "checklist_tasks_count",
+        "description": "Number of checklist tasks",
+        "examples": [
+            "how many checklist tasks are {status} {date_range}",
+            "count of {status} checklist tasks for {person}",
+            "number of {status} checklist tasks in {department} department",
+        ],
+        "sql": f"SELECT COUNT(*) AS total_tasks FROM checklist WHERE 1 = 1{{status}}{TASK_FILTERS}",
+        "status": TASK_STATUS,
+        "count": True,
+        "requires": ["checklist"],
+    },
+    {
+        "id": "checklist_tasks_by_department",
+        "description": "Checklist tasks per department",
+        "examples": [
+            "show {status} checklist tasks by department {date_range}",
+            "department wise {status} checklist tasks",
+            "which department has the most {status} checklist tasks",
+        ],
+        "sql": (
+            "SELECT TRIM(department) AS department, COUNT(*) AS total_tasks FROM checklist WHERE 1 = 1{status}"
+            "[[ AND task_start_date >= {date_from} AND task_start_date < {date_to}]] "
+            "GROUP BY TRIM(department) ORDER BY total_tasks DESC"
+        ),
+        "status": TASK_STATUS,
+        "count": None,
+        "requires": ["checklist", "department"],
+    },
+    {
+        "id": "delegation_tasks_list",
+        "description": "Delegated tasks, optionally for a person/department/date range",
+        "examples": [
+            "{status} delegation tasks of {person}",
+            "show {status} delegated tasks for {person} {date_range}",
+            "list {status} delegation tasks in {department} department {date_range}",
+        ],
+        "sql": (
+            "SELECT COUNT(*) OVER() AS total_actual_count, task_id, name, given_by, department, task_description, "
+            f"task_start_date, planned_date, submission_date FROM delegation WHERE 1 = 1{{status}}{TASK_FILTERS} "
+            "ORDER BY planned_date DESC LIMIT 50"
+        ),
+        "status": TASK_STATUS,
+        "count": False,
+        "requires": ["delegation|delegated"],
+    },
+    {
+        "id": "delegation_tasks_count",
+        "description": "Number of delegated tasks",
+        "examples": [
+            "how many delegation tasks are {status} {date_range}",
+            "count of {status} delegated tasks for {person}",
+            "number of {status} delegation tasks in {department} department",
+        ],
+        "sql": f"SELECT COUNT(*) AS total_tasks FROM delegation WHERE 1 = 1{{status}}{TASK_FILTERS}",
+        "status": TASK_STATUS,
+        "count": True,
+        "requires": ["delegation|delegated"],
+    },
+    {
+        "id": "delegation_tasks_by_department",
+        "description": "Delegated tasks per department",
+        "examples": [
+            "show {status} delegation tasks by department {date_range}",
+            "which departments have the most {status} delegation tasks",
+        ],
+        "sql": (
+            "SELECT TRIM(department) AS department, COUNT(*) AS total_tasks FROM delegation WHERE 1 = 1{status}"
+            "[[ AND task_start_date >= {date_from} AND task_start_date < {date_to}]] "
+            "GROUP BY TRIM(department) ORDER BY total_tasks DESC"
+        ),
+        "status": TASK_STATUS,
+        "count": None,
+        "requires": ["delegation|delegated", "department"],
+    },
+    {
+        "id": "leave_requests_list",
+        "description": "Leave requests, optionally by status, employee and date range",
+        "examples": [
+            "{status} leave requests of {person}",
+            "show {status} leave requests {date_range}",
+            "list leave requests {status} by hr {date_range}",
+        ],
+        "sql": (
+            "SELECT COUNT(*) OVER() AS total_actual_count, employee_name, from_date, to_date, reason, request_status, "
+            "approved_by, hr_approval FROM leave_request WHERE 1 = 1{status}"
+            "[[ AND LOWER(employee_name) = LOWER({person})]]"
+            "[[ AND from_date >= {date_from} AND from_date < {date_to}]] "
+            "ORDER BY from_date DESC LIMIT 50"
+        ),
+        "status": {
+            "any": "",
+            "pending": " AND (LOWER(request_status) = LOWER('pending') OR request_status IS NULL)",
+            "approved": " AND LOWER(request_status) = LOWER('approved')",
+            "rejected": " AND LOWER(request_status) = LOWER('rejected')",
+        },
+        "count": False,
+        "requires": ["leave"],
+    },
+    {
+        "id": "leave_requests_count",
+        "description": "Number of leave requests",
+        "examples": [
+            "how many leave requests are {status} {date_range}",
+            "count of {status} leave requests of {person}",
+            "number of leaves {status} {date_range}",
+        ],
+        "sql": (
+            "SELECT COUNT(*) AS total_requests FROM leave_request WHERE 1 = 1{status}"
+            "[[ AND LOWER(employee_name) = LOWER({person})]]"
+            "[[ AND from_date >= {date_from} AND from_date < {date_to}]]"
+        ),
+        "status": {
+            "any": "",
+            "pending": " AND (LOWER(request_status) = LOWER('pending') OR request_status IS NULL)",
+            "approved": " AND LOWER(request_status) = LOWER('approved')",
+            "rejected": " AND LOWER(request_status) = LOWER('rejected')",
+        },
+        "count": True,
+        "requires": ["leave"],
+    },
+]
@@ -9,14 +9,18 @@ from datetime import datetime
 import json
 import re
 
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from langgraph.graph import END, START, StateGraph, MessagesState
-from langgraph.checkpoint.memory import MemorySaver
 
 from app.core.config import settings
 from app.core.security import validate_sql_security
+from app.services.state_store import get_checkpointer
+from app.services.tracing import tracer, traced_node
+from app.services.db_service import count_result_rows
+from app.services.llm_gateway import llm_gateway
+from app.services.metrics import SQL_GENERATIONS
+from app.services.model_tiering import model_tiering
 
 # Local Imports
 from .connection import get_db_instance
@@ -31,11 +35,7 @@ from . import prompts
 db = get_db_instance()
 
 # Initialize LLM
-model = ChatOpenAI(
-    model=settings.LLM_MODEL,
-    temperature=settings.LLM_TEMPERATURE,
-    openai_api_key=settings.OPENAI_API_KEY
-)
+model = llm_gateway.chat(settings.LLM_MODEL, temperature=settings.LLM_TEMPERATURE)
 
 # Initialize Toolkit & Tools
 toolkit = SQLDatabaseToolkit(db=db, llm=model)
@@ -116,7 +116,7 @@ INSTRUCTIONS:
 Generate ONLY the note:"""
 
     try:
-        llm_direct = ChatOpenAI(model=settings.LLM_MODEL, temperature=0, openai_api_key=settings.OPENAI_API_KEY)
+        llm_direct = llm_gateway.chat(settings.LLM_MODEL)
         
         full_answer_msg = llm_direct.invoke(answer_prompt)
         main_answer = full_answer_msg.content.strip()
@@ -250,6 +250,21 @@ def store_schema(state: EnhancedState):
         "last_feedback": ""
     }
 
+def generation_mode(state: EnhancedState) -> str:
+    """'fast' (tool call only) for first attempts; retries after a rejection reason first"""
+    if state.get("last_feedback") or settings.SQL_GENERATION_MODE == "reasoning":
+        return "reasoning"
+    return "fast"
+
+def bind_generator(llm, mode: str):
+    """Structured output: exactly one run_query tool call (capped output in fast mode)"""
+    if mode == "fast":
+        return llm.bind_tools(
+            [run_query_tool], tool_choice="required", parallel_tool_calls=False,
+            max_tokens=settings.SQL_FAST_MAX_TOKENS
+        )
+    return llm.bind_tools([run_query_tool], tool_choice="required")
+
 def generate_query(state: EnhancedState):
     """LLM 1: Generate Query"""
     # Use local prompts
@@ -257,13 +272,14 @@ def generate_query(state: EnhancedState):
     if state.get("last_feedback"):
         feedback_section = f"\n⚠️ PREVIOUS ATTEMPT ISSUES:\n{state['last_feedback']}\n\nREGENERATE WITH FIXES.\n"
     
-    system_content = prompts.GENERATOR_SYSTEM_PROMPT.format(
-        current_date=datetime.now().strftime("%Y-%m-%d"),
-        schema=config.SEMANTIC_SCHEMA,
-        feedback_section=feedback_section
+    # Simple questions: fast model with only the matched tables; complex or rejected: strong model
+    choice = model_tiering.choose(
+        state.get("original_question", ""), "checklist", config.TABLE_KEYWORDS,
+        rejected=bool(state.get("last_feedback")), attempt=state.get("validation_attempts", 0)
     )
+    schema = config.slim_semantic_schema(choice.tables) if choice.slim else config.SEMANTIC_SCHEMA
     
-    messages_to_send = [SystemMessage(content=system_content)]
+    messages_to_send = []
     
     # Add User Question
     user_question = None
@@ -277,10 +293,30 @@ def generate_query(state: EnhancedState):
     # Inject Feedback explicitly
     if state.get("last_feedback"):
         messages_to_send.append(HumanMessage(content=f"❌ REJECTED. FIX: {state['last_feedback']}"))
-        
-    # Bind tool
-    llm_with_tools = model.bind_tools([run_query_tool], tool_choice="required")
-    response = llm_with_tools.invoke(messages_to_send)
+    
+    def generate(mode: str):
+        tracer.set_attribute("sql.mode", mode)
+        system_content = prompts.generator_system_prompt(
+            mode,
+            schema=schema,
+            current_date=datetime.now().strftime("%Y-%m-%d"),
+            feedback_section=feedback_section
+        )
+        # Bind tool (hedged, within the request's LLM budget)
+        response = model_tiering.generate(
+            [SystemMessage(content=system_content)] + messages_to_send, choice,
+            temperature=settings.LLM_TEMPERATURE, prepare=lambda llm: bind_generator(llm, mode)
+        )
+        tracer.record_llm_usage(response)
+        SQL_GENERATIONS.inc(mode=mode, outcome="sql" if response.tool_calls else "no_sql")
+        return response
+    
+    mode = generation_mode(state)
+    response = generate(mode)
+    if mode == "fast" and not response.tool_calls:
+        # Cut off at SQL_FAST_MAX_TOKENS without a complete tool call
+        print("[DEBUG-Checklist] Fast generation returned no SQL, retrying with reasoning")
+        response = generate("reasoning")
     
     return {
         "messages": [response],
@@ -315,10 +351,11 @@ Validate this query against the SEMANTIC SCHEMA. Provide JSON response only.
         system_content = prompts.VALIDATOR_SYSTEM_PROMPT.format(
             semantic_schema=config.SEMANTIC_SCHEMA
         )
-        validator_response = model.invoke([
+        validator_response = llm_gateway.invoke([
             SystemMessage(content=system_content),
             HumanMessage(content=validation_request)
-        ])
+        ], stage="validate_query", temperature=settings.LLM_TEMPERATURE)
+        tracer.record_llm_usage(validator_response)
         
         # Parse logic (simplified from original for brevity, but logically identical)
         content = validator_response.content.strip()
@@ -376,7 +413,8 @@ def run_query_node(state: EnhancedState):
     else:
         res = run_query_tool.invoke({"query": query})
         tool_resp = ToolMessage(content=str(res), tool_call_id=tool_call_id)
-        
+    
+    tracer.set_attribute("db.rows", count_result_rows(res))
     return {"messages": [tool_resp]}
 
 
@@ -404,12 +442,12 @@ def should_regenerate_or_approve(state: EnhancedState) -> str:
 def build_workflow():
     builder = StateGraph(EnhancedState)
     
-    builder.add_node("list_tables", list_tables)
-    builder.add_node("call_get_schema", call_get_schema)
-    builder.add_node("store_schema", store_schema)
-    builder.add_node("generate_query", generate_query)
-    builder.add_node("validate_query", validate_query)
-    builder.add_node("run_query", run_query_node)
+    builder.add_node("list_tables", traced_node("list_tables", list_tables))
+    builder.add_node("call_get_schema", traced_node("call_get_schema", call_get_schema))
+    builder.add_node("store_schema", traced_node("store_schema", store_schema))
+    builder.add_node("generate_query", traced_node("generate_query", generate_query))
+    builder.add_node("validate_query", traced_node("validate_query", validate_query))
+    builder.add_node("run_query", traced_node("run_query", run_query_node))
     
     builder.add_edge(START, "list_tables")
     builder.add_edge("list_tables", "call_get_schema")
@@ -428,7 +466,7 @@ def build_workflow():
     
     builder.add_edge("run_query", END)
     
-    checkpointer = MemorySaver()
+    checkpointer = get_checkpointer()
     return builder.compile(checkpointer=checkpointer)
 
 # EXPORTED APP
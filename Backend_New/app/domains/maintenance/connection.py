@@ -9,7 +9,7 @@ NOTE: All domains now use the SAME database (DATABASE_URL).
 """
 
 from langchain_community.utilities import SQLDatabase
-from app.core.config import settings
+from app.core.database import get_engine
 from .config import ALLOWED_TABLES
 
 class RestrictedSQLDatabase(SQLDatabase):
@@ -29,19 +29,13 @@ def get_db_instance():
     """
     Get the configured LangChain SQLDatabase instance for Agent usage.
     
-    IMPORTANT: Uses shared DATABASE_URL (same as all other domains).
+    IMPORTANT: Uses the shared engine (same pool as all other domains).
     Domain isolation is enforced via ALLOWED_TABLES.
     """
-    # Use the shared database URL (single database for all domains)
-    url = settings.DATABASE_URL
-    
-    if not url:
-        raise ValueError("DATABASE_URL is not set in configuration.")
-    
     try:
         # We use include_tables to enforce restriction at the connection level
-        db = RestrictedSQLDatabase.from_uri(
-            url,
+        db = RestrictedSQLDatabase(
+            get_engine(),
             include_tables=ALLOWED_TABLES,
             sample_rows_in_table_info=2
         )
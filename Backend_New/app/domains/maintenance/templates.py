@@ -0,0 +1,91 @@
+"""
+Maintenance Domain - SQL Templates
+==================================
+Vetted SQL for the most frequent maintenance intents, answered without the
+generator and validator LLMs. Field reference: app/domains/hr_operations/templates.py.
+
+Divisions and departments are compared with spaces collapsed ('PIPE  MILL'),
+per the rules in prompts.py.
+"""
+
+from app.domains.maintenance.config import ROUTER_METADATA
+
+DOMAIN = ROUTER_METADATA["name"]
+
+# Gazetteer sources for slot extraction: slot type -> [(table, column)]
+SLOT_SOURCES = {
+    "person": [("maintenance_task_assign", "doer_name")],
+    "department": [("maintenance_task_assign", "doer_department")],
+    "division": [("maintenance_task_assign", "division")],
+}
+
+MAINTENANCE_STATUS = {
+    "any": "",
+    "pending": " AND actual_date IS NULL",
+    "completed": " AND actual_date IS NOT NULL",
+}
+
+MAINTENANCE_FILTERS = (
+    "[[ AND LOWER(doer_name) = LOWER({person})]]"
+    r"[[ AND LOWER(REGEXP_REPLACE(TRIM(doer_department), '\s+', ' ', 'g')) = "
+    r"LOWER(REGEXP_REPLACE(TRIM({department}), '\s+', ' ', 'g'))]]"
+    r"[[ AND LOWER(REGEXP_REPLACE(TRIM(division), '\s+', ' ', 'g')) = "
+    r"LOWER(REGEXP_REPLACE(TRIM({division}), '\s+', ' ', 'g'))]]"
+    "[[ AND task_start_date >= {date_from} AND task_start_date < {date_to}]]"
+)
+
+SQL_TEMPLATES = [
+    {
+        "id": "maintenance_tasks_list",
+        "description": "Maintenance tasks, optionally by doer/department/division and date range",
+        "examples": [
+            "{status} maintenance tasks of {person}",
+            "{division} division {status} maintenance tasks {date_range}",
+            "show {status} machine maintenance tasks in {department} department",
+            "list machines {status} for repair in {division} division",
+        ],
+        "sql": (
+            "SELECT COUNT(*) OVER() AS total_count, machine_name, doer_name, doer_department, division, "
+            "task_start_date, actual_date, description FROM maintenance_task_assign "
+            f"WHERE 1 = 1{{status}}{MAINTENANCE_FILTERS} ORDER BY task_start_date DESC LIMIT 50"
+        ),
+        "status": MAINTENANCE_STATUS,
+        "count": False,
+        "requires": ["maintenance|machine|repair"],
+    },
+    {
+        "id": "maintenance_tasks_count",
+        "description": "Number of maintenance tasks, optionally by doer/department/division and date range",
+        "examples": [
+            "how many {status} maintenance tasks does {person} have",
+            "how many maintenance tasks are {status} in {division} division {date_range}",
+            "count of {status} machine tasks in {department} department",
+        ],
+        "sql": (
+            "SELECT COUNT(*) AS total_tasks FROM maintenance_task_assign "
+            f"WHERE 1 = 1{{status}}{MAINTENANCE_FILTERS}"
+        ),
+        "status": MAINTENANCE_STATUS,
+        "count": True,
+        "requires": ["maintenance|machine|repair"],
+    },
+    {
+        "id": "maintenance_by_division",
+        "description": "Maintenance task completion per division",
+        "examples": [
+            "division wise {status} maintenance tasks {date_range}",
+            "maintenance performance by division {date_range}",
+        ],
+        "sql": (
+            r"SELECT REGEXP_REPLACE(TRIM(division), '\s+', ' ', 'g') AS division, COUNT(*) AS total_tasks, "
+            "COUNT(*) FILTER (WHERE actual_date IS NOT NULL) AS completed_tasks, "
+            "COUNT(*) FILTER (WHERE actual_date IS NULL) AS pending_tasks "
+            "FROM maintenance_task_assign WHERE 1 = 1{status}"
+            "[[ AND task_start_date >= {date_from} AND task_start_date < {date_to}]] "
+            r"GROUP BY REGEXP_REPLACE(TRIM(division), '\s+', ' ', 'g') ORDER BY total_tasks DESC"
+        ),
+        "status": MAINTENANCE_STATUS,
+        "count": None,
+        "requires": ["maintenance|machine|repair", "division"],
+    },
+]
@@ -9,7 +9,6 @@ from typing import Dict, Any, List
 import json
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 
 from app.core.config import settings
@@ -24,12 +23,15 @@ from app.services.agent_nodes import (
 from .connection import get_db_instance
 from .prompts import GENERATE_QUERY_SYSTEM_PROMPT, ANSWER_SYNTHESIS_SYSTEM_PROMPT, REFORMULATE_QUESTION_PROMPT
 from app.services.session_manager import session_manager
+from app.services.tracing import tracer, traced_node
+from app.services.llm_gateway import llm_gateway
+from app.services.model_tiering import model_tiering
 
 from langchain_core.runnables import RunnableConfig
 
 # Initialize Services
 db = get_db_instance()
-llm = ChatOpenAI(model=settings.LLM_MODEL, temperature=0, openai_api_key=settings.OPENAI_API_KEY)
+llm = llm_gateway.chat(settings.LLM_MODEL)
 
 # ------------------------------------------------------------------
 # NODE: Reformulate Question (Context Awareness)
@@ -63,6 +65,7 @@ def reformulate_question_node(state: EnhancedState, config: RunnableConfig):
     
     # Invoke
     response = llm.invoke(prompt)
+    tracer.record_llm_usage(response)
     rewritten_q = response.content.strip()
     
     print(f"[CONTEXT REFORMULATION] Original: '{current_q}' -> Rewritten: '{rewritten_q}'")
@@ -84,8 +87,10 @@ def generate_query_node(state: EnhancedState):
         HumanMessage(content=user_query)
     ]
     
-    # Invoke LLM
-    response = llm.invoke(prompt)
+    # Invoke LLM on the tier for the question's complexity (hedged, within the request's LLM budget)
+    choice = model_tiering.choose(user_query, "sagar_db")
+    response = model_tiering.generate(prompt, choice)
+    tracer.record_llm_usage(response)
     generated_sql = response.content.strip().replace("```sql", "").replace("```", "")
     
     return {
@@ -128,12 +133,12 @@ def should_continue_validation(state: EnhancedState):
 # ------------------------------------------------------------------
 workflow = StateGraph(EnhancedState)
 
-workflow.add_node("reformulate_question", reformulate_question_node)
-workflow.add_node("list_tables", lambda state: list_tables(state, db))
-workflow.add_node("get_schema", lambda state: call_get_schema(state, db, ALLOWED_TABLES))
-workflow.add_node("generate_query", generate_query_node)
-workflow.add_node("validate_query", validate_query_node)
-workflow.add_node("run_query", lambda state: run_query_node(state, db))
+workflow.add_node("reformulate_question", traced_node("reformulate_question", reformulate_question_node))
+workflow.add_node("list_tables", traced_node("list_tables", lambda state: list_tables(state, db)))
+workflow.add_node("get_schema", traced_node("get_schema", lambda state: call_get_schema(state, db, ALLOWED_TABLES)))
+workflow.add_node("generate_query", traced_node("generate_query", generate_query_node))
+workflow.add_node("validate_query", traced_node("validate_query", validate_query_node))
+workflow.add_node("run_query", traced_node("run_query", lambda state: run_query_node(state, db)))
 
 # Define Flow
 workflow.set_entry_point("reformulate_question") 
@@ -44,6 +44,14 @@ COLUMNS_RESTRICTION = {
     ]
 }
 
+# Question keywords per table (model tiering: how many tables a question touches)
+TABLE_KEYWORDS = {
+    "fms_leads": ["lead", "leads", "lead source", "hot", "warm", "cold", "indiamart", "follow-up", "follow up"],
+    "enquiry_to_order": ["enquiry", "enquiries", "order", "orders", "converted", "conversion"],
+    "make_quotation": ["quotation", "quotations", "quote", "quotes", "grand total", "company", "state", "prepared by"],
+    "login": ["login", "username", "usertype", "admin"],
+}
+
 # 2. Schema Definition for LLM Context
 # (We only include the allowed columns to save tokens and focus the LLM)
 DB_SCHEMA = """
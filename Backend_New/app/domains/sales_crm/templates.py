@@ -0,0 +1,85 @@
+"""
+Sales CRM Domain - SQL Templates
+================================
+Vetted SQL for the most frequent lead-to-order intents, answered without the
+generator and validator LLMs. Field reference: app/domains/hr_operations/templates.py.
+
+fms_leads dates are TEXT and are cast with ::DATE, per the rules in prompts.py.
+"""
+
+from app.domains.sales_crm.config import ROUTER_METADATA
+
+DOMAIN = ROUTER_METADATA["name"]
+
+# Gazetteer sources for slot extraction: slot type -> [(table, column)]
+SLOT_SOURCES = {
+    "person": [("make_quotation", "prepared_by")],
+}
+
+SQL_TEMPLATES = [
+    {
+        "id": "leads_count",
+        "description": "Number of leads created, optionally in a date range",
+        "examples": [
+            "how many leads {date_range}",
+            "how many leads came {date_range}",
+            "total number of leads received {date_range}",
+        ],
+        "sql": (
+            "SELECT COUNT(*) AS total_leads FROM fms_leads WHERE 1 = 1"
+            "[[ AND created_at::DATE >= {date_from} AND created_at::DATE < {date_to}]]"
+        ),
+        "count": True,
+        "requires": ["lead"],
+    },
+    {
+        "id": "leads_by_source",
+        "description": "Leads per lead source, optionally in a date range",
+        "examples": [
+            "lead source wise count {date_range}",
+            "how many leads from each source {date_range}",
+            "show leads by source {date_range}",
+        ],
+        "sql": (
+            "SELECT TRIM(lead_source) AS lead_source, COUNT(*) AS total FROM fms_leads WHERE 1 = 1"
+            "[[ AND created_at::DATE >= {date_from} AND created_at::DATE < {date_to}]] "
+            "GROUP BY TRIM(lead_source) ORDER BY total DESC"
+        ),
+        "count": None,
+        "requires": ["lead", "source"],
+    },
+    {
+        "id": "quotations_list",
+        "description": "Latest quotations, optionally by preparer and date range",
+        "examples": [
+            "show quotations prepared by {person} {date_range}",
+            "list latest quotations {date_range}",
+            "quotations made by {person}",
+        ],
+        "sql": (
+            "SELECT COUNT(*) OVER() AS total_count, quotation_no, quotation_date, prepared_by, company_name, "
+            "grand_total FROM make_quotation WHERE 1 = 1"
+            "[[ AND LOWER(TRIM(prepared_by)) = LOWER({person})]]"
+            "[[ AND quotation_date >= {date_from} AND quotation_date < {date_to}]] "
+            "ORDER BY quotation_date DESC LIMIT 50"
+        ),
+        "count": False,
+        "requires": ["quotation|quote"],
+    },
+    {
+        "id": "quotations_count",
+        "description": "Number and total value of quotations, optionally by preparer and date range",
+        "examples": [
+            "how many quotations {date_range}",
+            "how many quotations did {person} prepare {date_range}",
+            "number of quotes made by {person}",
+        ],
+        "sql": (
+            "SELECT COUNT(*) AS total_quotations, SUM(grand_total) AS total_value FROM make_quotation WHERE 1 = 1"
+            "[[ AND LOWER(TRIM(prepared_by)) = LOWER({person})]]"
+            "[[ AND quotation_date >= {date_from} AND quotation_date < {date_to}]]"
+        ),
+        "count": True,
+        "requires": ["quotation|quote"],
+    },
+]
@@ -0,0 +1,203 @@
+"""
+Admission Control - Bounded Concurrency for /chat/stream
+========================================================
+Every admitted question can open several LLM streams and DB queries, so
+bursts used to trip OpenAI rate limits and saturate the database. Requests
+now pass an admission controller first:
+
+- at most ADMISSION_MAX_IN_FLIGHT requests run at once per worker, and at
+  most ADMISSION_MAX_PER_USER per user (JWT user_id)
+- the rest wait in a FIFO queue of ADMISSION_MAX_QUEUE places, and each waiting
+  stream gets its queue position as SSE status events. A request whose user is
+  at their cap doesn't hold up other users queued behind it
+- when the queue is full, or a user already has ADMISSION_MAX_PER_USER
+  requests waiting, the request is rejected at once with HTTP 429
+- a request still queued after ADMISSION_QUEUE_TIMEOUT_SECONDS gives up
+
+Limits apply per worker process: with N workers the deployment runs up to
+N x ADMISSION_MAX_IN_FLIGHT requests.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import Counter
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_REJECTED
+
+
+class AdmissionRejected(Exception):
+    """The request can't even be queued (queue or per-user queue full)"""
+
+    def __init__(self, reason: str, message: str, retry_after: int):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTimeout(Exception):
+    """The request waited longer than the queue timeout"""
+
+
+class Ticket:
+    """One request's place in line"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, user_id: str):
+        self.id = next(self._ids)
+        self.user_id = user_id
+        self.enqueued_at = time.perf_counter()
+        self.admitted = False
+        self.released = False
+        self.changed = asyncio.Event()  # Admitted or moved up the queue
+
+    @property
+    def waited_seconds(self) -> float:
+        return time.perf_counter() - self.enqueued_at
+
+
+class AdmissionController:
+    """Global and per-user in-flight caps with a bounded FIFO wait queue"""
+
+    def __init__(
+        self,
+        max_in_flight: int = settings.ADMISSION_MAX_IN_FLIGHT,
+        max_per_user: int = settings.ADMISSION_MAX_PER_USER,
+        max_queue: int = settings.ADMISSION_MAX_QUEUE,
+        queue_timeout_seconds: float = settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        enabled: bool = settings.ADMISSION_ENABLED
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_seconds
+        self.enabled = enabled
+
+        self._queue: List[Ticket] = []
+        self._running: Counter = Counter()  # user_id -> admitted requests
+        self.stats = {"admitted": 0, "waited": 0, "rejected": 0, "timed_out": 0, "abandoned": 0}
+
+    @property
+    def in_flight(self) -> int:
+        return sum(self._running.values())
+
+    # ------------------------------------------------------------------------
+    # QUEUE
+    # ------------------------------------------------------------------------
+
+    def enqueue(self, user_id: Any) -> Ticket:
+        """Take a place in line (admitted immediately if there is room), or raise AdmissionRejected"""
+        ticket = Ticket(str(user_id))
+        if not self.enabled:
+            ticket.admitted = True
+            return ticket
+
+        waiting_for_user = sum(1 for t in self._queue if t.user_id == ticket.user_id)
+        if len(self._queue) >= self.max_queue:
+            self._reject("queue_full", f"Server busy: {len(self._queue)} questions waiting. Please retry shortly.")
+        if waiting_for_user >= self.max_per_user:
+            self._reject("user_queue_full", f"You already have {waiting_for_user} questions waiting. Please wait for them to finish.")
+
+        self._queue.append(ticket)
+        self._dispatch()
+        if not ticket.admitted:
+            self.stats["waited"] += 1
+        return ticket
+
+    def _reject(self, reason: str, message: str) -> None:
+        self.stats["rejected"] += 1
+        ADMISSION_REJECTED.inc(reason=reason)
+        print(f"🚦 Admission rejected ({reason}): {len(self._queue)} queued, {self.in_flight} in flight")
+        raise AdmissionRejected(reason, message, retry_after=max(1, round(self.queue_timeout / 10)))
+
+    def _dispatch(self) -> None:
+        """Admit queued tickets in order while there is room, skipping users at their cap"""
+        moved = False
+        for ticket in list(self._queue):
+            if self.in_flight >= self.max_in_flight:
+                break
+            if self._running[ticket.user_id] >= self.max_per_user:
+                continue
+            self._queue.remove(ticket)
+            self._running[ticket.user_id] += 1
+            ticket.admitted = True
+            ticket.changed.set()  # Wake its wait() now, not at the queue timeout
+            self.stats["admitted"] += 1
+            ADMISSION_QUEUE_SECONDS.observe(ticket.waited_seconds, outcome="admitted")
+            moved = True
+        if moved:
+            # The rest see their new position
+            for ticket in self._queue:
+                ticket.changed.set()
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based place among waiting requests (0 once admitted)"""
+        return 0 if ticket.admitted else self._queue.index(ticket) + 1
+
+    async def wait(self, ticket: Ticket) -> AsyncGenerator[int, None]:
+        """Yield the ticket's queue position whenever it changes, until admitted"""
+        deadline = ticket.enqueued_at + self.queue_timeout
+        last = None
+        while not ticket.admitted:
+            position = self.position(ticket)
+            if position != last:
+                last = position
+                yield position
+                if ticket.admitted:
+                    break  # Admitted while the position was being sent
+            ticket.changed.clear()
+            remaining = deadline - time.perf_counter()
+            try:
+                await asyncio.wait_for(ticket.changed.wait(), timeout=max(remaining, 0))
+            except asyncio.TimeoutError:
+                if ticket.admitted:
+                    break
+                ticket.released = True
+                self._drop(ticket, "timeout")
+                raise AdmissionTimeout(f"no free slot after {ticket.waited_seconds:.0f}s")
+
+    def release(self, ticket: Ticket) -> None:
+        """Free the ticket's slot, or its place in line if never admitted (idempotent)"""
+        if ticket.released or not self.enabled:
+            return
+        ticket.released = True
+        if ticket.admitted:
+            self._running[ticket.user_id] -= 1
+            if self._running[ticket.user_id] <= 0:
+                del self._running[ticket.user_id]
+        elif ticket in self._queue:
+            self._drop(ticket, "abandoned")  # Client went away while waiting
+        self._dispatch()
+
+    def _drop(self, ticket: Ticket, outcome: str) -> None:
+        """Take a waiting ticket out of line; everyone behind it moves up"""
+        self._queue.remove(ticket)
+        self.stats["timed_out" if outcome == "timeout" else outcome] += 1
+        ADMISSION_QUEUE_SECONDS.observe(ticket.waited_seconds, outcome=outcome)
+        for waiting in self._queue:
+            waiting.changed.set()
+
+    # ------------------------------------------------------------------------
+    # STATS
+    # ------------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        oldest: Optional[Ticket] = self._queue[0] if self._queue else None
+        return {
+            "enabled": self.enabled,
+            "max_in_flight": self.max_in_flight,
+            "max_per_user": self.max_per_user,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": len(self._queue),
+            "oldest_wait_seconds": round(oldest.waited_seconds, 2) if oldest else 0,
+            "users_in_flight": dict(self._running),
+            **self.stats
+        }
+
+
+# Global instance
+admission = AdmissionController()
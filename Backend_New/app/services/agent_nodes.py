@@ -5,7 +5,7 @@ LangGraph SQL Agent - Part 2: Node Implementations
 
 from app.services.sql_agent import *
 from app.core.column_restrictions import get_columns_description
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from app.services.llm_gateway import llm_gateway
 import time
 
 # ============================================================================
@@ -78,9 +78,8 @@ INSTRUCTIONS:
 Generate ONLY the note:"""
 
     try:
-        from langchain_openai import ChatOpenAI
-        # Helper to run non-streaming call
-        llm_direct = ChatOpenAI(model=settings.LLM_MODEL, temperature=0, openai_api_key=settings.OPENAI_API_KEY)
+        # Helper to run non-streaming call (shared pooled client)
+        llm_direct = llm_gateway.chat(settings.LLM_MODEL)
         
         # 1. Get Main Answer (Streaming if possible, but for simplicity here we do blocking or parallel)
         # We will keep streaming for the main answer validity feeling, but we need to append.
@@ -231,8 +230,11 @@ Regenerate the SQL query strictly following the VALIDATOR'S instructions.
         messages_to_send.append(feedback_msg)
     
     # 3. Invoke Model
-    llm_with_tools = model.bind_tools([run_query_tool], tool_choice="required")
-    response = llm_with_tools.invoke(messages_to_send)
+    response = llm_gateway.invoke(
+        messages_to_send, stage="generate_query", temperature=settings.LLM_TEMPERATURE,
+        prepare=lambda llm: llm.bind_tools([run_query_tool], tool_choice="required")
+    )
+    tracer.record_llm_usage(response)
     
     # 4. Update State
     current_attempts = state.get("validation_attempts", 0)
@@ -245,12 +247,13 @@ Regenerate the SQL query strictly following the VALIDATOR'S instructions.
 def validate_query_with_retry(validation_request: str, question: str, sql: str):
     """Validate query with retry logic for API errors"""
     try:
-        validator_response = model.invoke([
+        validator_response = llm_gateway.invoke([
             SystemMessage(content=VALIDATOR_SYSTEM_PROMPT.format(
                 semantic_schema=SEMANTIC_SCHEMA  # Pass schema to validator
             )),
             HumanMessage(content=validation_request + "\n\nRETURN ONLY JSON: {\"status\": \"APPROVED\" or \"NEEDS_FIX\", ...}")
-        ])
+        ], stage="validate_query", temperature=settings.LLM_TEMPERATURE)
+        tracer.record_llm_usage(validator_response)
         return validator_response.content
     except Exception as e:
         # ... (error handling remains same) ...
@@ -425,6 +428,7 @@ def run_query_node(state: EnhancedState, db=None):
             # ... (Rest of legacy formatting logic if needed, or simple exec)
             result = run_query_tool.invoke({"query": query})
             
+        tracer.set_attribute("db.rows", count_result_rows(result))
         return {"messages": [AIMessage(content=str(result))]}
         
     except Exception as e:
@@ -481,12 +485,12 @@ def build_agent():
     builder = StateGraph(EnhancedState)
     
     # Add nodes
-    builder.add_node("list_tables", list_tables)
-    builder.add_node("call_get_schema", call_get_schema)
-    builder.add_node("store_schema", store_schema)
-    builder.add_node("generate_query", generate_query)
-    builder.add_node("validate_query", validate_query)
-    builder.add_node("run_query", run_query_node)
+    builder.add_node("list_tables", traced_node("list_tables", list_tables))
+    builder.add_node("call_get_schema", traced_node("call_get_schema", call_get_schema))
+    builder.add_node("store_schema", traced_node("store_schema", store_schema))
+    builder.add_node("generate_query", traced_node("generate_query", generate_query))
+    builder.add_node("validate_query", traced_node("validate_query", validate_query))
+    builder.add_node("run_query", traced_node("run_query", run_query_node))
     
     # Add edges
     builder.add_edge(START, "list_tables")
@@ -517,7 +521,7 @@ def build_agent():
     builder.add_edge("run_query", END)
     
     # Compile with checkpointer
-    checkpointer = MemorySaver()
+    checkpointer = get_checkpointer()
     agent = builder.compile(checkpointer=checkpointer)
     
     return agent
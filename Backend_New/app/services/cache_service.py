@@ -2,46 +2,112 @@
 Cache Service - ChromaDB-based Query Caching
 =============================================
 Semantic similarity caching for SQL queries.
+Hit/miss counters live in the shared state store. Entries live in the
+configured vector store (vector_store.py): a Chroma collection - local, or on
+a shared server with CHROMA_HOST - or memory-mapped NumPy matrices.
+
+Entries are keyed by the question's shape - literals masked by the slot
+extractor ("<status> tasks of <person> <date_range>") - and store the SQL
+parameterised ({person}, {date_from}, ...), so "pending tasks of Ramesh"
+answers "pending tasks of Suresh" with Suresh bound in. SQL whose literals
+can't be located is stored as-is and only reused for the same literals.
+
+Relative periods ("this week", "last month", "this financial year") are part
+of the key and stored as CURRENT_DATE expressions; SQL that still pins a
+recent date nobody asked for is not cached at all, so entries never go stale.
+
+Size stays bounded: hits are counted per entry (hit_count, last_hit_ts) and
+written back by a periodic compaction job, which also drops entries past their
+domain's TTL and evicts the least frequently / least recently used entries
+above CACHE_MAX_ENTRIES. Per-entry hits and lifetime hit/miss/eviction totals
+are added up with the state store's atomic counters, so workers flushing at
+once don't lose counts; the sums are copied into the vector store's metadata
+(hit_count for LFU ordering, total_* so the totals survive a restart of a
+memory state store).
+
+The async methods (aprobe, acache_query, ainvalidate) are what request
+handlers use: slot extraction, embedding and the Chroma call run in the
+vector executor, and concurrent lookups share batched, memoised embeddings
+(see embedding_service.py). The sync methods remain for worker threads.
 """
 
-import os
+import json
+import time
+import asyncio
 import hashlib
-from typing import Optional, Dict, Any
+import functools
+import threading
+import contextvars
+from collections import defaultdict
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
-try:
-    import chromadb
-    CHROMADB_AVAILABLE = True
-except ImportError:
-    CHROMADB_AVAILABLE = False
-    print("⚠️ ChromaDB not installed. Query caching disabled.")
+from app.core.config import settings
+from app.services.state_store import StateStore, state_store
+from app.services.embedding_service import EmbeddingService, embedding_service
+from app.services.vector_store import VectorStore, create_vector_store
+from app.services.slot_extractor import (
+    slot_extractor, normalize, parameterise_sql, bind_sql,
+    relative_date_sql, canonicalise_relative_dates, unexplained_dates
+)
 
 
 class QueryCacheService:
-    """Semantic query cache using ChromaDB"""
+    """Semantic query cache over a pluggable vector store"""
+    
+    # Shared counter keys
+    HITS_KEY = "query_cache:hits"
+    MISSES_KEY = "query_cache:misses"
+    TOTAL_PREFIX = "query_cache:total:"
+    ENTRY_HITS_PREFIX = "query_cache:entry_hits:"
+    
+    # Lifetime totals kept in the vector store metadata
+    PERSISTED_TOTALS = ["hits", "misses", "evicted", "expired"]
+    # Eviction trims down to this share of CACHE_MAX_ENTRIES so it doesn't run on every write
+    EVICTION_LOW_WATERMARK = 0.9
     
     def __init__(
         self,
-        persist_directory: str = "./chroma_cache",
+        persist_directory: str = settings.CHROMA_PERSIST_DIR,
         collection_name: str = "query_cache",
-        similarity_threshold: float = 0.92  # High threshold to prevent false matches (completed vs all)
+        similarity_threshold: float = settings.CACHE_SIMILARITY_THRESHOLD,
+        store: StateStore = None,
+        max_entries: int = settings.CACHE_MAX_ENTRIES,
+        eviction_policy: str = settings.CACHE_EVICTION_POLICY,
+        embedder: EmbeddingService = None,
+        vectors: VectorStore = None
     ):
+        # similarity = 1 / (1 + squared L2); on unit embeddings that is 1 / (3 - 2 cos),
+        # so 0.92 means cos >= 0.957 (benchmarks/cache_eval.py sweeps both scales)
         self.similarity_threshold = similarity_threshold
-        self.enabled = CHROMADB_AVAILABLE
-        self.cache_hits = 0
-        self.cache_misses = 0
+        self.threshold_by_domain = self._parse_domain_values(settings.CACHE_THRESHOLD_BY_DOMAIN, float)
+        self.store = store or state_store
+        self.embedder = embedder or embedding_service
+        self.max_entries = max_entries
+        self.eviction_policy = eviction_policy.lower()
+        self.ttl_by_domain = self._parse_domain_values(settings.CACHE_TTL_BY_DOMAIN, int)
+        
+        # Hits and totals not yet written back (flushed by compact()/flush())
+        self._pending_hits: Dict[str, int] = defaultdict(int)
+        self._pending_last_hit: Dict[str, float] = {}
+        self._pending_totals: Dict[str, int] = defaultdict(int)
+        self._pending_expired: set = set()
+        self._pending_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._compactor = None
+        self.last_compaction: Optional[Dict[str, Any]] = None
         
+        self.vectors = vectors or create_vector_store(
+            collection_name,
+            persist_directory=persist_directory,
+            metadata={"description": "SQL query cache"}
+        )
+        self.enabled = self.vectors is not None
         if not self.enabled:
             return
         
         try:
-            os.makedirs(persist_directory, exist_ok=True)
-            self.client = chromadb.PersistentClient(path=persist_directory)
-            self.collection = self.client.get_or_create_collection(
-                name=collection_name,
-                metadata={"description": "SQL query cache"}
-            )
-            print(f"✅ Cache initialized. Threshold: {similarity_threshold * 100}%, Entries: {self.collection.count()}")
+            print(f"✅ Cache initialized ({self.vectors.backend}). Threshold: {similarity_threshold * 100}%, Entries: {self.vectors.count()}")
         except Exception as e:
             print(f"❌ Cache init failed: {e}")
             self.enabled = False
@@ -50,83 +116,271 @@ class QueryCacheService:
         """Generate unique ID from question"""
         return hashlib.md5(question.lower().strip().encode()).hexdigest()
     
-    def find_similar_query(self, question: str, db_name: str = "checklist") -> Optional[Dict[str, Any]]:
-        """Find cached query with semantic similarity"""
+    @staticmethod
+    def _parse_domain_values(spec: str, cast) -> Dict[str, Any]:
+        """'checklist=604800,sagar_db=86400' -> {domain: value}"""
+        values = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            domain, _, value = item.partition("=")
+            try:
+                values[domain.strip()] = cast(value)
+            except ValueError:
+                print(f"[WARNING] Ignoring per-domain cache setting '{item}'")
+        return values
+    
+    def _ttl_for(self, db_name: str) -> int:
+        return self.ttl_by_domain.get(db_name, settings.CACHE_TTL_SECONDS)
+    
+    @staticmethod
+    def _cached_ts(metadata: Dict[str, Any]) -> float:
+        """Creation time of an entry (older entries only have the ISO cached_at)"""
+        if "cached_ts" in metadata:
+            return float(metadata["cached_ts"])
+        try:
+            return datetime.fromisoformat(metadata["cached_at"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return 0.0
+    
+    def _is_expired(self, metadata: Dict[str, Any], now: float) -> bool:
+        ttl = self._ttl_for(metadata.get("database", ""))
+        return ttl > 0 and self._cached_ts(metadata) + ttl < now
+    
+    def _shape(self, question: str) -> Dict[str, Any]:
+        """
+        Cache key parts of a question: the masked document (status words and
+        relative periods kept, so "pending ... this week" and "completed ...
+        last week" embed apart), its slots and flags. A relative period is
+        part of the key, not a slot - its SQL is stored CURRENT_DATE-relative.
+        """
+        try:
+            extracted = slot_extractor.extract(question)
+        except Exception as e:
+            print(f"[WARNING] Slot extraction failed, caching literally: {e}")
+            return {"document": question.lower().strip(), "slots": {}, "key_slots": {}, "date_kind": "", "status": "", "count": False}
+        
+        slots = extracted["slots"]
+        key_slots = dict(slots)
+        date_kind = ""
+        date_ranges = slots.get("date_range", [])
+        if len(date_ranges) == 1 and relative_date_sql(date_ranges[0]["kind"]):
+            date_kind = date_ranges[0]["kind"]
+            del key_slots["date_range"]
+        
+        if "status" in slots or "text" in slots:
+            document = normalize(question)  # Conflicting statuses / quoted text: literal match only
+        else:
+            document = extracted["masked"].replace("<status>", extracted["status"] or "<status>")
+            if date_kind:
+                document = document.replace("<date_range>", f"<{date_kind}>")
+        return {
+            "document": document,
+            "slots": slots,
+            "key_slots": key_slots,
+            "date_kind": date_kind,
+            "status": extracted["status"] or "",
+            "count": extracted["count"]
+        }
+    
+    def _slot_values(self, slots: Dict[str, List[Any]]) -> str:
+        return json.dumps(slots, sort_keys=True, default=str)
+    
+    def _entry_id(self, db_name: str, shape: Dict[str, Any], parameterised: bool) -> str:
+        key = f"{db_name}:{shape['document']}"
+        if not parameterised:
+            key += ":" + self._slot_values(shape["key_slots"])
+        return self._generate_id(key)
+    
+    def _compatible_filter(self, db_name: str, shape: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Chroma filter for entries that can answer this question: same slot
+        types, period, status and count intent, and either parameterised or
+        cached for exactly these literals (many literal entries share one
+        masked document, so this can't be left to the nearest neighbours).
+        """
+        return {"$and": [
+            {"database": db_name},
+            {"slot_types": ",".join(sorted(shape["key_slots"]))},
+            {"date_kind": shape["date_kind"]},
+            {"status": shape["status"]},
+            {"count": str(shape["count"]).lower()},
+            {"$or": [{"parameterised": "true"}, {"slot_values": self._slot_values(shape["key_slots"])}]}
+        ]}
+    
+    def _bind(self, metadata: Dict[str, Any], shape: Dict[str, Any]) -> Optional[str]:
+        """SQL of a cached entry for this question, or None if it can't answer it"""
+        if metadata.get("slot_types") != ",".join(sorted(shape["key_slots"])):
+            return None
+        if metadata.get("status", "") != shape["status"] or metadata.get("count") != str(shape["count"]).lower():
+            return None
+        if metadata.get("date_kind", "") != shape["date_kind"]:
+            return None
+        if metadata.get("parameterised") == "true":
+            return bind_sql(metadata["sql"], shape["key_slots"])
+        return metadata["sql"] if metadata.get("slot_values") == self._slot_values(shape["key_slots"]) else None
+    
+    def _embedding(self, shape: Dict[str, Any]) -> Any:
+        return self.embedder.embed([shape["document"]])[0]
+    
+    def probe(
+        self,
+        question: str,
+        db_name: str = "checklist",
+        shape: Optional[Dict[str, Any]] = None,
+        embedding: Any = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the closest cached entry for a domain with its similarity,
+        without applying the threshold or touching hit/miss statistics.
+        Used for speculative lookups across domains.
+        """
         if not self.enabled:
             return None
         
         try:
-            results = self.collection.query(
-                query_texts=[question.lower().strip()],
-                n_results=1,
-                include=["documents", "metadatas", "distances"],
-                where={"database": db_name}
+            shape = shape or self._shape(question)
+            if embedding is None:
+                embedding = self._embedding(shape)
+            rows = self.vectors.query(
+                embedding,
+                n_results=3,  # Nearest compatible entries; an expired one is skipped
+                where=self._compatible_filter(db_name, shape)
             )
             
-            if not results or not results['documents'] or not results['documents'][0]:
-                return None
-            
-            # Convert L2 distance to similarity
-            distance = results['distances'][0][0]
-            similarity = 1 / (1 + distance)
-            
-            if similarity >= self.similarity_threshold:
-                metadata = results['metadatas'][0][0]
-                cached_question = results['documents'][0][0]
-                
-                self.cache_hits += 1
-                print(f"🎯 CACHE HIT! Similarity: {similarity:.2%}")
-                print(f"   Cached: '{cached_question[:50]}...'")
-                print(f"   Current: '{question[:50]}...'")
+            now = time.time()
+            for entry_id, document, metadata, distance in rows:
+                if self._is_expired(metadata, now):
+                    with self._pending_lock:
+                        self._pending_expired.add(entry_id)
+                    continue
+                sql = self._bind(metadata, shape)
+                if not sql:
+                    continue
                 
+                # Squared L2 distance (both vector stores) -> similarity in (0, 1]
                 return {
-                    "cached_question": cached_question,
-                    "sql": metadata.get("sql"),
-                    "similarity": similarity,
+                    "id": entry_id,
+                    "cached_question": metadata.get("question", document),
+                    "sql": sql,
+                    "similarity": 1 / (1 + distance),
+                    "database": db_name,
+                    "parameterised": metadata.get("parameterised") == "true",
                     "cached_at": metadata.get("cached_at"),
                     "hit_count": int(metadata.get("hit_count", 0)) + 1
                 }
-            else:
-                self.cache_misses += 1
-                print(f"📭 Cache miss. Similarity: {similarity:.2%}")
-                return None
-                
+            return None
         except Exception as e:
             print(f"❌ Cache lookup error: {e}")
             return None
     
+    def threshold_for(self, db_name: str) -> float:
+        return self.threshold_by_domain.get(db_name, self.similarity_threshold)
+    
+    def is_hit(self, candidate: Optional[Dict[str, Any]]) -> bool:
+        """Whether a probed candidate clears its domain's similarity threshold"""
+        return bool(candidate) and candidate["similarity"] >= self.threshold_for(candidate["database"])
+    
+    def record_lookup(self, question: str, candidate: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Count a lookup as hit or miss and return the candidate only if it is a hit"""
+        if not self.enabled:
+            return None
+        
+        if self.is_hit(candidate):
+            self.store.incr(self.HITS_KEY)
+            with self._pending_lock:
+                self._pending_totals["hits"] += 1
+                if candidate.get("id"):
+                    self._pending_hits[candidate["id"]] += 1
+                    self._pending_last_hit[candidate["id"]] = time.time()
+            print(f"🎯 CACHE HIT! Similarity: {candidate['similarity']:.2%}")
+            print(f"   Cached: '{candidate['cached_question'][:50]}...'")
+            print(f"   Current: '{question[:50]}...'")
+            return candidate
+        
+        self.store.incr(self.MISSES_KEY)
+        with self._pending_lock:
+            self._pending_totals["misses"] += 1
+        if candidate:
+            print(f"📭 Cache miss. Similarity: {candidate['similarity']:.2%}")
+        return None
+    
+    def find_similar_query(self, question: str, db_name: str = "checklist") -> Optional[Dict[str, Any]]:
+        """Find cached query with semantic similarity"""
+        return self.record_lookup(question, self.probe(question, db_name))
+    
+    def prepare_entry(self, question: str, sql: str, db_name: str = "checklist", language: str = "english") -> Optional[Dict[str, Any]]:
+        """
+        The entry cache_query would store - id, shape and metadata - or None if
+        the SQL can't be cached (also used by the offline threshold evaluation).
+        """
+        shape = self._shape(question)
+        slots = shape["key_slots"]
+        if shape["date_kind"]:
+            sql = canonicalise_relative_dates(sql, shape["slots"]["date_range"][0])
+        
+        # SQL pinned to "now" would be served after the period ends
+        stray_dates = unexplained_dates(sql, question, slots)
+        if stray_dates:
+            print(f"⏭️ Not cached (SQL pins dates {', '.join(stray_dates)}): '{question[:50]}...'")
+            return None
+        
+        shape_sql = None
+        if slots and "text" not in slots and "status" not in slots and all(len(v) == 1 for v in slots.values()):
+            shape_sql = parameterise_sql(sql, slots)
+        
+        metadata = {
+            "sql": shape_sql or sql,
+            "question": question[:200],
+            "parameterised": "true" if shape_sql else "false",
+            "slot_types": ",".join(sorted(slots)),
+            "date_kind": shape["date_kind"],
+            "status": shape["status"],
+            "count": str(shape["count"]).lower(),
+            "language": language,
+            "database": db_name,
+            "cached_at": datetime.now().isoformat(),
+            "cached_ts": time.time()
+        }
+        if not shape_sql:
+            metadata["slot_values"] = self._slot_values(slots)
+        
+        # ID specific to this database context (one entry per shape when parameterised)
+        return {"id": self._entry_id(db_name, shape, shape_sql is not None), "shape": shape, "metadata": metadata}
+    
     def cache_query(self, question: str, sql: str, db_name: str = "checklist", language: str = "english") -> bool:
         """Cache question-SQL mapping"""
         if not self.enabled:
             return False
         
         try:
-            # Generate ID specific to this database context
-            doc_id = self._generate_id(f"{db_name}:{question}")
-            existing = self.collection.get(ids=[doc_id])
+            entry = self.prepare_entry(question, sql, db_name, language)
+            if entry is None:
+                return False
+            doc_id, shape, metadata = entry["id"], entry["shape"], entry["metadata"]
+            shape_sql = metadata["parameterised"] == "true"
             
-            metadata = {
-                "sql": sql,
-                "language": language,
-                "database": db_name,
-                "cached_at": datetime.now().isoformat(),
-                "hit_count": "0"
-            }
+            # Popularity survives an SQL refresh of the same entry
+            previous = self.vectors.get([doc_id]).get(doc_id)
+            metadata["hit_count"] = int((previous or {}).get("hit_count", 0))
+            metadata["last_hit_ts"] = float((previous or {}).get("last_hit_ts", 0.0))
             
-            if existing and existing['ids']:
-                self.collection.update(
+            if previous is not None:
+                self.vectors.update(
                     ids=[doc_id],
-                    documents=[question.lower().strip()],
+                    documents=[shape["document"]],
+                    embeddings=[self._embedding(shape)],
                     metadatas=[metadata]
                 )
-                print(f"📝 Cache updated: '{question[:50]}...'")
+                print(f"📝 Cache updated: '{shape['document'][:50]}...'")
             else:
-                self.collection.add(
+                self.vectors.add(
                     ids=[doc_id],
-                    documents=[question.lower().strip()],
+                    documents=[shape["document"]],
+                    embeddings=[self._embedding(shape)],
                     metadatas=[metadata]
                 )
-                print(f"💾 Cached: '{question[:50]}...'")
+                print(f"💾 Cached{' (parameterised)' if shape_sql else ''}: '{shape['document'][:50]}...'")
+                if self.max_entries and self.vectors.count() > self.max_entries:
+                    threading.Thread(target=self.compact, name="cache-eviction", daemon=True).start()
             
             return True
         except Exception as e:
@@ -139,29 +393,265 @@ class QueryCacheService:
             return False
         
         try:
-            doc_id = self._generate_id(f"{db_name}:{question}")
-            self.collection.delete(ids=[doc_id])
+            # Shape entry, literal entry and any entry from before literal-aware caching
+            shape = self._shape(question)
+            doc_ids = list(dict.fromkeys([  # Without slots the literal and old ids coincide
+                self._entry_id(db_name, shape, True),
+                self._entry_id(db_name, shape, False),
+                self._generate_id(f"{db_name}:{question}")
+            ]))
+            self.vectors.delete(doc_ids)
+            self._forget_hits(doc_ids)
             print(f"🗑️ Cache invalidated: '{question[:50]}...'")
             return True
         except Exception as e:
             print(f"❌ Cache invalidation error: {e}")
             return False
     
+    # ------------------------------------------------------------------------
+    # ASYNC API (request handlers)
+    # ------------------------------------------------------------------------
+    
+    async def _run(self, func, *args):
+        """Run a blocking cache call in the vector executor, inside the caller's trace span"""
+        call = functools.partial(contextvars.copy_context().run, func, *args)
+        return await asyncio.get_running_loop().run_in_executor(self.embedder.executor, call)
+    
+    async def aprobe(self, question: str, db_name: str = "checklist") -> Optional[Dict[str, Any]]:
+        """probe() off the event loop, with the embedding batched across concurrent lookups"""
+        if not self.enabled:
+            return None
+        try:
+            shape = await self._run(self._shape, question)
+            embedding = await self.embedder.aembed(shape["document"])
+        except Exception as e:
+            print(f"❌ Cache lookup error: {e}")
+            return None
+        return await self._run(self.probe, question, db_name, shape, embedding)
+    
+    async def afind_similar_query(self, question: str, db_name: str = "checklist") -> Optional[Dict[str, Any]]:
+        return self.record_lookup(question, await self.aprobe(question, db_name))
+    
+    async def acache_query(self, question: str, sql: str, db_name: str = "checklist", language: str = "english") -> bool:
+        if not self.enabled:
+            return False
+        return await self._run(self.cache_query, question, sql, db_name, language)
+    
+    async def ainvalidate(self, question: str, db_name: str = "checklist") -> bool:
+        if not self.enabled:
+            return False
+        return await self._run(self.invalidate, question, db_name)
+    
+    # ------------------------------------------------------------------------
+    # HIT WRITE-BACK, TTL & EVICTION
+    # ------------------------------------------------------------------------
+    
+    def _lifetime_totals(self) -> Dict[str, int]:
+        """Lifetime totals: the shared counters, or the metadata copy if those were lost"""
+        metadata = self.vectors.get_metadata()
+        return {
+            name: max(self.store.get_counter(f"{self.TOTAL_PREFIX}{name}"), int(metadata.get(f"total_{name}", 0)))
+            for name in self.PERSISTED_TOTALS
+        }
+    
+    def _add(self, key: str, amount: int, persisted: int) -> int:
+        """Add to a shared counter and return the sum; the first add after the counter was lost restores the persisted copy"""
+        total = self.store.incr(key, amount)
+        if amount and total == amount and persisted > total:
+            total = self.store.incr(key, persisted)  # Only one adder can see its own amount as the sum
+        return total
+    
+    def _forget_hits(self, entry_ids: List[str]) -> None:
+        """Drop the hit counters of deleted entries"""
+        for entry_id in entry_ids:
+            try:
+                self.store.delete(f"{self.ENTRY_HITS_PREFIX}{entry_id}")
+            except Exception as e:
+                print(f"[WARNING] Cache hit counter delete failed: {e}")
+    
+    def flush(self) -> Dict[str, int]:
+        """Add buffered per-entry hits and lifetime totals to the shared counters and copy the sums to the vector store"""
+        if not self.enabled:
+            return {}
+        
+        with self._pending_lock:
+            hits, self._pending_hits = self._pending_hits, defaultdict(int)
+            last_hit, self._pending_last_hit = self._pending_last_hit, {}
+            totals, self._pending_totals = self._pending_totals, defaultdict(int)
+        
+        # Whatever isn't written goes back in the buffer; a count is never added twice
+        unwritten_hits: Dict[str, int] = {}
+        unwritten_totals: Dict[str, int] = {}
+        flushed = 0
+        try:
+            found = self.vectors.get(list(hits)) if hits else {}
+        except Exception as e:
+            print(f"❌ Cache stats flush error: {e}")
+            found, unwritten_hits = {}, dict(hits)
+        
+        updates = []
+        for entry_id, metadata in found.items():
+            try:
+                hit_count = self._add(f"{self.ENTRY_HITS_PREFIX}{entry_id}", hits[entry_id], int(metadata.get("hit_count", 0)))
+            except Exception as e:
+                print(f"❌ Cache hit counter error: {e}")
+                unwritten_hits[entry_id] = hits[entry_id]
+                continue
+            flushed += hits[entry_id]
+            updates.append((entry_id, {
+                "hit_count": hit_count,
+                "last_hit_ts": max(float(metadata.get("last_hit_ts", 0.0)), last_hit.get(entry_id, 0.0))
+            }))
+        if updates:
+            try:
+                self.vectors.update(ids=[u[0] for u in updates], metadatas=[u[1] for u in updates])
+            except Exception as e:
+                print(f"❌ Cache hit write-back error: {e}")
+                for entry_id, _ in updates:
+                    unwritten_hits.setdefault(entry_id, 0)  # Counted; copy the sum next time
+        
+        if any(totals.values()):
+            try:
+                metadata = self.vectors.get_metadata()
+            except Exception as e:
+                print(f"❌ Cache stats flush error: {e}")
+                metadata, unwritten_totals = None, dict(totals)
+            if metadata is not None:
+                for name, count in totals.items():
+                    if not count:
+                        continue
+                    try:
+                        total = self._add(f"{self.TOTAL_PREFIX}{name}", count, int(metadata.get(f"total_{name}", 0)))
+                    except Exception as e:
+                        print(f"❌ Cache total counter error: {e}")
+                        unwritten_totals[name] = count
+                        continue
+                    metadata[f"total_{name}"] = max(int(metadata.get(f"total_{name}", 0)), total)
+                try:
+                    self.vectors.set_metadata(metadata)
+                except Exception as e:
+                    # The shared counters hold the sums; the copy is refreshed on the next flush
+                    print(f"❌ Cache totals write-back error: {e}")
+        
+        if unwritten_hits or unwritten_totals:
+            with self._pending_lock:
+                for entry_id, count in unwritten_hits.items():
+                    self._pending_hits[entry_id] += count
+                    if entry_id in last_hit:
+                        self._pending_last_hit[entry_id] = max(last_hit[entry_id], self._pending_last_hit.get(entry_id, 0.0))
+                for name, count in unwritten_totals.items():
+                    self._pending_totals[name] += count
+        return {"flushed_hits": flushed}
+    
+    def _eviction_key(self, metadata: Dict[str, Any]):
+        last_used = max(float(metadata.get("last_hit_ts", 0.0)), self._cached_ts(metadata))
+        if self.eviction_policy == "lru":
+            return (last_used,)
+        return (int(metadata.get("hit_count", 0)), last_used)  # LFU, ties by recency
+    
+    def compact(self) -> Optional[Dict[str, Any]]:
+        """
+        Flush hit counts, drop entries past their domain TTL and evict down to
+        the low watermark when over CACHE_MAX_ENTRIES. Returns a summary, or
+        None if another compaction is already running in this process.
+        """
+        if not self.enabled or not self._compaction_lock.acquire(blocking=False):
+            return None
+        
+        try:
+            started = time.perf_counter()
+            summary = self.flush()
+            with self._pending_lock:
+                self._pending_expired.clear()
+            
+            now = time.time()
+            live, expired = [], []
+            for entry_id, metadata in self.vectors.get().items():
+                (expired if self._is_expired(metadata, now) else live).append((entry_id, metadata))
+            
+            evicted = []
+            if self.max_entries and len(live) > self.max_entries:
+                live.sort(key=lambda entry: self._eviction_key(entry[1]))
+                evicted = live[:len(live) - int(self.max_entries * self.EVICTION_LOW_WATERMARK)]
+            
+            deleted = [entry_id for entry_id, _ in expired + evicted]
+            self.vectors.delete(deleted)
+            self._forget_hits(deleted)
+            with self._pending_lock:
+                self._pending_totals["expired"] += len(expired)
+                self._pending_totals["evicted"] += len(evicted)
+            self.flush()
+            
+            summary.update({
+                "expired": len(expired),
+                "evicted": len(evicted),
+                "entries": len(live) - len(evicted),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "finished_at": datetime.now().isoformat()
+            })
+            self.last_compaction = summary
+            if expired or evicted:
+                print(f"🧹 Cache compaction: {len(expired)} expired, {len(evicted)} evicted ({self.eviction_policy}), {summary['entries']} left")
+            return summary
+        except Exception as e:
+            print(f"❌ Cache compaction error: {e}")
+            return None
+        finally:
+            self._compaction_lock.release()
+    
+    def start_compactor(self, interval_seconds: float = settings.CACHE_COMPACTION_INTERVAL_SECONDS) -> None:
+        """Run compact() periodically in a daemon thread"""
+        if not self.enabled or interval_seconds <= 0:
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        
+        def loop():
+            while True:
+                time.sleep(interval_seconds)
+                self.compact()
+        
+        self._compactor = threading.Thread(target=loop, name="cache-compactor", daemon=True)
+        self._compactor.start()
+        print(f"✅ Cache compaction every {interval_seconds:.0f}s (max {self.max_entries} entries, {self.eviction_policy})")
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
         if not self.enabled:
             return {"total_queries": 0, "enabled": False}
         
-        total_requests = self.cache_hits + self.cache_misses
-        hit_rate = (self.cache_hits / total_requests * 100) if total_requests > 0 else 0.0
+        cache_hits = self.store.get_counter(self.HITS_KEY)
+        cache_misses = self.store.get_counter(self.MISSES_KEY)
+        total_requests = cache_hits + cache_misses
+        hit_rate = (cache_hits / total_requests * 100) if total_requests > 0 else 0.0
+        
+        try:
+            lifetime = self._lifetime_totals()
+        except Exception as e:
+            print(f"❌ Cache stats read error: {e}")
+            lifetime = {name: 0 for name in self.PERSISTED_TOTALS}
+        with self._pending_lock:
+            for name in self.PERSISTED_TOTALS:
+                lifetime[name] += self._pending_totals.get(name, 0)
+        lifetime_lookups = lifetime["hits"] + lifetime["misses"]
         
         return {
-            "total_queries": self.collection.count(),
+            "total_queries": self.vectors.count(),
             "enabled": True,
+            "backend": self.vectors.backend,
             "threshold": self.similarity_threshold,
-            "cache_hits": self.cache_hits,
-            "cache_misses": self.cache_misses,
-            "hit_rate": hit_rate
+            "threshold_by_domain": self.threshold_by_domain,
+            "cache_hits": cache_hits,
+            "cache_misses": cache_misses,
+            "hit_rate": hit_rate,
+            "max_entries": self.max_entries,
+            "eviction_policy": self.eviction_policy,
+            "lifetime": {
+                **lifetime,
+                "hit_rate": (lifetime["hits"] / lifetime_lookups * 100) if lifetime_lookups > 0 else 0.0
+            },
+            "last_compaction": self.last_compaction,
+            "embeddings": self.embedder.get_stats()
         }
     
     def clear(self) -> bool:
@@ -170,11 +660,11 @@ class QueryCacheService:
             return False
         
         try:
-            self.client.delete_collection(self.collection.name)
-            self.collection = self.client.get_or_create_collection(
-                name=self.collection.name,
-                metadata={"description": "SQL query cache"}
-            )
+            # Entries go, lifetime totals stay
+            self.flush()
+            entry_ids = list(self.vectors.get())
+            self.vectors.clear()
+            self._forget_hits(entry_ids)
             print("🧹 Cache cleared")
             return True
         except Exception as e:
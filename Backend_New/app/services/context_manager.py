@@ -2,124 +2,271 @@
 Context Manager - Conversation Context Tracking
 ===============================================
 Tracks entities and filters from previous queries for follow-ups.
+
+Contexts are kept in a bounded LRU (CONTEXT_MAX_SESSIONS entries,
+CONTEXT_MAX_BYTES of serialized context) with an idle TTL
+(CONTEXT_TTL_SECONDS): every read or write of a session's context extends it.
+With a shared state backend the shared store is the source of truth: writes
+go to both, and reads go to the store, so a worker never serves a
+context another worker has since replaced. There the TTL counts from the
+last write. The local copy is only used if the store can't be reached.
 """
 
-from typing import Dict, Any, List
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import json
 import re
+import threading
+import time
+
+from app.core.config import settings
+from app.services.state_store import StateStore, state_store
+
+
+# ============================================================================
+# PRECOMPILED EXTRACTION PATTERNS (compiled once, not per answer)
+# ============================================================================
+
+USER_PATTERN = re.compile(r"WHERE.*?LOWER\(.*?name.*?\)\s*=\s*LOWER\('([^']+)'\)", re.IGNORECASE | re.DOTALL)
+DEPARTMENT_PATTERN = re.compile(r"department\s*=\s*'([^']+)'", re.IGNORECASE)
+DATE_PATTERN = re.compile(r"(task_start_date|created_at|planned_date).*?>=\s*'([^']+)'", re.IGNORECASE)
+STATUS_PATTERN = re.compile(r"status\s*=\s*'([^']+)'", re.IGNORECASE)
+GROUP_BY_PATTERN = re.compile(r"GROUP BY\s+(\w+\.)?(\w+)", re.IGNORECASE)
+FROM_PATTERN = re.compile(r"FROM\s+([\w]+)", re.IGNORECASE)
+AGGREGATION_PATTERN = re.compile(r'\b(COUNT|SUM|AVG|MAX|MIN)\s*\(', re.IGNORECASE)
+
+# Follow-up indicators for build_context_hint
+FOLLOW_UP_PATTERNS = [
+    re.compile(r'\b(how many|count)\b'),
+    re.compile(r'\b(show|display)\b.*\b(that|those|their)\b'),
+    re.compile(r'\b(completed|pending|done)\b'),
+    re.compile(r'\b(also|and)\b'),
+    re.compile(r'\b(what about)\b'),
+    re.compile(r'\b(versus|vs)\b')
+]
+STARTS_WITH_PREP_PATTERN = re.compile(r'^\s*(of|for|from|in|with|to)\b')
+EXPLICIT_FILTER_PATTERNS = [
+    re.compile(r'\bfor\s+\w+'),
+    re.compile(r'\bof\s+\w+'),
+    re.compile(r'\bin\s+\w+')
+]
 
 
 class ContextManager:
     """Manage conversation context across queries"""
-    
-    def __init__(self):
-        self.contexts: Dict[str, Dict[str, Any]] = {}
-    
+
+    def __init__(
+        self,
+        store: StateStore = None,
+        max_sessions: int = settings.CONTEXT_MAX_SESSIONS,
+        max_bytes: int = settings.CONTEXT_MAX_BYTES,
+        ttl_seconds: int = settings.CONTEXT_TTL_SECONDS,
+        hints_enabled: bool = settings.CONTEXT_HINTS_ENABLED
+    ):
+        self.store = store or state_store
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hints_enabled = hints_enabled
+
+        # session_id -> (context, expires_at, size_bytes), least recently used first
+        self._contexts: "OrderedDict[str, Tuple[Dict[str, Any], float, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+        self.expirations = 0
+        self.hint_calls = 0
+        self.hints_emitted = 0
+        self.hint_time_ms = 0.0
+        self.hint_chars = 0
+
+    def _key(self, session_id: str) -> str:
+        return f"context:{session_id}"
+
+    # ------------------------------------------------------------------------
+    # BOUNDED LRU + TTL STORE
+    # ------------------------------------------------------------------------
+
+    def _remove_local(self, session_id: str) -> None:
+        entry = self._contexts.pop(session_id, None)
+        if entry:
+            self._total_bytes -= entry[2]
+
+    def _put_local(self, session_id: str, context: Dict[str, Any], size: int) -> None:
+        with self._lock:
+            self._remove_local(session_id)
+            self._contexts[session_id] = (context, time.time() + self.ttl_seconds, size)
+            self._total_bytes += size
+
+            # Evict least recently used until within both bounds
+            while self._contexts and (
+                len(self._contexts) > self.max_sessions or self._total_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._contexts))
+                self._remove_local(oldest)
+                self.evictions += 1
+
+    def _get_local(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._contexts.get(session_id)
+            if entry is None:
+                return None
+            now = time.time()
+            if entry[1] <= now:
+                self._remove_local(session_id)
+                self.expirations += 1
+                return None
+            # Idle TTL: each use extends the expiry
+            self._contexts[session_id] = (entry[0], now + self.ttl_seconds, entry[2])
+            self._contexts.move_to_end(session_id)
+            return entry[0]
+
     def extract_and_store(self, session_id: str, question: str, sql: str) -> None:
         """Extract and store context from query"""
         if not session_id:
             return
-        
-        context = self.contexts.get(session_id, {})
-        
+
+        context = dict(self.get_context(session_id))
+
         # Extract user name
-        user_match = re.search(r"WHERE.*?LOWER\(.*?name.*?\)\s*=\s*LOWER\('([^']+)'\)", sql, re.IGNORECASE | re.DOTALL)
+        user_match = USER_PATTERN.search(sql)
         if user_match:
             context['last_user'] = user_match.group(1)
-        
+
         # Extract department
-        dept_match = re.search(r"department\s*=\s*'([^']+)'", sql, re.IGNORECASE)
+        dept_match = DEPARTMENT_PATTERN.search(sql)
         if dept_match:
             context['last_department'] = dept_match.group(1)
-        
+
         # Extract date filter
-        date_match = re.search(r"(task_start_date|created_at|planned_date).*?>=\s*'([^']+)'", sql, re.IGNORECASE)
+        date_match = DATE_PATTERN.search(sql)
         if date_match:
             context['last_date_column'] = date_match.group(1)
             context['last_date'] = date_match.group(2)
-        
+
         # Extract status filter
-        status_match = re.search(r"status\s*=\s*'([^']+)'", sql, re.IGNORECASE)
+        status_match = STATUS_PATTERN.search(sql)
         if status_match:
             context['last_status'] = status_match.group(1)
-        
+
         # Store GROUP BY dimension
-        group_match = re.search(r"GROUP BY\s+(\w+\.)?(\w+)", sql, re.IGNORECASE)
+        group_match = GROUP_BY_PATTERN.search(sql)
         if group_match:
             context['last_group_by'] = group_match.group(2)
-        
+
         # Store table
-        from_match = re.search(r"FROM\s+([\w]+)", sql, re.IGNORECASE)
+        from_match = FROM_PATTERN.search(sql)
         if from_match:
             context['last_table'] = from_match.group(1)
-        
+
         # Store if aggregation
-        context['was_aggregation'] = bool(re.search(r'\b(COUNT|SUM|AVG|MAX|MIN)\s*\(', sql, re.IGNORECASE))
+        context['was_aggregation'] = bool(AGGREGATION_PATTERN.search(sql))
         context['last_question'] = question.lower()
-        
-        self.contexts[session_id] = context
-    
+
+        size = len(json.dumps(context, default=str))
+        self._put_local(session_id, context, size)
+
+        if self.store.shared:
+            self.store.set(self._key(session_id), context, ttl=self.ttl_seconds)
+
     def get_context(self, session_id: str) -> Dict[str, Any]:
         """Get stored context for session"""
-        return self.contexts.get(session_id, {})
-    
+        if not self.store.shared:
+            return self._get_local(session_id) or {}
+
+        # Another worker may have replaced it since: the shared store decides
+        try:
+            context = self.store.get(self._key(session_id))
+        except Exception as e:
+            print(f"[WARNING] Shared context read failed, using local copy: {e}")
+            return self._get_local(session_id) or {}
+        if context:
+            self._put_local(session_id, context, len(json.dumps(context, default=str)))
+            return context
+        with self._lock:
+            self._remove_local(session_id)  # Expired or cleared in the store
+        return {}
+
     def build_context_hint(self, session_id: str, current_question: str) -> str:
-        """Build context hint for SQL generation"""
-        return "" # DISABLE CONTEXT TEMPORARILY
-        
+        """Build context hint for SQL generation (CONTEXT_HINTS_ENABLED)"""
+        if not self.hints_enabled:
+            return ""
+
+        started = time.perf_counter()
+        hint = self._build_context_hint(session_id, current_question)
+
+        # Measure cost: latency here plus prompt characters added downstream
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.hint_calls += 1
+            self.hint_time_ms += elapsed_ms
+            if hint:
+                self.hints_emitted += 1
+                self.hint_chars += len(hint)
+        return hint
+
+    def _build_context_hint(self, session_id: str, current_question: str) -> str:
         context = self.get_context(session_id)
         if not context:
             return ""
-        
+
         question_lower = current_question.lower()
         hints = []
-        
-        # Check for follow-up indicators
-        follow_up_patterns = [
-            r'\b(how many|count)\b',
-            r'\b(show|display)\b.*\b(that|those|their)\b',
-            r'\b(completed|pending|done)\b',
-            r'\b(also|and)\b',
-            r'\b(what about)\b',
-            r'\b(versus|vs)\b'
-        ]
-        
+
         # Check if starts with preposition (implicit continuation)
-        starts_with_prep = re.match(r'^\s*(of|for|from|in|with|to)\b', question_lower)
-        
-        is_follow_up = any(re.search(pattern, question_lower) for pattern in follow_up_patterns) or bool(starts_with_prep)
-        
+        starts_with_prep = STARTS_WITH_PREP_PATTERN.match(question_lower)
+
+        is_follow_up = any(pattern.search(question_lower) for pattern in FOLLOW_UP_PATTERNS) or bool(starts_with_prep)
+
         # Check if question lacks explicit filters
-        lacks_filters = not any([
-            re.search(r'\bfor\s+\w+', question_lower),
-            re.search(r'\bof\s+\w+', question_lower),
-            re.search(r'\bin\s+\w+', question_lower)
-        ])
-        
+        lacks_filters = not any(pattern.search(question_lower) for pattern in EXPLICIT_FILTER_PATTERNS)
+
         if is_follow_up or lacks_filters:
             if context.get('last_user'):
                 hints.append(f"🔍 Previous user: name = '{context['last_user']}'")
-            
+
             if context.get('last_department'):
                 hints.append(f"🏢 Previous dept: department = '{context['last_department']}'")
-            
+
             if context.get('last_status'):
                 hints.append(f"✅ Previous status: status = '{context['last_status']}'")
-            
+
             if context.get('last_date'):
                 hints.append(f"📅 Previous date: {context['last_date_column']} >= '{context['last_date']}'")
-            
+
             if context.get('last_group_by'):
                 hints.append(f"📊 Previous grouping: GROUP BY {context['last_group_by']}")
-        
+
         if hints:
             return "\n⚠️ CONTEXT FROM PREVIOUS QUERY:\n" + "\n".join(hints) + "\n\n"
-        
+
         return ""
-    
+
     def clear_context(self, session_id: str) -> None:
         """Clear context for session"""
-        if session_id in self.contexts:
-            del self.contexts[session_id]
+        with self._lock:
+            self._remove_local(session_id)
+        if self.store.shared:
+            self.store.delete(self._key(session_id))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Context store size and context-hint cost"""
+        with self._lock:
+            return {
+                "sessions": len(self._contexts),
+                "max_sessions": self.max_sessions,
+                "memory_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hints_enabled": self.hints_enabled,
+                "hint_calls": self.hint_calls,
+                "hints_emitted": self.hints_emitted,
+                "avg_hint_ms": (self.hint_time_ms / self.hint_calls) if self.hint_calls else 0.0,
+                "avg_hint_chars": (self.hint_chars / self.hints_emitted) if self.hints_emitted else 0.0
+            }
 
 
 # Global instance
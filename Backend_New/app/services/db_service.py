@@ -5,12 +5,11 @@ Direct query execution and metadata loading for LLM-guided SQL generation
 """
 
 from typing import List, Dict, Any, Optional
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import json
 import os
 from pathlib import Path
 from app.core.config import settings
+from app.core.database import get_engine
 from app.core.column_restrictions import ALLOWED_COLUMNS, filter_schema_columns
 
 
@@ -129,31 +128,36 @@ def execute_query(sql: str) -> List[Dict[str, Any]]:
     Returns:
         List of row dictionaries
     """
-    conn = None
     try:
-        # Connect to database
-        conn = psycopg2.connect(
-            host=settings.DB_HOST,
-            port=settings.DB_PORT,
-            database=settings.DB_NAME,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD
-        )
-        
-        # Use RealDictCursor to get results as dictionaries
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute(sql)
-            results = cursor.fetchall()
+        # Borrow a connection from the shared pool (returned on exit)
+        with get_engine().connect() as conn:
+            # no_parameters: pass SQL to the driver verbatim ('%' and ':' in literals are safe)
+            result = conn.exec_driver_sql(sql, execution_options={"no_parameters": True})
             
-            # Convert RealDictRow to regular dict
-            return [dict(row) for row in results]
+            # Convert rows to regular dicts
+            return [dict(row._mapping) for row in result]
             
     except Exception as e:
         print(f"[DB ERROR] Query execution failed: {e}")
         raise
-    finally:
-        if conn:
-            conn.close()
+
+
+def count_result_rows(result: Any) -> int:
+    """
+    Count rows in a query result (for tracing)
+    
+    Args:
+        result: List of rows, or the string returned by the sql_db_query tool
+        
+    Returns:
+        Number of rows (0 for empty or error results)
+    """
+    if isinstance(result, list):
+        return len(result)
+    text = str(result).strip()
+    if not text.startswith("[("):
+        return 0
+    return text.count("), (") + 1
 
 
 def get_table_row_count(table_name: str) -> int:
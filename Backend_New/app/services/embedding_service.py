@@ -0,0 +1,200 @@
+"""
+Embedding Service - Batched, Memoised Question Embeddings
+=========================================================
+Embeds cache documents for vector search off the event loop.
+
+Chroma's default embedding function builds a fresh ONNX MiniLM model on every
+call and runs it on the calling thread, so each cache lookup or write used to
+block the event loop while the model loaded. This service holds one model
+instance, pre-loaded at startup (`warm_up`), and runs it in a dedicated
+executor that the query cache also uses for its vector search.
+
+- `aembed`: concurrent requests arriving within EMBEDDING_BATCH_WINDOW_MS are
+  embedded in one model call (up to EMBEDDING_MAX_BATCH texts)
+- `embed`: synchronous, for callers already off the event loop
+- both memoise the EMBEDDING_MEMO_SIZE most recent texts, so the speculative
+  per-domain probes and the write after a miss embed a question only once
+
+The vectors are the same MiniLM vectors Chroma computes by default, so
+entries cached before this service existed stay comparable.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+try:
+    from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+    EMBEDDINGS_AVAILABLE = True
+except ImportError:
+    EMBEDDINGS_AVAILABLE = False
+
+
+# Embedding and vector search share this pool; it never runs request handlers
+vector_executor = ThreadPoolExecutor(
+    max_workers=settings.VECTOR_EXECUTOR_WORKERS,
+    thread_name_prefix="vector"
+)
+
+
+def _default_function() -> Any:
+    """Chroma's default MiniLM model, held once so it loads once"""
+    if not EMBEDDINGS_AVAILABLE:
+        return None
+    try:
+        return ONNXMiniLM_L6_V2()
+    except ValueError as e:  # onnxruntime / tokenizers missing
+        print(f"⚠️ Embedding model unavailable: {e}")
+        return None
+
+
+class EmbeddingService:
+    """One pre-loaded embedding model with request batching and a memo"""
+
+    def __init__(
+        self,
+        function: Any = None,
+        executor: ThreadPoolExecutor = vector_executor,
+        batch_window_ms: float = settings.EMBEDDING_BATCH_WINDOW_MS,
+        max_batch: int = settings.EMBEDDING_MAX_BATCH,
+        memo_size: int = settings.EMBEDDING_MEMO_SIZE
+    ):
+        self.function = function if function is not None else _default_function()
+        self.executor = executor
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self.memo_size = memo_size
+
+        self._memo: "OrderedDict[str, Any]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+        # Texts waiting for the next batch -> futures of the requests asking for them
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+        self.warm = False
+        self.stats = {"memo_hits": 0, "embedded": 0, "batches": 0, "max_batch_seen": 0, "model_ms": 0.0}
+
+    # ------------------------------------------------------------------------
+    # SYNCHRONOUS (worker threads)
+    # ------------------------------------------------------------------------
+
+    def _memo_get(self, text: str) -> Optional[Any]:
+        with self._memo_lock:
+            vector = self._memo.get(text)
+            if vector is not None:
+                self._memo.move_to_end(text)
+                self.stats["memo_hits"] += 1
+            return vector
+
+    def _memo_put(self, texts: List[str], vectors: List[Any]) -> None:
+        with self._memo_lock:
+            for text, vector in zip(texts, vectors):
+                self._memo[text] = vector
+                self._memo.move_to_end(text)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def embed(self, texts: List[str]) -> List[Any]:
+        """Embed texts in one model call, reusing memoised vectors"""
+        if self.function is None:
+            raise RuntimeError("No embedding model available")
+
+        vectors = {text: self._memo_get(text) for text in dict.fromkeys(texts)}
+        missing = [text for text, vector in vectors.items() if vector is None]
+        if missing:
+            started = time.perf_counter()
+            computed = list(self.function(missing))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._memo_put(missing, computed)
+            vectors.update(zip(missing, computed))
+            with self._memo_lock:
+                self.stats["embedded"] += len(missing)
+                self.stats["batches"] += 1
+                self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(missing))
+                self.stats["model_ms"] += elapsed_ms
+        return [vectors[text] for text in texts]
+
+    def warm_up(self) -> bool:
+        """Load the model now instead of on the first request"""
+        if self.function is None:
+            return False
+        try:
+            started = time.perf_counter()
+            self.function(["warm up"])
+            self.warm = True
+            print(f"🔥 Embedding model loaded in {(time.perf_counter() - started) * 1000:.0f}ms")
+            return True
+        except Exception as e:
+            print(f"⚠️ Embedding model warm-up failed (will load on first use): {e}")
+            return False
+
+    # ------------------------------------------------------------------------
+    # ASYNC (event loop)
+    # ------------------------------------------------------------------------
+
+    async def aembed(self, text: str) -> Any:
+        """Embed one text, batched with other requests arriving in the same window"""
+        vector = self._memo_get(text)
+        if vector is not None:
+            return vector
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(text, []).append(future)
+        if len(self._pending) >= self.max_batch:
+            self._flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush, loop)
+        return await future
+
+    async def awarm_up(self) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.warm_up)
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Send every pending text to the executor as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+
+        texts = list(batch)
+
+        def deliver(result: asyncio.Future) -> None:
+            error = result.exception() if not result.cancelled() else asyncio.CancelledError()
+            vectors = result.result() if error is None else [None] * len(texts)
+            for text, vector in zip(texts, vectors):
+                for waiter in batch[text]:
+                    if waiter.done():
+                        continue  # Request was cancelled while waiting
+                    if error is not None:
+                        waiter.set_exception(error)
+                    else:
+                        waiter.set_result(vector)
+
+        loop.run_in_executor(self.executor, self.embed, texts).add_done_callback(deliver)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._memo_lock:
+            stats = dict(self.stats)
+            memo_entries = len(self._memo)
+        lookups = stats["memo_hits"] + stats["embedded"]
+        return {
+            **stats,
+            "model_ms": round(stats["model_ms"], 1),
+            "memo_entries": memo_entries,
+            "memo_hit_rate": round(stats["memo_hits"] / lookups * 100, 2) if lookups else 0,
+            "avg_batch": round(stats["embedded"] / stats["batches"], 2) if stats["batches"] else 0,
+            "warm": self.warm
+        }
+
+
+# Global instance
+embedding_service = EmbeddingService()
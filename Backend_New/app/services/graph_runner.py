@@ -0,0 +1,71 @@
+"""
+Graph Runner - LangGraph Pipelines off the Event Loop
+=====================================================
+The domain graphs are synchronous: `app.stream()` runs every node (LLM calls,
+hedging, schema lookups, SQL) on the calling thread. Iterated inside the
+async chat pipeline, that froze the worker's event loop for the whole graph:
+other requests' streams, polls and health checks waited until it finished.
+
+stream_graph() runs the graph in a dedicated pool of GRAPH_EXECUTOR_WORKERS
+threads and hands each update back to the event loop as it is produced:
+
+- nodes run in a copy of the request's context, so the LLM deadline and the
+  current trace span still apply
+- blocking waits in the nodes (LLM concurrency slots, hedges, retry backoff)
+  happen on graph threads and no longer stall the loop
+- when the consumer stops (client gone, cancelled run) the graph stops after
+  its current node
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator
+
+from app.core.config import settings
+
+# Graph runs only; LLM hedges and vector work have their own pools
+graph_executor = ThreadPoolExecutor(
+    max_workers=settings.GRAPH_EXECUTOR_WORKERS,
+    thread_name_prefix="graph"
+)
+
+_END = object()
+
+
+async def stream_graph(graph: Any, graph_input: Any, config: Any = None, **options) -> AsyncGenerator[Any, None]:
+    """graph.stream(graph_input, config, **options) run on a graph thread, yielded on the loop"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    context = contextvars.copy_context()
+
+    def put(item: Any, error: BaseException = None) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            stopped.set()  # Event loop closed (shutdown)
+
+    def produce() -> None:
+        try:
+            for update in graph.stream(graph_input, config, **options):
+                if stopped.is_set():
+                    return
+                put(update)
+        except BaseException as e:
+            put(_END, e)
+            return
+        put(_END)
+
+    loop.run_in_executor(graph_executor, context.run, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
@@ -0,0 +1,293 @@
+"""
+Job Queue - Background Answers for Long-Running Questions
+=========================================================
+Analytical questions (a year of delegation and checklist summaries) can take
+long enough that holding a /chat/stream connection open is fragile. POST
+/chat/jobs queues the question instead and returns a job id at once:
+
+- jobs run the same pipeline as /chat/stream on a pool of JOB_WORKERS
+  workers per process; at most JOB_MAX_QUEUED wait, and a user can have
+  JOB_MAX_PER_USER queued or running, beyond that submissions get a 429.
+  The workers are coroutines; the blocking part of a job, its domain graph,
+  runs on a graph thread (graph_runner.py), so jobs never stall the loop
+- the job record (status, progress events, SQL, answer, error) is kept in
+  the shared state store, so any worker can answer a poll, for
+  JOB_RETENTION_SECONDS; each user keeps at most JOB_HISTORY_PER_USER jobs
+- subscribers on the worker running the job follow its live events through
+  the replay buffer (stream_replay.py); elsewhere, or once the buffer has
+  expired, the stored events are replayed and polled until the job ends
+
+Stored events use the same ids as the live stream, so Last-Event-ID works
+with either source. Consecutive answer chunks are stored as one event that
+keeps its first id and the size of each token; resuming inside it replays
+only the tokens after Last-Event-ID.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.metrics import JOB_QUEUE_SECONDS, JOBS
+from app.services.sse import Chunk, Error, Event, Query, Status
+from app.services.state_store import StateStore, state_store
+from app.services.stream_replay import stream_replay
+
+FINISHED = ("succeeded", "failed")
+
+# Bookkeeping of a stored event, not part of the event itself
+RECORD_FIELDS = ("id", "first_id", "sizes")
+
+
+class JobRejected(Exception):
+    """The job can't be queued (queue full or the user's job limit reached)"""
+
+    def __init__(self, reason: str, message: str, retry_after: int = 30):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """Bounded worker pool for background questions, with job records in the state store"""
+
+    KEY_PREFIX = "jobs:job:"
+    USER_PREFIX = "jobs:user:"
+
+    def __init__(
+        self,
+        store: StateStore = None,
+        workers: int = settings.JOB_WORKERS,
+        max_queued: int = settings.JOB_MAX_QUEUED,
+        max_per_user: int = settings.JOB_MAX_PER_USER,
+        retention_seconds: int = settings.JOB_RETENTION_SECONDS,
+        history_per_user: int = settings.JOB_HISTORY_PER_USER,
+        enabled: bool = settings.JOBS_ENABLED
+    ):
+        self.store = store or state_store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_per_user = max_per_user
+        self.retention_seconds = retention_seconds
+        self.history_per_user = history_per_user
+        self.enabled = enabled
+
+        self._pending: Deque[str] = deque()  # Queued job ids, in order
+        self._factories: Dict[str, Callable[[], AsyncIterator[Event]]] = {}
+        self._owners: Dict[str, str] = {}  # Queued and running jobs on this worker
+        self._running: set = set()
+        self._wakeup: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.KEY_PREFIX}{job_id}"
+
+    # ------------------------------------------------------------------------
+    # SUBMIT
+    # ------------------------------------------------------------------------
+
+    def submit(self, job_id: str, question: str, session_id: str, owner: Any,
+               factory: Callable[[], AsyncIterator[Event]]) -> Dict[str, Any]:
+        """Queue a job (factory() yields its pipeline events), or raise JobRejected"""
+        owner = str(owner)
+        if len(self._pending) >= self.max_queued:
+            self._reject("queue_full", f"Too many background questions waiting ({len(self._pending)}). Please retry later.")
+        active = sum(1 for o in self._owners.values() if o == owner)
+        if active >= self.max_per_user:
+            self._reject("user_limit", f"You already have {active} background questions queued or running.")
+
+        job = {
+            "job_id": job_id, "owner": owner, "question": question, "session_id": session_id,
+            "status": "queued", "created_at": time.time(), "started_at": None, "finished_at": None,
+            "progress": None, "sql": None, "answer": "", "error": None, "events": []
+        }
+        self._save(job)
+        self._remember(owner, job_id)
+
+        self._start_workers()
+        self._pending.append(job_id)
+        self._factories[job_id] = factory
+        self._owners[job_id] = owner
+        self._wakeup.put_nowait(job_id)
+        self.stats["submitted"] += 1
+        print(f"📥 Job {job_id} queued ({len(self._pending)} waiting, {len(self._running)} running)")
+        return {**job, "position": self.position(job_id)}
+
+    def _reject(self, reason: str, message: str) -> None:
+        self.stats["rejected"] += 1
+        JOBS.inc(outcome="rejected")
+        raise JobRejected(reason, message)
+
+    def _remember(self, owner: str, job_id: str) -> None:
+        """Add to the user's job list, dropping the oldest finished jobs beyond the history limit"""
+        key = f"{self.USER_PREFIX}{owner}"
+        try:
+            job_ids = [j for j in (self.store.get(key) or []) if self.store.get(self._key(j))] + [job_id]
+            while len(job_ids) > self.history_per_user:
+                oldest = next((j for j in job_ids if (self.store.get(self._key(j)) or {}).get("status") in FINISHED), None)
+                if oldest is None:
+                    break
+                job_ids.remove(oldest)
+                self.store.delete(self._key(oldest))
+            self.store.set(key, job_ids, ttl=self.retention_seconds)
+        except Exception as e:
+            print(f"[WARNING] Job history update failed: {e}")
+
+    def position(self, job_id: str) -> int:
+        """1-based place among jobs waiting on this worker (0 = running, finished or elsewhere)"""
+        try:
+            return self._pending.index(job_id) + 1
+        except ValueError:
+            return 0
+
+    # ------------------------------------------------------------------------
+    # WORKERS
+    # ------------------------------------------------------------------------
+
+    def _start_workers(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Queue()
+        self._tasks = [t for t in self._tasks if not t.done()]
+        for n in range(len(self._tasks), self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"job-worker-{n}"))
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._wakeup.get()
+            if job_id not in self._factories:
+                continue
+            self._pending.remove(job_id)
+            self._running.add(job_id)
+            factory = self._factories.pop(job_id)
+            try:
+                await self._execute(job_id, factory)
+            except Exception as e:
+                print(f"❌ Job {job_id} crashed: {e}")
+            finally:
+                self._running.discard(job_id)
+                self._owners.pop(job_id, None)
+
+    async def _execute(self, job_id: str, factory: Callable[[], AsyncIterator[Event]]) -> None:
+        job = self.get(job_id)
+        if job is None:
+            return  # Dropped from the user's history before it started
+        job["status"], job["started_at"] = "running", time.time()
+        JOB_QUEUE_SECONDS.observe(job["started_at"] - job["created_at"])
+        await asyncio.to_thread(self._save, job)
+
+        # Live subscribers on this worker follow the replay buffer
+        stream_replay.start(job_id, lambda: self._recorded(job, factory), owner=job["owner"])
+        await stream_replay.get(job_id).task
+
+    async def _recorded(self, job: Dict[str, Any], factory: Callable[[], AsyncIterator[Event]]) -> AsyncGenerator[Event, None]:
+        """The job's events, stored as they pass (answer chunks merged, saved with the next event)"""
+        event_id = 0
+        try:
+            async for event in factory():
+                event_id += 1
+                self._record(job, event_id, event)
+                if not isinstance(event, Chunk):
+                    await asyncio.to_thread(self._save, job)
+                yield event
+        except Exception as e:
+            event_id += 1
+            event = Error(f'Error: {str(e)}')
+            self._record(job, event_id, event)
+            yield event
+
+        finished = any(e["type"] == "done" for e in job["events"])
+        job["status"] = "succeeded" if finished and not job["error"] else "failed"
+        job["finished_at"] = time.time()
+        await asyncio.to_thread(self._save, job)
+        self.stats[job["status"]] += 1
+        JOBS.inc(outcome=job["status"])
+        print(f"✅ Job {job['job_id']} {job['status']} in {job['finished_at'] - job['started_at']:.1f}s")
+
+    @staticmethod
+    def _record(job: Dict[str, Any], event_id: int, event: Event) -> None:
+        events = job["events"]
+        if isinstance(event, Chunk):
+            job["answer"] += event.content
+            if events and events[-1]["type"] == "chunk":
+                # A merged chunk covers ids first_id..id, one per token
+                events[-1]["content"] += event.content
+                events[-1]["sizes"].append(len(event.content))
+                events[-1]["id"] = event_id
+                return
+            events.append({"id": event_id, "first_id": event_id, "sizes": [len(event.content)], **event.to_dict()})
+            return
+        elif isinstance(event, Status):
+            job["progress"] = event.fields["message"]
+        elif isinstance(event, Query):
+            job["sql"] = event.sql
+        elif isinstance(event, Error):
+            job["error"] = event.fields["message"]
+        events.append({"id": event_id, **event.to_dict()})
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        try:
+            self.store.set(self._key(job["job_id"]), job, ttl=self.retention_seconds)
+        except Exception as e:
+            print(f"[WARNING] Job {job['job_id']} not saved: {e}")
+
+    # ------------------------------------------------------------------------
+    # POLL / SUBSCRIBE
+    # ------------------------------------------------------------------------
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The stored job record (None once expired)"""
+        try:
+            return self.store.get(self._key(job_id))
+        except Exception as e:
+            print(f"[WARNING] Job lookup failed: {e}")
+            return None
+
+    def list_jobs(self, owner: Any) -> List[Dict[str, Any]]:
+        """The user's retained jobs, newest first, without their events"""
+        job_ids = self.store.get(f"{self.USER_PREFIX}{owner}") or []
+        jobs = filter(None, (self.get(job_id) for job_id in reversed(job_ids)))
+        return [{k: v for k, v in job.items() if k != "events"} for job in jobs]
+
+    async def follow(self, job_id: str, after: int = 0,
+                     poll_seconds: float = settings.JOB_POLL_SECONDS) -> AsyncGenerator[Tuple[int, Event], None]:
+        """(id, event) pairs after `after` until the job ends: live when it runs here, stored otherwise"""
+        while True:
+            if stream_replay.get(job_id) is not None:
+                async for pair in stream_replay.subscribe(job_id, after=after):
+                    yield pair
+                return
+
+            job = self.get(job_id)
+            if job is None:
+                return
+            for data in job["events"]:
+                if data["id"] > after:
+                    fields = {k: v for k, v in data.items() if k not in RECORD_FIELDS}
+                    if data["type"] == "chunk" and after >= data.get("first_id", data["id"]):
+                        # The client already has this chunk's tokens up to `after`
+                        seen = sum(data["sizes"][:after - data["first_id"] + 1])
+                        fields["content"] = fields["content"][seen:]
+                    after = data["id"]
+                    yield after, Event.from_dict(fields)
+            if job["status"] in FINISHED:
+                return
+            await asyncio.sleep(poll_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "max_per_user": self.max_per_user,
+            "retention_seconds": self.retention_seconds,
+            **self.stats,
+            "queued": len(self._pending),
+            "running": len(self._running),
+            "users": len(set(self._owners.values()))
+        }
+
+
+# Global instance
+job_queue = JobQueue()
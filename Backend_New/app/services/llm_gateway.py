@@ -0,0 +1,637 @@
+"""
+LLM Gateway - Shared, Pooled OpenAI Clients
+===========================================
+Every LLM call site (router, query generators and validators, answer synthesis)
+gets its ChatOpenAI from here instead of building its own:
+
+- one keep-alive HTTP client pair (sync + async) per model, so calls reuse
+  warm TLS connections instead of each ChatOpenAI opening its own pool.
+  Connections use HTTP/2 when LLM_HTTP2 is set and `h2` is installed
+- ChatOpenAI instances are cached per (model, temperature, options)
+- at most LLM_MAX_CONCURRENCY requests per model are in flight per worker
+  (LLM_MAX_CONCURRENCY_BY_MODEL overrides it per model). Sync and async calls
+  share the limit and wait in one FIFO line
+- timeouts and retries are set here, once
+
+The latency-critical stages (generate_query, validate_query) call invoke(),
+which adds tail-latency control on top:
+
+- every request runs under a deadline (request_deadline(), set per chat
+  request). A call waits for its model slot only until the deadline, then
+  its HTTP timeouts are clamped to the budget left after the wait
+- when an attempt is slower than the p95 observed for its model and stage, a
+  hedged duplicate is sent. The first answer wins and the other is dropped
+- with less budget left than LLM_FALLBACK_BELOW_SECONDS (or the model's
+  p95), the call goes to LLM_FALLBACK_MODEL instead
+
+get_stats() reports per model how many requests reused a connection, the
+slots in use and waiting, and per model and stage the latency percentiles,
+hedges fired and won and fallbacks.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from app.core.config import settings
+from app.services.metrics import (
+    LLM_DEADLINE_EXCEEDED, LLM_FALLBACKS, LLM_HEDGES, LLM_HTTP_REQUESTS, LLM_SLOT_WAIT_SECONDS
+)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# httpcore trace event for a freshly opened connection
+NEW_CONNECTION_EVENT = "connection.connect_tcp.complete"
+
+# Monotonic time by which the current request's LLM calls must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The request's LLM budget ran out"""
+
+
+class request_deadline:
+    """Context manager: LLM calls inside must finish within `seconds` (0 = no deadline)"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.previous: Optional[float] = None
+
+    def __enter__(self) -> "request_deadline":
+        self.previous = _deadline.get()
+        if self.seconds > 0:
+            _deadline.set(time.monotonic() + self.seconds)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Restore explicitly (a token reset fails if an async generator is closed from another context)
+        _deadline.set(self.previous)
+        return False
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left before the current deadline (None without one)"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _clamp_timeouts(request: httpx.Request) -> None:
+    """Cut the request's connect/read/write/pool timeouts to the budget left"""
+    left = remaining_budget()
+    if left is None:
+        return
+    if left <= 0:
+        raise httpx.TimeoutException("LLM request deadline exceeded", request=request)
+    timeouts = request.extensions.get("timeout") or dict.fromkeys(("connect", "read", "write", "pool"))
+    request.extensions["timeout"] = {k: left if v is None else min(v, left) for k, v in timeouts.items()}
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    """'gpt-4o=8,gpt-4o-mini=32' -> {model: limit}"""
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        model, _, value = part.rpartition("=")
+        try:
+            limits[model.strip()] = int(value)
+        except ValueError:
+            print(f"[WARNING] Ignoring LLM concurrency limit '{part}'")
+    return limits
+
+
+# ============================================================================
+# CONCURRENCY SLOTS
+# ============================================================================
+
+class _Slots:
+    """Counting semaphore usable from threads and coroutines, with one FIFO line for both"""
+
+    def __init__(self, limit: int):
+        self.limit = max(limit, 1)
+        self.in_use = 0
+        self.peak_waiting = 0
+        self._lock = threading.Lock()
+        # threading.Event (sync caller) or (loop, future) (async caller)
+        self._waiters: Deque[Any] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _try_acquire(self, waiter: Any) -> bool:
+        with self._lock:
+            if self.in_use < self.limit and not self._waiters:
+                self.in_use += 1
+                return True
+            self._waiters.append(waiter)
+            self.peak_waiting = max(self.peak_waiting, len(self._waiters))
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """Wait for a slot; LLMDeadlineExceeded after `timeout` seconds (None = no limit)"""
+        # Waiting on the event-loop thread would freeze the loop, and could
+        # deadlock it: the slot may be held by a stream that needs the loop to
+        # finish. Sync calls belong on graph threads (graph_runner.py)
+        if _on_event_loop():
+            raise RuntimeError("Sync LLM call on the event loop thread: use ainvoke()/astream() "
+                               "or run it off the loop (graph_runner.stream_graph, asyncio.to_thread)")
+        event = threading.Event()
+        if self._try_acquire(event):
+            return
+        if event.wait(max(timeout, 0) if timeout is not None else None):
+            return  # The releasing caller handed its slot over
+        with self._lock:
+            if event in self._waiters:
+                self._waiters.remove(event)
+                raise LLMDeadlineExceeded("LLM budget ran out waiting for a model slot")
+        self.release()  # Slot arrived just as the budget ran out
+        raise LLMDeadlineExceeded("LLM budget ran out waiting for a model slot")
+
+    async def aacquire(self, timeout: Optional[float] = None) -> None:
+        """acquire() for coroutines"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if self._try_acquire((loop, future)):
+            return
+        try:
+            done, _ = await asyncio.wait({future}, timeout=max(timeout, 0) if timeout is not None else None)
+        except asyncio.CancelledError:
+            self._abandon(loop, future)
+            raise
+        if not done:
+            self._abandon(loop, future)
+            raise LLMDeadlineExceeded("LLM budget ran out waiting for a model slot")
+
+    def _abandon(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future) -> None:
+        """Leave the line, giving back a slot that was already handed over"""
+        with self._lock:
+            if (loop, future) in self._waiters:
+                self._waiters.remove((loop, future))
+                return
+        if future.done():
+            self.release()  # Slot arrived just as we gave up
+        else:
+            future.cancel()  # The hand-over is still scheduled; _hand_over releases it
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters and self.in_use <= self.limit:
+                waiter = self._waiters.popleft()
+            else:
+                self.in_use -= 1
+                return
+        # The slot passes straight to the next waiter, in_use is unchanged
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            try:
+                loop.call_soon_threadsafe(self._hand_over, future)
+            except RuntimeError:
+                self.release()  # Waiter's event loop is closed
+
+    def _hand_over(self, future: asyncio.Future) -> None:
+        if future.done():
+            self.release()  # Waiter was cancelled meanwhile
+        else:
+            future.set_result(None)
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+# ============================================================================
+# TRANSPORTS
+# ============================================================================
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that gives the model slot back once the body is closed"""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _ModelPool:
+    """HTTP clients, concurrency slots and connection stats for one model"""
+
+    def __init__(self, model: str, limit: int):
+        self.model = model
+        self.slots = _Slots(limit)
+        self.http2 = settings.LLM_HTTP2 and HTTP2_AVAILABLE
+        self.stats = {"requests": 0, "new_connections": 0, "waited": 0, "wait_seconds": 0.0, "http2_responses": 0}
+        self._stats_lock = threading.Lock()
+
+        limits = httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_SECONDS
+        )
+        timeout = httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS)
+        self.client = httpx.Client(
+            transport=_PooledTransport(self, httpx.HTTPTransport(http2=self.http2, limits=limits)),
+            timeout=timeout
+        )
+        self.async_client = httpx.AsyncClient(
+            transport=_AsyncPooledTransport(self, httpx.AsyncHTTPTransport(http2=self.http2, limits=limits)),
+            timeout=timeout
+        )
+
+    def record(self, new_connection: bool, waited: float, response: Optional[httpx.Response]) -> None:
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["new_connections"] += int(new_connection)
+            if waited > 0.001:
+                self.stats["waited"] += 1
+                self.stats["wait_seconds"] += waited
+            if response is not None and response.http_version == "HTTP/2":
+                self.stats["http2_responses"] += 1
+        LLM_HTTP_REQUESTS.inc(model=self.model, connection="new" if new_connection else "reused")
+        LLM_SLOT_WAIT_SECONDS.observe(waited, model=self.model)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        reused = stats["requests"] - stats["new_connections"]
+        return {
+            "http2": self.http2,
+            "requests": stats["requests"],
+            "new_connections": stats["new_connections"],
+            "reused_connections": reused,
+            "reuse_rate": round(reused / stats["requests"], 3) if stats["requests"] else 0.0,
+            "http2_responses": stats["http2_responses"],
+            "concurrency_limit": self.slots.limit,
+            "in_flight": self.slots.in_use,
+            "waiting": self.slots.waiting,
+            "peak_waiting": self.slots.peak_waiting,
+            "waited": stats["waited"],
+            "avg_wait_ms": round(stats["wait_seconds"] / stats["waited"] * 1000, 1) if stats["waited"] else 0.0
+        }
+
+    async def aclose(self) -> None:
+        self.client.close()
+        await self.async_client.aclose()
+
+
+class _PooledTransport(httpx.BaseTransport):
+    """Waits for a model slot, then sends on the shared keep-alive pool"""
+
+    def __init__(self, pool: _ModelPool, transport: httpx.HTTPTransport):
+        self.pool = pool
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        opened = []
+        request.extensions["trace"] = lambda event, info: opened.append(event) if event == NEW_CONNECTION_EVENT else None
+
+        # Wait within the budget, then clamp to what is left after the wait
+        start = time.perf_counter()
+        self.pool.slots.acquire(timeout=remaining_budget())
+        waited = time.perf_counter() - start
+        try:
+            _clamp_timeouts(request)
+            response = self.transport.handle_request(request)
+        except BaseException:
+            self.pool.slots.release()
+            self.pool.record(bool(opened), waited, None)
+            raise
+        self.pool.record(bool(opened), waited, response)
+        response.stream = _ReleasingStream(response.stream, _once(self.pool.slots.release))
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class _AsyncPooledTransport(httpx.AsyncBaseTransport):
+    def __init__(self, pool: _ModelPool, transport: httpx.AsyncHTTPTransport):
+        self.pool = pool
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        opened = []
+
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            if event == NEW_CONNECTION_EVENT:
+                opened.append(event)
+
+        request.extensions["trace"] = trace
+
+        start = time.perf_counter()
+        await self.pool.slots.aacquire(timeout=remaining_budget())
+        waited = time.perf_counter() - start
+        try:
+            _clamp_timeouts(request)
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            self.pool.slots.release()
+            self.pool.record(bool(opened), waited, None)
+            raise
+        self.pool.record(bool(opened), waited, response)
+        response.stream = _AsyncReleasingStream(response.stream, _once(self.pool.slots.release))
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def _once(func: Callable[[], None]) -> Callable[[], None]:
+    """Response bodies may be closed more than once; release the slot the first time"""
+    lock = threading.Lock()
+    called = []
+
+    def wrapper() -> None:
+        with lock:
+            if called:
+                return
+            called.append(True)
+        func()
+
+    return wrapper
+
+
+# ============================================================================
+# LATENCY TRACKING
+# ============================================================================
+
+class _StageLatency:
+    """Recent successful call latencies for one (model, stage), plus hedge counts"""
+
+    def __init__(self, window: int):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.stats = {"calls": 0, "hedges_fired": 0, "hedges_won": 0, "fallbacks": 0, "deadline_exceeded": 0}
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < max(min_samples, 1):
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self._lock:
+            stats = dict(self.stats)
+            samples = len(self.samples)
+        return {
+            **stats,
+            "samples": samples,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "hedge_win_rate": round(stats["hedges_won"] / stats["hedges_fired"], 3) if stats["hedges_fired"] else 0.0
+        }
+
+
+# ============================================================================
+# GATEWAY
+# ============================================================================
+
+class LLMGateway:
+    """Hands out ChatOpenAI instances that share one pooled client per model"""
+
+    def __init__(
+        self,
+        max_concurrency: int = settings.LLM_MAX_CONCURRENCY,
+        concurrency_by_model: str = settings.LLM_MAX_CONCURRENCY_BY_MODEL
+    ):
+        self.max_concurrency = max_concurrency
+        self.concurrency_by_model = _parse_limits(concurrency_by_model)
+        self._pools: Dict[str, _ModelPool] = {}
+        self._chats: Dict[Tuple, ChatOpenAI] = {}
+        self._latency: Dict[Tuple[str, str], _StageLatency] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.hedge_enabled = settings.LLM_HEDGE_ENABLED
+        self.hedge_percentile = settings.LLM_HEDGE_PERCENTILE
+        self.fallback_model = settings.LLM_FALLBACK_MODEL
+
+    def pool(self, model: str) -> _ModelPool:
+        with self._lock:
+            if model not in self._pools:
+                limit = self.concurrency_by_model.get(model, self.max_concurrency)
+                self._pools[model] = _ModelPool(model, limit)
+            return self._pools[model]
+
+    def chat(self, model: Optional[str] = None, temperature: float = 0, **options) -> ChatOpenAI:
+        """Shared ChatOpenAI for this model and options (e.g. stream_usage=True)"""
+        model = model or settings.LLM_MODEL
+        key = (model, temperature, tuple(sorted(options.items())))
+        pool = self.pool(model)
+        with self._lock:
+            if key not in self._chats:
+                kwargs = {"timeout": settings.LLM_TIMEOUT_SECONDS, "max_retries": settings.LLM_MAX_RETRIES, **options}
+                self._chats[key] = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    openai_api_key=settings.OPENAI_API_KEY,
+                    http_client=pool.client,
+                    http_async_client=pool.async_client,
+                    **kwargs
+                )
+            return self._chats[key]
+
+    # ------------------------------------------------------------------------
+    # HEDGED, DEADLINE-AWARE CALLS
+    # ------------------------------------------------------------------------
+
+    def latency(self, model: str, stage: str) -> _StageLatency:
+        with self._lock:
+            key = (model, stage)
+            if key not in self._latency:
+                self._latency[key] = _StageLatency(settings.LLM_LATENCY_WINDOW)
+            return self._latency[key]
+
+    def _choose_model(self, model: str, stage: str, left: Optional[float]) -> str:
+        """The fallback model when the budget left is below what this model usually needs"""
+        if left is None or not self.fallback_model or self.fallback_model == model:
+            return model
+        p95 = self.latency(model, stage).percentile(self.hedge_percentile, settings.LLM_HEDGE_MIN_SAMPLES)
+        if left >= max(settings.LLM_FALLBACK_BELOW_SECONDS, p95 or 0):
+            return model
+        self.latency(model, stage).count("fallbacks")
+        LLM_FALLBACKS.inc(stage=stage, model=self.fallback_model)
+        print(f"⏱️ {stage}: {left:.1f}s left, falling back from {model} to {self.fallback_model}")
+        return self.fallback_model
+
+    def _attempt(self, runnable: Any, messages: Any, latency: _StageLatency) -> Any:
+        # Runs in a copy of the caller's context (deadline, current span)
+        start = time.perf_counter()
+        result = runnable.invoke(messages)
+        latency.record(time.perf_counter() - start)  # Losing hedges count too: they are the tail
+        return result
+
+    def invoke(self, messages: Any, stage: str, model: Optional[str] = None,
+               prepare: Optional[Callable[[ChatOpenAI], Any]] = None, temperature: float = 0) -> Any:
+        """
+        Call the LLM within the request deadline, hedging slow attempts.
+        `prepare` turns the ChatOpenAI into the runnable to call (e.g. bind_tools).
+        Blocks while waiting for attempts and retry backoff, so it must run off
+        the event loop (graph threads); coroutines use ainvoke().
+        """
+        if _on_event_loop():
+            raise RuntimeError(f"llm_gateway.invoke() ({stage}) would block the event loop; use ainvoke()")
+        left = remaining_budget()
+        model = model or settings.LLM_MODEL
+        if left is not None and left <= 0:
+            self.latency(model, stage).count("deadline_exceeded")
+            LLM_DEADLINE_EXCEEDED.inc(stage=stage)
+            raise LLMDeadlineExceeded(f"No LLM budget left for {stage}")
+
+        model = self._choose_model(model, stage, left)
+        latency = self.latency(model, stage)
+        latency.count("calls")
+        # Retries happen here, within the budget, instead of inside the client
+        llm = self.chat(model, temperature=temperature, max_retries=0)
+        runnable = prepare(llm) if prepare else llm
+
+        hedge_delay = None
+        if self.hedge_enabled:
+            p95 = latency.percentile(self.hedge_percentile, settings.LLM_HEDGE_MIN_SAMPLES)
+            if p95 is not None:
+                hedge_delay = max(p95, settings.LLM_HEDGE_MIN_DELAY_SECONDS)
+                if left is not None and hedge_delay >= left:
+                    hedge_delay = None  # The hedge could not finish in time either
+
+        executor = self._get_executor()
+
+        def submit() -> Future:
+            context = contextvars.copy_context()
+            return executor.submit(context.run, self._attempt, runnable, messages, latency)
+
+        pending: Dict[Future, str] = {submit(): "primary"}
+        hedge_at = time.monotonic() + hedge_delay if hedge_delay is not None else None
+        retries = 0
+        last_error: Optional[BaseException] = None
+
+        while pending:
+            waits = [t for t in (hedge_at and hedge_at - time.monotonic(), remaining_budget()) if t is not None]
+            done, _ = wait(list(pending), timeout=max(min(waits), 0) if waits else None, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                kind = pending.pop(future)
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()  # Not started yet; a running loser finishes in the background
+                    if kind == "hedge":
+                        latency.count("hedges_won")
+                        LLM_HEDGES.inc(model=model, stage=stage, event="won")
+                    return future.result()
+                last_error = future.exception()
+
+            left = remaining_budget()
+            if left is not None and left <= 0:
+                break
+            if not done and hedge_at is not None and time.monotonic() >= hedge_at:
+                hedge_at = None
+                pending[submit()] = "hedge"
+                latency.count("hedges_fired")
+                LLM_HEDGES.inc(model=model, stage=stage, event="fired")
+                print(f"🪁 {stage}: {model} slower than p95 ({hedge_delay:.2f}s), hedging")
+            elif not pending and retries < settings.LLM_MAX_RETRIES:
+                retries += 1
+                print(f"🔁 {stage}: retry {retries} after {type(last_error).__name__}: {last_error}")
+                time.sleep(min(0.5 * retries, left / 2) if left is not None else 0.5 * retries)
+                pending[submit()] = "retry"
+
+        for future in pending:
+            future.cancel()
+        left = remaining_budget()
+        if left is not None and left <= 0:
+            latency.count("deadline_exceeded")
+            LLM_DEADLINE_EXCEEDED.inc(stage=stage)
+            raise LLMDeadlineExceeded(f"LLM budget ran out during {stage}") from last_error
+        raise last_error
+
+    async def ainvoke(self, messages: Any, stage: str, model: Optional[str] = None,
+                      prepare: Optional[Callable[[ChatOpenAI], Any]] = None, temperature: float = 0) -> Any:
+        """invoke() for coroutines: hedge waits and retry backoff run on a worker thread"""
+        # to_thread copies the context, so the request deadline applies
+        return await asyncio.to_thread(self.invoke, messages, stage, model, prepare, temperature)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=settings.LLM_HEDGE_WORKERS, thread_name_prefix="llm-call")
+            return self._executor
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = dict(self._pools)
+        return {
+            "http2_available": HTTP2_AVAILABLE,
+            "timeout_seconds": settings.LLM_TIMEOUT_SECONDS,
+            "max_retries": settings.LLM_MAX_RETRIES,
+            "clients": len(self._chats),
+            "models": {model: pool.get_stats() for model, pool in pools.items()},
+            "hedging": {
+                "enabled": self.hedge_enabled,
+                "percentile": self.hedge_percentile,
+                "fallback_model": self.fallback_model,
+                "budget_seconds": settings.LLM_REQUEST_BUDGET_SECONDS
+            },
+            "stages": {f"{model}/{stage}": latency.get_stats() for (model, stage), latency in list(self._latency.items())}
+        }
+
+    async def aclose(self) -> None:
+        """Close the pooled connections (server shutdown)"""
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            await pool.aclose()
+
+
+# Global instance
+llm_gateway = LLMGateway()
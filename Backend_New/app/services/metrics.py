@@ -0,0 +1,517 @@
+"""
+Metrics Registry
+================
+Counters, gauges and latency histograms exposed at /metrics in the
+Prometheus text exposition format.
+
+Stage latencies are fed from the request tracer: every finished span
+(route, cache_lookup, history, each LangGraph node, run_query,
+answer_stream, technical_note) is observed into a histogram labelled by
+stage, so the two never disagree.
+
+With several uvicorn workers each process writes a snapshot of its metrics
+to METRICS_MULTIPROC_DIR every METRICS_FLUSH_SECONDS; a scrape of any
+worker merges all snapshots (counters and histograms summed, gauges summed
+over live workers only).
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.tracing import Span, tracer
+
+# Latency buckets (seconds): fast cache/DB work up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Dict[str, str] = None) -> str:
+    pairs = list(key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = [
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base class: a named family of samples keyed by label values"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, registry: "MetricsRegistry" = None):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        (registry or metrics).register(self)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable samples: {label_key_json: value}"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, registry: "MetricsRegistry" = None):
+        self._values: Dict[LabelKey, float] = {}
+        super().__init__(name, documentation, registry)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {json.dumps(key): value for key, value in self._values.items()}
+
+
+class Gauge(Metric):
+    """Current value, either set directly or read from a callback at scrape time"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, registry: "MetricsRegistry" = None):
+        self._values: Dict[LabelKey, float] = {}
+        self._callback: Optional[Callable[[], Dict[LabelKey, float]]] = None
+        super().__init__(name, documentation, registry)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def set_function(self, callback: Callable[[], List[Tuple[Dict[str, Any], float]]]) -> None:
+        """callback() returns [(labels, value), ...]"""
+        def collect():
+            return {_label_key(labels): value for labels, value in callback()}
+        self._callback = collect
+
+    def snapshot(self) -> Dict[str, Any]:
+        values = dict(self._values)
+        if self._callback is not None:
+            try:
+                values.update(self._callback())
+            except Exception as e:
+                print(f"[METRICS ERROR] Gauge {self.name} callback failed: {e}")
+        return {json.dumps(key): value for key, value in values.items()}
+
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS, registry: "MetricsRegistry" = None):
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., sum, count]
+        self._values: Dict[LabelKey, List[float]] = {}
+        super().__init__(name, documentation, registry)
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {json.dumps(key): list(state) for key, state in self._values.items()}
+
+
+class MetricsRegistry:
+    """All metrics of this process, plus cross-worker aggregation"""
+
+    def __init__(self, multiproc_dir: str = settings.METRICS_MULTIPROC_DIR, flush_seconds: float = settings.METRICS_FLUSH_SECONDS):
+        self._metrics: Dict[str, Metric] = {}
+        self.multiproc_dir = multiproc_dir
+        self.flush_seconds = flush_seconds
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_lock = threading.Lock()
+
+    def register(self, metric: Metric) -> None:
+        self._metrics[metric.name] = metric
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            name: {"type": metric.type, "samples": metric.snapshot()}
+            for name, metric in self._metrics.items()
+        }
+
+    # ------------------------------------------------------------------------
+    # MULTI-WORKER SNAPSHOTS
+    # ------------------------------------------------------------------------
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.multiproc_dir, f"metrics_{pid}.json")
+
+    def flush(self) -> None:
+        """Write this worker's snapshot (atomic replace)"""
+        if not self.multiproc_dir:
+            return
+        try:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            path = self._snapshot_path(os.getpid())
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[METRICS ERROR] Snapshot flush failed: {e}")
+
+    def start_flusher(self) -> None:
+        """Flush periodically in a daemon thread so idle workers stay visible"""
+        if not self.multiproc_dir:
+            return
+        with self._flusher_lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+
+            def loop():
+                while True:
+                    time.sleep(self.flush_seconds)
+                    self.flush()
+
+            self._flusher = threading.Thread(target=loop, name="metrics-flusher", daemon=True)
+            self._flusher.start()
+            print(f"✅ Metrics: sharing snapshots via {self.multiproc_dir}")
+
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+
+    def _collect_snapshots(self) -> List[Tuple[Dict[str, Any], bool]]:
+        """(snapshot, worker_alive) for every worker, this one read live"""
+        snapshots = [(self.snapshot(), True)]
+        if not self.multiproc_dir or not os.path.isdir(self.multiproc_dir):
+            return snapshots
+
+        own = os.path.basename(self._snapshot_path(os.getpid()))
+        for filename in os.listdir(self.multiproc_dir):
+            if not filename.startswith("metrics_") or not filename.endswith(".json") or filename == own:
+                continue
+            try:
+                pid = int(filename[len("metrics_"):-len(".json")])
+                with open(os.path.join(self.multiproc_dir, filename), "r", encoding="utf-8") as f:
+                    snapshots.append((json.load(f), self._is_alive(pid)))
+            except (ValueError, OSError, json.JSONDecodeError):
+                continue
+        return snapshots
+
+    def _merge(self) -> Dict[str, Dict[LabelKey, Any]]:
+        merged: Dict[str, Dict[LabelKey, Any]] = {name: {} for name in self._metrics}
+        for snapshot, alive in self._collect_snapshots():
+            for name, family in snapshot.items():
+                if name not in merged:
+                    continue
+                # Gauges of exited workers describe resources that no longer exist
+                if family["type"] == "gauge" and not alive:
+                    continue
+                samples = merged[name]
+                for raw_key, value in family["samples"].items():
+                    key = tuple(tuple(pair) for pair in json.loads(raw_key))
+                    if isinstance(value, list):
+                        current = samples.get(key)
+                        if current is None or len(current) != len(value):
+                            samples[key] = list(value)
+                        else:
+                            samples[key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        samples[key] = samples.get(key, 0) + value
+        return merged
+
+    # ------------------------------------------------------------------------
+    # EXPOSITION
+    # ------------------------------------------------------------------------
+
+    def render(self) -> str:
+        """Prometheus text format (version 0.0.4), aggregated across workers"""
+        lines: List[str] = []
+        for name, samples in self._merge().items():
+            metric = self._metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+
+            for key in sorted(samples):
+                value = samples[key]
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, value[:-2]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, {'le': _format_value(bound)})} {_format_value(cumulative)}")
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {_format_value(value[-1])}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value[-2])}")
+                    lines.append(f"{name}_count{_format_labels(key)} {_format_value(value[-1])}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Global registry
+metrics = MetricsRegistry()
+
+
+# ============================================================================
+# PIPELINE METRICS
+# ============================================================================
+
+REQUEST_LATENCY = Histogram(
+    "chat_request_duration_seconds",
+    "End-to-end /chat/stream latency",
+)
+STAGE_LATENCY = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Latency of each pipeline stage (route, cache_lookup, graph nodes, run_query, answer_stream, ...)",
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from answer request to the first streamed token",
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens consumed, by model and direction (input/output)",
+)
+VALIDATION_RETRIES = Counter(
+    "sql_validation_retries_total",
+    "Generated queries rejected by the validator and regenerated",
+)
+NEGATIVE_CACHE_EVENTS = Counter(
+    "negative_cache_events_total",
+    "Failed questions recorded (sql_error, empty, no_result, exception) and repeats handled (reuse_sql, retry_hint, short_circuit)",
+)
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests_total",
+    "Requests that joined an identical in-flight run instead of running the pipeline",
+)
+ADMISSION_QUEUE_SECONDS = Histogram(
+    "admission_queue_seconds",
+    "Time /chat/stream requests spent in the admission queue, by outcome (admitted, timeout, abandoned)",
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Requests rejected with 429 before queueing, by reason (queue_full, user_queue_full)",
+)
+ADMISSION_REQUESTS = Gauge(
+    "admission_requests",
+    "Requests per worker by admission state (in_flight, queued)",
+)
+LLM_HTTP_REQUESTS = Counter(
+    "llm_http_requests_total",
+    "HTTP requests to the LLM API by model, on a new or a reused keep-alive connection",
+)
+LLM_SLOT_WAIT_SECONDS = Histogram(
+    "llm_slot_wait_seconds",
+    "Time LLM requests waited for a free per-model concurrency slot",
+)
+LLM_HEDGES = Counter(
+    "llm_hedges_total",
+    "Hedged duplicate LLM requests by model and stage: fired, and won (answered first)",
+)
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total",
+    "LLM calls moved to the fallback model because the request budget was short",
+)
+LLM_DEADLINE_EXCEEDED = Counter(
+    "llm_deadline_exceeded_total",
+    "LLM calls abandoned because the request budget ran out, by stage",
+)
+MODEL_TIER_CALLS = Counter(
+    "model_tier_calls_total",
+    "SQL generation calls by domain and model tier (fast, strong)",
+)
+MODEL_TIER_ESCALATIONS = Counter(
+    "model_tier_escalations_total",
+    "Questions moved from the fast to the strong tier after a validator rejection",
+)
+SQL_GENERATIONS = Counter(
+    "sql_generations_total",
+    "HR SQL generation calls by prompt mode (fast, reasoning) and outcome",
+)
+LLM_COST_USD = Counter(
+    "llm_cost_usd_total",
+    "Estimated LLM spend in USD for SQL generation by model and tier",
+)
+SSE_EVENTS = Counter(
+    "sse_events_total",
+    "Pipeline events streamed to clients by type (status, query, chunk, ...)",
+)
+SSE_WRITES = Counter(
+    "sse_writes_total",
+    "Batched writes to SSE streams (each carries one or more coalesced frames)",
+)
+STREAM_RESUMES = Counter(
+    "stream_resumes_total",
+    "Reconnects to a request's SSE stream by outcome (resumed, expired, forbidden)",
+)
+STREAM_DETACHED = Counter(
+    "stream_detached_total",
+    "Requests whose client disconnected while the pipeline kept running",
+)
+JOBS = Counter(
+    "chat_jobs_total",
+    "Background jobs by outcome (succeeded, failed, rejected)",
+)
+JOB_QUEUE_SECONDS = Histogram(
+    "job_queue_seconds",
+    "Time background jobs waited for a job worker",
+)
+JOB_STATE = Gauge(
+    "chat_jobs",
+    "Background jobs per worker by state (queued, running)",
+)
+LLM_SLOTS = Gauge(
+    "llm_concurrency_slots",
+    "LLM requests per model by state (in_flight, waiting)",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Shared SQLAlchemy pool connections by state (checked_out, idle, overflow)",
+)
+CHECKPOINTER_MEMORY = Gauge(
+    "checkpointer_memory_bytes",
+    "Approximate memory held by in-process LangGraph checkpoints, per domain",
+)
+
+
+def observe_span(span: Span) -> None:
+    """Tracer listener: turn finished spans into histogram/counter samples"""
+    seconds = span.duration_ms / 1000
+    attributes = span.attributes
+
+    if span.parent_id:
+        STAGE_LATENCY.observe(seconds, stage=span.name)
+    else:
+        REQUEST_LATENCY.observe(
+            seconds,
+            domain=attributes.get("route.domain", "none"),
+            cache_hit=str(bool(attributes.get("cache.hit", False))).lower()
+        )
+
+    if "llm.ttft_ms" in attributes:
+        TIME_TO_FIRST_TOKEN.observe(attributes["llm.ttft_ms"] / 1000, stage=span.name)
+
+    model = attributes.get("llm.model", "unknown")
+    if attributes.get("llm.input_tokens"):
+        LLM_TOKENS.inc(attributes["llm.input_tokens"], model=model, type="input")
+    if attributes.get("llm.output_tokens"):
+        LLM_TOKENS.inc(attributes["llm.output_tokens"], model=model, type="output")
+
+
+def _pool_connections():
+    """Read pool state without creating the engine"""
+    from app.core import database
+
+    engine = database._engine
+    pool = getattr(engine, "pool", None)
+    if pool is None or not hasattr(pool, "checkedout"):
+        return []
+    return [
+        ({"state": "checked_out"}, pool.checkedout()),
+        ({"state": "idle"}, pool.checkedin()),
+        ({"state": "overflow"}, max(pool.overflow(), 0)),
+    ]
+
+
+def _admission_state():
+    from app.services.admission import admission
+
+    return [
+        ({"state": "in_flight"}, admission.in_flight),
+        ({"state": "queued"}, len(admission._queue)),
+    ]
+
+
+def _job_state():
+    from app.services.job_queue import job_queue
+
+    stats = job_queue.get_stats()
+    return [
+        ({"state": "queued"}, stats["queued"]),
+        ({"state": "running"}, stats["running"]),
+    ]
+
+
+def _llm_slots():
+    from app.services.llm_gateway import llm_gateway
+
+    samples = []
+    for model, stats in llm_gateway.get_stats()["models"].items():
+        samples.append(({"model": model, "state": "in_flight"}, stats["in_flight"]))
+        samples.append(({"model": model, "state": "waiting"}, stats["waiting"]))
+    return samples
+
+
+def _deep_size(obj: Any, seen: set = None) -> int:
+    """Approximate size of nested containers of bytes/str (checkpoint storage)"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(_deep_size(item, seen) for item in obj)
+    return 8
+
+
+def _checkpointer_memory():
+    """Size of MemorySaver storage per domain graph (shared savers report nothing)"""
+    from langgraph.checkpoint.memory import MemorySaver
+    from app.core.router import REGISTERED_DOMAINS, get_agent_for_database
+
+    samples = []
+    for domain in (meta["name"] for meta, _ in REGISTERED_DOMAINS):
+        try:
+            saver = getattr(get_agent_for_database(domain), "checkpointer", None)
+        except Exception:
+            continue  # Domain failed to load; nothing to measure
+        if isinstance(saver, MemorySaver):
+            size = _deep_size(saver.storage) + _deep_size(saver.writes) + _deep_size(getattr(saver, "blobs", {}))
+            samples.append(({"domain": domain}, size))
+    return samples
+
+
+ADMISSION_REQUESTS.set_function(_admission_state)
+JOB_STATE.set_function(_job_state)
+LLM_SLOTS.set_function(_llm_slots)
+DB_POOL_CONNECTIONS.set_function(_pool_connections)
+CHECKPOINTER_MEMORY.set_function(_checkpointer_memory)
+
+if settings.METRICS_ENABLED:
+    tracer.add_listener(observe_span)
@@ -0,0 +1,253 @@
+"""
+Model Tiering - Difficulty-Based Model Choice for SQL Generation
+================================================================
+Most questions ("pending tasks of X today") don't need the strongest model
+or the full schema. Before each generation the question gets a complexity
+estimate from cheap text signals:
+
+- tables: how many of the domain's tables the question touches (keywords)
+- aggregations: counts, totals, averages, rankings, breakdowns
+- joins: comparisons and "along with"-style combinations, plus every extra table
+- date logic: date ranges, several periods, trends
+
+Simple questions go to the fast tier (LLM_FAST_MODEL). A domain with a large
+schema can send only the tables the question mentions (slim prompt). A
+question goes to the strong tier (LLM_STRONG_MODEL, full prompt) when its
+score reaches TIERING_COMPLEXITY_THRESHOLD, or when the validator rejected the
+previous attempt (escalation).
+
+get_stats() reports calls, tokens, cost and latency per tier, and the
+escalation rate: questions started on the fast tier that needed the strong one.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
+from app.services.metrics import LLM_COST_USD, MODEL_TIER_CALLS, MODEL_TIER_ESCALATIONS
+from app.services.slot_extractor import DATE_RANGE_PATTERNS
+from app.services.tracing import tracer
+
+TIERS = ["fast", "strong"]
+
+AGGREGATION_PATTERN = re.compile(
+    r"\b(how many|count|number of|total|sum|average|avg|mean|maximum|minimum|max|min|top \d+|top|most|least|"
+    r"highest|lowest|rank|ranking|per|each|group by|grouped|breakdown|distribution|percentage|percent|ratio|rate)\b"
+)
+JOIN_PATTERN = re.compile(
+    r"\b(compare|comparison|versus|vs|along with|together with|as well as|with their|and their|"
+    r"difference between|both|combined|against)\b"
+)
+TREND_PATTERN = re.compile(r"\b(trend|over time|month wise|monthwise|week wise|weekwise|day wise|growth|compared to)\b")
+
+# Default USD prices per 1M (input, output) tokens; LLM_PRICES overrides
+DEFAULT_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+LATENCY_WINDOW = 500
+
+
+def _parse_prices(spec: str) -> Dict[str, tuple]:
+    """'gpt-4o=2.5/10,gpt-4o-mini=0.15/0.6' -> {model: (input, output)}"""
+    prices = dict(DEFAULT_PRICES)
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        model, _, value = part.rpartition("=")
+        try:
+            price_in, _, price_out = value.partition("/")
+            prices[model.strip()] = (float(price_in), float(price_out or price_in))
+        except ValueError:
+            print(f"[WARNING] Ignoring LLM price '{part}'")
+    return prices
+
+
+def _keyword_pattern(keywords: List[str]) -> "re.Pattern":
+    return re.compile(r"\b(" + "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)) + r")\b")
+
+
+class TierChoice:
+    """The model (and schema scope) picked for one generation attempt"""
+
+    def __init__(self, tier: str, model: str, domain: str, complexity: Dict[str, Any],
+                 tables: List[str], slim: bool, escalated: bool):
+        self.tier = tier
+        self.model = model
+        self.domain = domain
+        self.complexity = complexity
+        self.tables = tables
+        self.slim = slim  # Send only `tables` from the schema
+        self.escalated = escalated
+
+
+class ModelTiering:
+    """Picks the generation model from a complexity estimate and validator feedback"""
+
+    def __init__(
+        self,
+        fast_model: str = settings.LLM_FAST_MODEL,
+        strong_model: str = settings.LLM_STRONG_MODEL,
+        threshold: int = settings.TIERING_COMPLEXITY_THRESHOLD,
+        slim_prompt: bool = settings.TIERING_SLIM_PROMPT,
+        enabled: bool = settings.MODEL_TIERING_ENABLED
+    ):
+        self.models = {"fast": fast_model, "strong": strong_model}
+        self.threshold = threshold
+        self.slim_prompt = slim_prompt
+        self.enabled = enabled
+        self.prices = _parse_prices(settings.LLM_PRICES)
+        self._patterns: Dict[int, "re.Pattern"] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "questions": 0, "started_fast": 0, "started_strong": 0, "escalations": 0,
+            "tiers": {tier: {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0} for tier in TIERS}
+        }
+        self._latency: Dict[str, Deque[float]] = {tier: deque(maxlen=LATENCY_WINDOW) for tier in TIERS}
+
+    # ------------------------------------------------------------------------
+    # ESTIMATE
+    # ------------------------------------------------------------------------
+
+    def tables_in(self, question: str, table_keywords: Dict[str, List[str]]) -> List[str]:
+        """Tables whose keywords appear in the question"""
+        text = question.lower()
+        tables = []
+        for table, keywords in table_keywords.items():
+            key = id(keywords)
+            if key not in self._patterns:
+                self._patterns[key] = _keyword_pattern([table.replace("_", " "), table] + keywords)
+            if self._patterns[key].search(text):
+                tables.append(table)
+        return tables
+
+    def estimate(self, question: str, table_keywords: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+        """Complexity signals and score for a question"""
+        text = " " + question.lower() + " "
+        tables = self.tables_in(question, table_keywords) if table_keywords else []
+        aggregations = set(AGGREGATION_PATTERN.findall(text))
+        joins = JOIN_PATTERN.findall(text)
+        dates = sum(len(pattern.findall(text)) for _, pattern in DATE_RANGE_PATTERNS)
+        trend = bool(TREND_PATTERN.search(text))
+
+        score = (
+            2 * max(len(tables) - 1, 0)
+            + min(len(aggregations), 2)
+            + 2 * min(len(joins), 2)
+            + min(dates, 2) + (2 if trend or dates > 1 else 0)
+            + (1 if len(text.split()) > 25 else 0)
+        )
+        return {
+            "score": score,
+            "tables": tables,
+            "aggregations": sorted(aggregations),
+            "joins": len(joins),
+            "date_ranges": dates,
+            "trend": trend
+        }
+
+    # ------------------------------------------------------------------------
+    # CHOICE
+    # ------------------------------------------------------------------------
+
+    def choose(self, question: str, domain: str, table_keywords: Optional[Dict[str, List[str]]] = None,
+               rejected: bool = False, attempt: int = 0) -> TierChoice:
+        """
+        Tier for a generation attempt. `rejected` = the validator sent the previous
+        attempt back; `attempt` = attempts made so far for this question.
+        """
+        complexity = self.estimate(question, table_keywords)
+        if not self.enabled:
+            return TierChoice("strong", self.models["strong"], domain, complexity, complexity["tables"], False, False)
+
+        high = complexity["score"] >= self.threshold
+        escalated = rejected and not high
+        tier = "strong" if high or rejected else "fast"
+        tables = complexity["tables"]
+        slim = tier == "fast" and self.slim_prompt and bool(tables)
+
+        with self._lock:
+            if attempt == 0:
+                self.stats["questions"] += 1
+                self.stats["started_strong" if high else "started_fast"] += 1
+            elif escalated and attempt == 1:
+                self.stats["escalations"] += 1  # First rejection of a fast-tier question
+                MODEL_TIER_ESCALATIONS.inc(domain=domain, reason="validator")
+        MODEL_TIER_CALLS.inc(domain=domain, tier=tier)
+        return TierChoice(tier, self.models[tier], domain, complexity, tables, slim, escalated)
+
+    def generate(self, messages: Any, choice: TierChoice, stage: str = "generate_query",
+                 prepare: Optional[Callable] = None, temperature: float = 0) -> Any:
+        """Run the generation call on the chosen tier's model and record it"""
+        tracer.set_attribute("llm.tier", choice.tier)
+        tracer.set_attribute("llm.complexity", choice.complexity["score"])
+        start = time.perf_counter()
+        response = llm_gateway.invoke(messages, stage=stage, model=choice.model, prepare=prepare, temperature=temperature)
+        self.record(choice, response, time.perf_counter() - start)
+        return response
+
+    def record(self, choice: TierChoice, response: Any, seconds: float) -> None:
+        """Tokens, cost and latency of a finished generation call"""
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        model = (getattr(response, "response_metadata", None) or {}).get("model_name") or choice.model
+        price_in, price_out = self._price(model)
+        cost = (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+        with self._lock:
+            tier_stats = self.stats["tiers"][choice.tier]
+            tier_stats["calls"] += 1
+            tier_stats["input_tokens"] += input_tokens
+            tier_stats["output_tokens"] += output_tokens
+            tier_stats["cost_usd"] += cost
+            self._latency[choice.tier].append(seconds)
+        if cost:
+            LLM_COST_USD.inc(cost, model=model, tier=choice.tier)
+
+    def _price(self, model: str) -> tuple:
+        # Dated snapshots ("gpt-4o-mini-2024-07-18") use their base model's price
+        for name in sorted(self.prices, key=len, reverse=True):
+            if model == name or model.startswith(name + "-"):
+                return self.prices[name]
+        return (0.0, 0.0)
+
+    # ------------------------------------------------------------------------
+    # STATS
+    # ------------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tiers = {}
+            for tier in TIERS:
+                stats = dict(self.stats["tiers"][tier])
+                samples = sorted(self._latency[tier])
+                calls = stats["calls"]
+                tiers[tier] = {
+                    "model": self.models[tier],
+                    **stats,
+                    "cost_usd": round(stats["cost_usd"], 6),
+                    "cost_per_call_usd": round(stats["cost_usd"] / calls, 6) if calls else 0.0,
+                    "p50_ms": round(samples[len(samples) // 2] * 1000, 1) if samples else None,
+                    "p95_ms": round(samples[min(int(0.95 * len(samples)), len(samples) - 1)] * 1000, 1) if samples else None
+                }
+            started_fast = self.stats["started_fast"]
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "slim_prompt": self.slim_prompt,
+                "questions": self.stats["questions"],
+                "started_fast": started_fast,
+                "started_strong": self.stats["started_strong"],
+                "escalations": self.stats["escalations"],
+                "escalation_rate": round(self.stats["escalations"] / started_fast, 3) if started_fast else 0.0,
+                "tiers": tiers
+            }
+
+
+# Global instance
+model_tiering = ModelTiering()
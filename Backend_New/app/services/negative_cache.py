@@ -0,0 +1,214 @@
+"""
+Negative Cache - Recently Failing Questions
+===========================================
+Remembers questions whose generated SQL failed or returned no rows, keyed by
+domain and normalized question, for NEGATIVE_CACHE_TTL_SECONDS after the last
+failure. Re-asking one of them no longer repeats generation, up to
+MAX_VALIDATION_ATTEMPTS validator rounds and a DB call for the same outcome:
+
+- empty: the SQL that returned nothing is re-run directly (one DB call, no
+  generation); the entry is dropped once it returns rows. Re-runs that are
+  still empty don't extend it: it expires NEGATIVE_CACHE_TTL_SECONDS after
+  the failure that produced the SQL, and the question is regenerated then
+- sql_error / no_result / exception: the first repeat regenerates with the
+  failure (error and failed SQL) in the prompt; after NEGATIVE_CACHE_MAX_FAILURES
+  failures the question is answered from the negative cache until it expires
+
+Entries live in the shared state store, so every worker sees them. Failure and
+strategy totals are shared counters; the hot spots in get_stats() are the
+failing questions this worker has seen, with their shared failure counts.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.metrics import NEGATIVE_CACHE_EVENTS
+from app.services.slot_extractor import normalize
+from app.services.state_store import StateStore, state_store
+
+FAILURE_CLASSES = ["sql_error", "empty", "no_result", "exception"]
+STRATEGIES = ["reuse_sql", "retry_hint", "short_circuit"]
+
+# Failing questions tracked per worker for the hot-spot list
+RECENT_LIMIT = 200
+
+
+class NegativeCache:
+    """Short-lived record of questions that recently failed or returned nothing"""
+
+    KEY_PREFIX = "negative_cache:entry:"
+    COUNTER_PREFIX = "negative_cache:count:"
+
+    def __init__(
+        self,
+        store: StateStore = None,
+        ttl_seconds: int = settings.NEGATIVE_CACHE_TTL_SECONDS,
+        max_failures: int = settings.NEGATIVE_CACHE_MAX_FAILURES,
+        enabled: bool = settings.NEGATIVE_CACHE_ENABLED
+    ):
+        self.store = store or state_store
+        self.ttl_seconds = ttl_seconds
+        self.max_failures = max_failures
+        self.enabled = enabled and ttl_seconds > 0
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, question: str, db_name: str) -> str:
+        digest = hashlib.md5(normalize(question).encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}{db_name}:{digest}"
+
+    # ------------------------------------------------------------------------
+    # LOOKUP
+    # ------------------------------------------------------------------------
+
+    def lookup(self, question: str, db_name: str) -> Optional[Dict[str, Any]]:
+        """The live failure entry for this question, if any"""
+        if not self.enabled:
+            return None
+        try:
+            entry = self.store.get(self._key(question, db_name))
+        except Exception as e:
+            print(f"[WARNING] Negative cache lookup failed: {e}")
+            return None
+        # Store TTLs are whole seconds; expires_at is exact
+        if entry and entry.get("expires_at", float("inf")) <= time.time():
+            return None
+        return entry
+
+    def strategy(self, entry: Optional[Dict[str, Any]]) -> Optional[str]:
+        """How to handle a repeat: reuse_sql, retry_hint, short_circuit (None = normal pipeline)"""
+        if not entry:
+            return None
+        if entry["failure_class"] == "empty" and entry.get("sql"):
+            return "reuse_sql"
+        if entry["count"] >= self.max_failures:
+            return "short_circuit"
+        return "retry_hint"
+
+    def note(self, strategy: str, db_name: str) -> None:
+        """Count a repeat handled by the negative cache"""
+        NEGATIVE_CACHE_EVENTS.inc(domain=db_name, event=strategy)
+        try:
+            self.store.incr(f"{self.COUNTER_PREFIX}{strategy}")
+        except Exception as e:
+            print(f"[WARNING] Negative cache counter failed: {e}")
+
+    @staticmethod
+    def hint(entry: Dict[str, Any]) -> str:
+        """Prompt note for regenerating a question whose last attempt failed"""
+        note = f"Note: the last attempt at this question failed ({entry['failure_class']})"
+        if entry.get("last_error"):
+            note += f" with: {entry['last_error'][:300]}"
+        if entry.get("sql"):
+            note += f"\nFailed SQL (do not repeat it): {entry['sql'][:500]}"
+        return note + "\nWrite a different query; check every table and column name against the schema."
+
+    @staticmethod
+    def message(entry: Dict[str, Any]) -> str:
+        """User-facing reply for a short-circuited question"""
+        reason = "the query kept failing" if entry["failure_class"] != "no_result" else "no query could be produced"
+        return (f"This question failed {entry['count']} times in the last few minutes ({reason}). "
+                f"Please rephrase it, or name the table, column or period you are interested in.")
+
+    # ------------------------------------------------------------------------
+    # RECORDING
+    # ------------------------------------------------------------------------
+
+    def record(self, question: str, db_name: str, failure_class: str,
+               error: str = "", sql: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Record a failed attempt; the TTL restarts with every failure except an empty re-run"""
+        if not self.enabled:
+            return None
+
+        key = self._key(question, db_name)
+        now = time.time()
+        try:
+            entry = self.store.get(key)
+            if not entry or entry.get("expires_at", float("inf")) <= now:
+                entry = {
+                    "question": question[:200],
+                    "database": db_name,
+                    "count": 0,
+                    "first_ts": now
+                }
+            # Re-running the stored empty SQL keeps its expiry, or a question
+            # asked every few minutes would stay pinned to that SQL for good
+            rerun = failure_class == "empty" and entry.get("failure_class") == "empty" and sql == entry.get("sql")
+            expires_at = entry.get("expires_at", now + self.ttl_seconds) if rerun else now + self.ttl_seconds
+            entry.update({
+                "failure_class": failure_class,
+                "last_error": str(error)[:500],
+                "sql": sql or entry.get("sql"),
+                "count": entry["count"] + 1,
+                "last_ts": now,
+                "expires_at": expires_at
+            })
+            self.store.set(key, entry, ttl=math.ceil(expires_at - now))
+            self.store.incr(f"{self.COUNTER_PREFIX}{failure_class}")
+        except Exception as e:
+            print(f"[WARNING] Negative cache write failed: {e}")
+            return None
+
+        NEGATIVE_CACHE_EVENTS.inc(domain=db_name, event=failure_class)
+        with self._lock:
+            self._recent[key] = None
+            self._recent.move_to_end(key)
+            while len(self._recent) > RECENT_LIMIT:
+                self._recent.popitem(last=False)
+        print(f"🚫 Negative cache: {failure_class} x{entry['count']} for '{question[:50]}...'")
+        return entry
+
+    def clear(self, question: str, db_name: str) -> None:
+        """Forget a question once it succeeds"""
+        if not self.enabled:
+            return
+        try:
+            self.store.delete(self._key(question, db_name))
+        except Exception as e:
+            print(f"[WARNING] Negative cache delete failed: {e}")
+
+    # ------------------------------------------------------------------------
+    # STATS
+    # ------------------------------------------------------------------------
+
+    def get_stats(self, limit: int = 10) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+
+        with self._lock:
+            keys = list(self._recent)
+        hot_spots: List[Dict[str, Any]] = []
+        for key in keys:
+            entry = self.store.get(key)
+            if entry is None:
+                with self._lock:
+                    self._recent.pop(key, None)  # Expired or cleared
+                continue
+            hot_spots.append({
+                "question": entry["question"],
+                "database": entry["database"],
+                "failure_class": entry["failure_class"],
+                "count": entry["count"],
+                "last_error": entry["last_error"][:200],
+                "age_seconds": round(time.time() - entry["first_ts"], 1)
+            })
+        hot_spots.sort(key=lambda e: e["count"], reverse=True)
+
+        return {
+            "enabled": True,
+            "ttl_seconds": self.ttl_seconds,
+            "max_failures": self.max_failures,
+            "failures": {c: self.store.get_counter(f"{self.COUNTER_PREFIX}{c}") for c in FAILURE_CLASSES},
+            "repeats": {s: self.store.get_counter(f"{self.COUNTER_PREFIX}{s}") for s in STRATEGIES},
+            "active_entries": len(hot_spots),
+            "hot_spots": hot_spots[:limit]
+        }
+
+
+# Global instance
+negative_cache = NegativeCache()
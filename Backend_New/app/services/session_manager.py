@@ -1,7 +1,8 @@
 """
 Session Management
 ==================
-SQLite-based session storage for chat history
+SQLite-based session storage for chat history.
+WAL mode lets several uvicorn workers share the same SESSION_DB_PATH file.
 """
 
 import sqlite3
@@ -9,6 +10,7 @@ import json
 from datetime import datetime
 from typing import List, Dict, Optional
 from pathlib import Path
+from app.core.config import settings
 
 class SessionManager:
     def __init__(self, db_path: str = "chat_sessions.db"):
@@ -20,6 +22,9 @@ class SessionManager:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # Concurrent readers + one writer across worker processes
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS sessions (
                 session_id TEXT PRIMARY KEY,
@@ -168,4 +173,4 @@ class SessionManager:
         conn.close()
 
 # Create singleton instance
-session_manager = SessionManager()
+session_manager = SessionManager(settings.SESSION_DB_PATH)
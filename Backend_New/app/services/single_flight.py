@@ -0,0 +1,134 @@
+"""
+Single Flight - Coalescing Identical Concurrent Questions
+=========================================================
+At shift change many users ask the same question within seconds. Requests
+with the same key - normalized question, routed domain and date - share one
+run of the pipeline instead of each generating, validating and executing
+the same SQL:
+
+- the first request (leader) starts the run in its own task
+- duplicates arriving while it is in flight (followers) attach to it, replay
+  the events streamed so far and then receive the rest live
+- every subscriber gets the identical event stream (status, query, chunks)
+- the run survives the leader disconnecting and is cancelled only when the
+  last subscriber has gone
+
+Coalescing is per worker process; the finished run leaves its SQL in the
+shared query cache, so later duplicates on any worker are cache hits.
+"""
+
+import asyncio
+from datetime import date
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.metrics import COALESCED_REQUESTS
+from app.services.slot_extractor import normalize
+from app.services.sse import Error, Event
+
+
+class _Flight:
+    """One in-flight run: its events so far and the subscribers reading them"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Event] = []  # Shared by all subscribers, never mutated
+        self.done = False
+        self.subscribers = 0
+        self.followers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def publish(self, event: Event) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self._notify()
+
+    def _notify(self) -> None:
+        # Wake everyone waiting on the current event, later waiters get a fresh one
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """Shares one pipeline run between identical concurrent requests"""
+
+    def __init__(self, enabled: bool = settings.REQUEST_COALESCING_ENABLED):
+        self.enabled = enabled
+        self._flights: Dict[str, _Flight] = {}
+        self.stats = {"runs": 0, "coalesced": 0, "max_followers": 0, "cancelled": 0}
+
+    @staticmethod
+    def key(question: str, db_name: str, day: Optional[date] = None) -> str:
+        """Relative dates make the date part of the answer, so it is part of the key"""
+        return f"{db_name}:{(day or date.today()).isoformat()}:{normalize(question)}"
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a request with this key would join a running flight"""
+        return self.enabled and key in self._flights
+
+    async def _run(self, flight: _Flight, factory: Callable[[], AsyncIterator[Event]]) -> None:
+        try:
+            async for event in factory():
+                flight.publish(event)
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            raise
+        except Exception as e:
+            print(f"❌ Coalesced run failed: {e}")
+            flight.publish(Error(f'Error: {str(e)}'))
+        finally:
+            # New duplicates start a fresh run (and will usually hit the query cache)
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            flight.finish()
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[Event]], domain: str = "") -> AsyncGenerator[Event, None]:
+        """Events of the run for this key: started by the first caller, shared by the rest"""
+        if not self.enabled:
+            async for event in factory():
+                yield event
+            return
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(key)
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(flight, factory))
+            self.stats["runs"] += 1
+        else:
+            flight.followers += 1
+            self.stats["coalesced"] += 1
+            self.stats["max_followers"] = max(self.stats["max_followers"], flight.followers)
+            COALESCED_REQUESTS.inc(domain=domain)
+            print(f"🔗 Coalesced with in-flight run ({flight.followers} waiting): '{key[:60]}...'")
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(flight.events):
+                    yield flight.events[index]
+                    index += 1
+                if flight.done:
+                    return
+                await flight.changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task:
+                flight.task.cancel()  # Nobody is listening any more
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            **self.stats,
+            "in_flight": len(self._flights),
+            "waiting": sum(f.followers for f in self._flights.values())
+        }
+
+
+# Global instance
+single_flight = SingleFlight()
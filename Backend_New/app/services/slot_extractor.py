@@ -0,0 +1,521 @@
+"""
+Slot Extractor - Literal Detection in Questions
+===============================================
+Finds the literals a question filters on - people, departments, divisions,
+statuses, date ranges and numbers - and returns them together with a masked
+form of the question ("pending tasks of <person> <date_range>"), so
+structurally identical questions compare equal regardless of the literals.
+
+Names, departments and divisions come from a gazetteer of DISTINCT column
+values (sources declared per domain in app/domains/*/templates.py), loaded
+lazily from the shared engine and refreshed every TEMPLATE_GAZETTEER_TTL_SECONDS.
+
+The SQL helpers turn generated SQL into a parameterised shape ({person},
+{date_from}, ...) and bind another question's slots back into it; the SQL
+templates and the query cache share them.
+"""
+
+from datetime import date, timedelta
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import calendar
+import re
+import threading
+import time
+
+from app.core.config import settings
+
+
+# ============================================================================
+# PRECOMPILED PATTERNS & VOCABULARY
+# ============================================================================
+
+WORD_PATTERN = re.compile(r"<\w+>|[a-z0-9]+(?:[.'&-][a-z0-9]+)*")
+QUOTED_PATTERN = re.compile(r"(?<!\w)'[^']+'(?!\w)|\"[^\"]+\"")
+POSSESSIVE_PATTERN = re.compile(r"'s\b")
+NUMBER_PATTERN = re.compile(r"^\d+$")
+COUNT_PATTERN = re.compile(r"\b(how many|count|number of)\b")
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+
+# Relative date phrases -> date range (checked in order, longest phrases first).
+# Financial year runs April-March; Hinglish forms as used in the domain prompts.
+DATE_RANGE_PATTERNS = [
+    ("today", re.compile(r"\b(today|aaj)\b")),
+    ("yesterday", re.compile(r"\byesterday\b")),
+    ("this_fy", re.compile(r"\b(this|current) (financial year|fiscal year|fy)\b")),
+    ("last_fy", re.compile(r"\b(last|previous|past) (financial year|fiscal year|fy)\b")),
+    ("ytd", re.compile(r"\b(year to date|ytd|so far this year)\b")),
+    ("this_week", re.compile(r"\b(this|current|is|iss) (week|hafte)\b")),
+    ("last_week", re.compile(r"\b(last|previous|past|pichle|pichhle) (week|hafte)\b")),
+    ("this_month", re.compile(r"\b(this|current|is|iss) (month|mahine)\b")),
+    ("last_month", re.compile(r"\b(last|previous|past|pichle|pichhle) (month|mahine)\b")),
+    ("this_quarter", re.compile(r"\b(this|current) quarter\b")),
+    ("last_quarter", re.compile(r"\b(last|previous|past) quarter\b")),
+    ("this_year", re.compile(r"\b(this|current|is|iss) (year|saal)\b")),
+    ("last_year", re.compile(r"\b(last|previous|past|pichle|pichhle) (year|saal)\b")),
+    ("last_n", re.compile(r"\b(?:last|past|previous) (\d+) (day|week|month)s?\b")),
+    # Month names need a preposition or a year ("tasks in march", "march 2025"), not "may be late"
+    ("month", re.compile(rf"\b(?:in|for|during|of|since) ({MONTH_NAMES})(?:,? (\d{{4}}))?\b")),
+    ("month", re.compile(rf"\b({MONTH_NAMES}),? (\d{{4}})\b")),
+]
+
+# Status words -> canonical status (longest phrases first so "not done" beats "done")
+STATUS_PHRASES = [
+    ("not completed", "pending"), ("not done", "pending"), ("incomplete", "pending"),
+    ("outstanding", "pending"), ("pending", "pending"), ("open", "pending"),
+    ("completed", "completed"), ("complete", "completed"), ("finished", "completed"),
+    ("submitted", "completed"), ("closed", "completed"), ("done", "completed"),
+    ("approved", "approved"), ("rejected", "rejected"),
+]
+STATUS_PATTERN = re.compile(r"\b(" + "|".join(re.escape(p) for p, _ in STATUS_PHRASES) + r")\b")
+STATUS_CANONICAL = dict(STATUS_PHRASES)
+
+# Words that never start a gazetteer match on their own
+COMMON_WORDS = {
+    "the", "all", "any", "and", "for", "with", "from", "task", "tasks", "pending", "done",
+    "list", "show", "total", "count", "report", "status", "open", "admin", "user", "users",
+    "department", "division", "machine", "maintenance", "leave", "request", "sales", "lead",
+}
+
+# Slot types filled from the gazetteer, in priority order for ambiguous values
+GAZETTEER_TYPES = ["person", "department", "division"]
+# Words right after a value that decide its type ("SMS division")
+TYPE_HINTS = {"department": "department", "dept": "department", "division": "division"}
+
+# Recent extractions kept per process (template match, cache probes and harvest share them)
+EXTRACTION_MEMO_SIZE = 256
+
+
+def normalize(text: str) -> str:
+    """Lowercase words joined by single spaces"""
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+def resolve_date_range(kind: str, match: "re.Match", today: date) -> Tuple[date, date]:
+    """[from, to) for a matched relative date phrase"""
+    if kind == "today":
+        return today, today + timedelta(days=1)
+    if kind == "yesterday":
+        return today - timedelta(days=1), today
+    if kind == "this_week":
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=7)
+    if kind == "last_week":
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=7)
+    if kind == "this_month":
+        start = today.replace(day=1)
+        return start, _add_months(start, 1)
+    if kind == "last_month":
+        start = _add_months(today.replace(day=1), -1)
+        return start, today.replace(day=1)
+    if kind in ("this_quarter", "last_quarter"):
+        start = date(today.year, 3 * ((today.month - 1) // 3) + 1, 1)
+        start = start if kind == "this_quarter" else _add_months(start, -3)
+        return start, _add_months(start, 3)
+    if kind == "this_year":
+        return date(today.year, 1, 1), date(today.year + 1, 1, 1)
+    if kind == "last_year":
+        return date(today.year - 1, 1, 1), date(today.year, 1, 1)
+    if kind in ("this_fy", "last_fy"):
+        start = date(today.year if today.month >= 4 else today.year - 1, 4, 1)
+        start = start if kind == "this_fy" else date(start.year - 1, 4, 1)
+        return start, date(start.year + 1, 4, 1)
+    if kind == "ytd":
+        return date(today.year, 1, 1), today + timedelta(days=1)
+    if kind == "last_n":
+        count, unit = int(match.group(1)), match.group(2)
+        days = {"day": 1, "week": 7}.get(unit)
+        start = today - timedelta(days=count * days) if days else _add_months(today, -count)
+        return start, today + timedelta(days=1)
+    # Named month: that month of the given year, else its most recent occurrence
+    month = MONTHS[match.group(1)]
+    year = int(match.group(2)) if match.group(2) else (today.year if month <= today.month else today.year - 1)
+    start = date(year, month, 1)
+    return start, _add_months(start, 1)
+
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    return date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def date_kind(kind: str, match: "re.Match") -> str:
+    """Stable name of a matched period ("this_week", "last_7_day", "month")"""
+    if kind == "last_n":
+        return f"last_{int(match.group(1))}_{match.group(2)}"
+    return kind
+
+
+# ============================================================================
+# RELATIVE DATES IN SQL
+# ============================================================================
+
+WEEK_START = "DATE_TRUNC('week', CURRENT_DATE)::DATE"
+MONTH_START = "DATE_TRUNC('month', CURRENT_DATE)"
+QUARTER_START = "DATE_TRUNC('quarter', CURRENT_DATE)"
+YEAR_START = "DATE_TRUNC('year', CURRENT_DATE)"
+FY_START = "(DATE_TRUNC('year', CURRENT_DATE - INTERVAL '3 months') + INTERVAL '3 months')"
+
+# Period kind -> PostgreSQL [from, to) expressions that stay correct on any day
+RELATIVE_DATE_SQL = {
+    "today": ("CURRENT_DATE", "(CURRENT_DATE + 1)"),
+    "yesterday": ("(CURRENT_DATE - 1)", "CURRENT_DATE"),
+    "this_week": (WEEK_START, f"({WEEK_START} + 7)"),
+    "last_week": (f"({WEEK_START} - 7)", WEEK_START),
+    "this_month": (f"{MONTH_START}::DATE", f"({MONTH_START} + INTERVAL '1 month')::DATE"),
+    "last_month": (f"({MONTH_START} - INTERVAL '1 month')::DATE", f"{MONTH_START}::DATE"),
+    "this_quarter": (f"{QUARTER_START}::DATE", f"({QUARTER_START} + INTERVAL '3 months')::DATE"),
+    "last_quarter": (f"({QUARTER_START} - INTERVAL '3 months')::DATE", f"{QUARTER_START}::DATE"),
+    "this_year": (f"{YEAR_START}::DATE", f"({YEAR_START} + INTERVAL '1 year')::DATE"),
+    "last_year": (f"({YEAR_START} - INTERVAL '1 year')::DATE", f"{YEAR_START}::DATE"),
+    "this_fy": (f"{FY_START}::DATE", f"({FY_START} + INTERVAL '1 year')::DATE"),
+    "last_fy": (f"({FY_START} - INTERVAL '1 year')::DATE", f"{FY_START}::DATE"),
+    "ytd": (f"{YEAR_START}::DATE", "(CURRENT_DATE + 1)"),
+}
+LAST_N_KIND = re.compile(r"^last_(\d+)_(day|week|month)$")
+DATE_LITERAL_PATTERN = re.compile(r"'(\d{4}-\d{2}-\d{2})[^']*'")
+
+
+def relative_date_sql(kind: str) -> Optional[Tuple[str, str]]:
+    """[from, to) SQL expressions for a relative period; None for absolute ones (named months)"""
+    if kind in RELATIVE_DATE_SQL:
+        return RELATIVE_DATE_SQL[kind]
+    last_n = LAST_N_KIND.match(kind)
+    if not last_n:
+        return None
+    count, unit = int(last_n.group(1)), last_n.group(2)
+    start = f"(CURRENT_DATE - INTERVAL '{count} months')::DATE" if unit == "month" else (
+        f"(CURRENT_DATE - {count * (7 if unit == 'week' else 1)})"
+    )
+    return start, "(CURRENT_DATE + 1)"
+
+
+def canonicalise_relative_dates(sql: str, date_range: Dict[str, Any]) -> str:
+    """
+    Replace the literal dates the LLM computed for a relative period
+    ("this week" -> '2026-10-19') with CURRENT_DATE expressions, so the SQL
+    stays right after the period ends. Inclusive ends ('<= last day') become
+    (to - 1). SQL without the literals is returned unchanged.
+    """
+    expressions = relative_date_sql(date_range["kind"])
+    if not expressions:
+        return sql
+    start_expr, end_expr = expressions
+    start, end = date_range["from"], date_range["to"]
+    last_day = (date.fromisoformat(end) - timedelta(days=1)).isoformat()
+
+    sql = sql.replace(f"'{start}'", start_expr)
+    if f"'{end}'" in sql:
+        sql = sql.replace(f"'{end}'", end_expr)
+    if f"'{last_day}'" in sql:
+        sql = sql.replace(f"'{last_day}'", f"({end_expr} - 1)")
+    return sql
+
+
+def _mentions_date(question: str, day: date) -> bool:
+    """Whether the question spells out this date itself ("1 March 2026", "2026-03-01")"""
+    text = question.lower()
+    if day.isoformat() in text:
+        return True
+    words = set(WORD_PATTERN.findall(text))
+    months = {calendar.month_name[day.month].lower(), calendar.month_abbr[day.month].lower(), str(day.month)}
+    return str(day.year) in words and bool(months & words) and str(day.day) in words
+
+
+def unexplained_dates(sql: str, question: str, slots: Dict[str, List[Any]], today: Optional[date] = None) -> List[str]:
+    """
+    Recent date literals in SQL that neither the question nor its (absolute)
+    date slots account for - typically "now" baked in by the LLM for words
+    like "overdue" or an unrecognised relative phrase. Such SQL goes stale
+    and must not be reused.
+    """
+    today = today or date.today()
+    explained = set()
+    for value in slots.get("date_range", []):
+        explained.update({value["from"], value["to"], (date.fromisoformat(value["to"]) - timedelta(days=1)).isoformat()})
+
+    stray = []
+    for literal in DATE_LITERAL_PATTERN.findall(sql):
+        try:
+            day = date.fromisoformat(literal)
+        except ValueError:
+            continue
+        if literal in explained or _mentions_date(question, day) or abs((day - today).days) > 400:
+            continue
+        stray.append(literal)
+    return stray
+
+
+# ============================================================================
+# SQL PARAMETERISATION
+# ============================================================================
+
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+# Slot types that appear in SQL as one quoted literal
+LITERAL_SLOTS = ["person", "department", "division"]
+
+
+def sql_literal(value: Any) -> str:
+    """Quoted SQL literal (numbers stay bare)"""
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def slot_bindings(slots: Dict[str, List[Any]]) -> Dict[str, str]:
+    """SQL placeholder -> literal for the first value of each slot"""
+    bindings = {name: sql_literal(slots[name][0]) for name in LITERAL_SLOTS + ["number"] if name in slots}
+    if "date_range" in slots:
+        bindings["date_from"] = sql_literal(slots["date_range"][0]["from"])
+        bindings["date_to"] = sql_literal(slots["date_range"][0]["to"])
+    return bindings
+
+
+def bind_sql(sql: str, slots: Dict[str, List[Any]]) -> Optional[str]:
+    """Fill a parameterised SQL with a question's slots; None if a placeholder stays unbound"""
+    bindings = slot_bindings(slots)
+    if any(p not in bindings for p in PLACEHOLDER_PATTERN.findall(sql)):
+        return None
+    return PLACEHOLDER_PATTERN.sub(lambda m: bindings[m.group(1)], sql)
+
+
+def parameterise_sql(sql: str, slots: Dict[str, List[Any]]) -> Optional[str]:
+    """
+    Replace a question's literals in generated SQL with placeholders
+    ('Ramesh' -> {person}, '2026-03-01' -> {date_from}). None when a slot's
+    literal isn't in the SQL - the filter was written some other way and
+    re-binding it would silently drop it.
+    """
+    if "{" in sql:
+        return None
+
+    for slot_type in LITERAL_SLOTS:
+        if slot_type not in slots:
+            continue
+        value = str(slots[slot_type][0]).replace("'", "''")
+        pattern = re.compile(r"'(%?)" + re.escape(value) + r"(%?)'", re.IGNORECASE)
+
+        def placeholder(match):
+            literal = match.group(0)[1 + len(match.group(1)):-1 - len(match.group(2))]
+            expression = f"{{{slot_type}}}"
+            if literal != value and literal == value.lower():
+                expression = f"LOWER({expression})"
+            elif literal != value and literal == value.upper():
+                expression = f"UPPER({expression})"
+            if match.group(1):
+                expression = f"'%' || {expression}"
+            if match.group(2):
+                expression = f"{expression} || '%'"
+            return expression
+
+        sql, found = pattern.subn(placeholder, sql)
+        if not found:
+            return None
+
+    if "number" in slots:
+        # Only "top N" style limits - a bare digit elsewhere may be unrelated
+        limit_pattern = re.compile(rf"\bLIMIT\s+{slots['number'][0]}\b", re.IGNORECASE)
+        sql, found = limit_pattern.subn("LIMIT {number}", sql)
+        if found != 1:
+            return None
+
+    if "date_range" in slots:
+        start, end = slots["date_range"][0]["from"], slots["date_range"][0]["to"]
+        last_day = (date.fromisoformat(end) - timedelta(days=1)).isoformat()
+        if f"'{start}'" not in sql:
+            return None
+        sql = sql.replace(f"'{start}'", "{date_from}")
+        if f"'{end}'" in sql:
+            sql = sql.replace(f"'{end}'", "{date_to}")
+        elif f"'{last_day}'" in sql:
+            sql = sql.replace(f"'{last_day}'", "({date_to}::DATE - 1)")
+        else:
+            return None
+    return sql
+
+
+class SlotExtractor:
+    """Extract literal slots from questions"""
+
+    def __init__(self, ttl_seconds: int = settings.TEMPLATE_GAZETTEER_TTL_SECONDS,
+                 max_values: int = settings.TEMPLATE_GAZETTEER_MAX_VALUES):
+        self.ttl_seconds = ttl_seconds
+        self.max_values = max_values
+        # slot type -> [(table, column)], registered by the template store
+        self.sources: Dict[str, List[Tuple[str, str]]] = {}
+        # normalized phrase -> {slot type: original value}
+        self._gazetteer: Dict[str, Dict[str, str]] = {}
+        self._max_words = 1
+        self._loaded_at = 0.0
+        self._fixed = False  # Values given by use_values(), never reloaded
+        self._lock = threading.Lock()
+        self._memo: "OrderedDict[Tuple[str, date], Dict[str, Any]]" = OrderedDict()
+
+    # ------------------------------------------------------------------------
+    # GAZETTEER
+    # ------------------------------------------------------------------------
+
+    def add_sources(self, sources: Dict[str, List[Tuple[str, str]]]) -> None:
+        for slot_type, columns in sources.items():
+            known = self.sources.setdefault(slot_type, [])
+            known.extend(c for c in columns if c not in known)
+
+    def _index(self, values: Dict[str, List[str]]) -> None:
+        """Replace the gazetteer with these values per slot type"""
+        gazetteer: Dict[str, Dict[str, str]] = {}
+        for slot_type in GAZETTEER_TYPES:
+            for value in values.get(slot_type, []):
+                value = str(value).strip()
+                phrase = normalize(value)
+                words = phrase.split()
+                # Skip values that would match ordinary words ("IT", "PC", "open")
+                if not words or (len(words) == 1 and (len(phrase) < 3 or phrase in COMMON_WORDS)):
+                    continue
+                gazetteer.setdefault(phrase, {}).setdefault(slot_type, value)
+
+        self._gazetteer = gazetteer
+        self._max_words = max((len(p.split()) for p in gazetteer), default=1)
+        self._memo.clear()
+        self._loaded_at = time.time()
+
+    def _load_gazetteer(self) -> None:
+        from app.services.db_service import execute_query
+
+        values: Dict[str, List[str]] = {}
+        for slot_type in GAZETTEER_TYPES:
+            for table, column in self.sources.get(slot_type, []):
+                try:
+                    rows = execute_query(
+                        f"SELECT DISTINCT {column} AS value FROM {table} "
+                        f"WHERE {column} IS NOT NULL LIMIT {self.max_values}"
+                    )
+                except Exception as e:
+                    print(f"[WARNING] Gazetteer source {table}.{column} unavailable: {e}")
+                    continue
+                values.setdefault(slot_type, []).extend(row["value"] for row in rows)
+
+        self._index(values)
+        print(f"📇 Slot gazetteer loaded: {len(self._gazetteer)} values")
+
+    def use_values(self, values: Dict[str, List[str]]) -> None:
+        """Use a fixed gazetteer instead of the database (offline evaluation)"""
+        with self._lock:
+            self._index(values)
+            self._fixed = True
+
+    def _ensure_gazetteer(self) -> None:
+        if self._fixed or (self._loaded_at and time.time() - self._loaded_at < self.ttl_seconds):
+            return
+        with self._lock:
+            if not self._loaded_at or time.time() - self._loaded_at >= self.ttl_seconds:
+                self._load_gazetteer()
+
+    def refresh(self) -> None:
+        """Reload gazetteer values on next use"""
+        self._loaded_at = 0.0
+
+    # ------------------------------------------------------------------------
+    # EXTRACTION
+    # ------------------------------------------------------------------------
+
+    def extract(self, question: str, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Extract slots from a question (memoized - treat the result as read-only).
+
+        Returns:
+            {
+                "slots": {"person": ["AAKASH AGRAWAL"], "date_range": [{"label", "kind", "from", "to"}], ...},
+                "status": "pending" | None,
+                "count": bool,
+                "masked": "pending tasks of <person> <date_range>",
+                "tokens": masked tokens
+            }
+        """
+        self._ensure_gazetteer()
+        today = today or date.today()
+        memo_key = (question, today)
+        extracted = self._memo.get(memo_key)
+        if extracted is not None:
+            return extracted
+
+        text = " " + question.lower() + " "
+        slots: Dict[str, List[Any]] = {}
+
+        # Quoted literals we can't type are kept as opaque text slots
+        for quoted in QUOTED_PATTERN.findall(text):
+            slots.setdefault("text", []).append(quoted[1:-1])
+            text = text.replace(quoted, " <text> ", 1)
+        text = POSSESSIVE_PATTERN.sub("", text)
+
+        for kind, pattern in DATE_RANGE_PATTERNS:
+            for match in list(pattern.finditer(text)):
+                start, end = resolve_date_range(kind, match, today)
+                slots.setdefault("date_range", []).append({
+                    "label": match.group(0).strip(), "kind": date_kind(kind, match),
+                    "from": start.isoformat(), "to": end.isoformat()
+                })
+            text = pattern.sub(" <date_range> ", text)
+
+        status = None
+        statuses = {STATUS_CANONICAL[m] for m in STATUS_PATTERN.findall(text)}
+        if len(statuses) == 1:
+            status = statuses.pop()
+        elif statuses:
+            slots["status"] = sorted(statuses)  # conflicting statuses: no single status
+        text = STATUS_PATTERN.sub(" <status> ", text)
+
+        tokens = WORD_PATTERN.findall(text)
+        masked: List[str] = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            matched = False
+            if not token.startswith("<"):
+                for n in range(min(self._max_words, len(tokens) - i), 0, -1):
+                    phrase = " ".join(tokens[i:i + n])
+                    types = self._gazetteer.get(phrase)
+                    if not types:
+                        continue
+                    hint = TYPE_HINTS.get(tokens[i + n]) if i + n < len(tokens) else None
+                    slot_type = hint if hint in types else next(t for t in GAZETTEER_TYPES if t in types)
+                    slots.setdefault(slot_type, []).append(types[slot_type])
+                    masked.append(f"<{slot_type}>")
+                    i += n
+                    matched = True
+                    break
+            if matched:
+                continue
+            if NUMBER_PATTERN.match(token):
+                slots.setdefault("number", []).append(int(token))
+                masked.append("<number>")
+            else:
+                masked.append(token)
+            i += 1
+
+        extracted = {
+            "slots": slots,
+            "status": status,
+            "count": bool(COUNT_PATTERN.search(question.lower())),
+            "masked": " ".join(masked),
+            "tokens": masked
+        }
+        self._memo[memo_key] = extracted
+        if len(self._memo) > EXTRACTION_MEMO_SIZE:
+            self._memo.popitem(last=False)
+        return extracted
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "gazetteer_values": len(self._gazetteer),
+            "gazetteer_age_seconds": round(time.time() - self._loaded_at, 1) if self._loaded_at else None,
+            "sources": {t: [f"{table}.{column}" for table, column in cols] for t, cols in self.sources.items()}
+        }
+
+
+# Global instance
+slot_extractor = SlotExtractor()
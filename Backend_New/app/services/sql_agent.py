@@ -10,16 +10,19 @@ Complete port of sagar.ipynb logic:
 
 from typing import Literal, TypedDict, Annotated, AsyncGenerator
 from datetime import datetime
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 from langchain_community.utilities import SQLDatabase
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from langgraph.graph import END, START, StateGraph, MessagesState
-from langgraph.checkpoint.memory import MemorySaver
 import json
 
 from app.core.config import settings
+from app.core.database import get_engine
 from app.core.security import validate_sql_security
+from app.services.state_store import get_checkpointer
+from app.services.tracing import tracer, traced_node
+from app.services.db_service import count_result_rows
+from app.services.llm_gateway import llm_gateway
 
 # ============================================================================
 # RESTRICTED DATABASE ACCESS
@@ -31,11 +34,10 @@ class RestrictedSQLDatabase(SQLDatabase):
         all_tables = super().get_usable_table_names()
         return [t for t in all_tables if t.lower() in [x.lower() for x in settings.ALLOWED_TABLES]]
 
-# Initialize database
-# Initialize database
+# Initialize database (on the shared engine - no separate pool for the default agent)
 # print(f"[DEBUG] Connecting to default database: {settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}")
 try:
-    db = RestrictedSQLDatabase.from_uri(settings.DATABASE_URL)
+    db = RestrictedSQLDatabase(get_engine())
     # print(f"[DEBUG] Default Database connected successfully")
     # print(f"[DEBUG] Available tables: {db.get_usable_table_names()}")
 except Exception as e:
@@ -43,11 +45,7 @@ except Exception as e:
     raise
 
 # Initialize OpenAI model
-model = ChatOpenAI(
-    model=settings.LLM_MODEL,
-    temperature=settings.LLM_TEMPERATURE,
-    openai_api_key=settings.OPENAI_API_KEY
-)
+model = llm_gateway.chat(settings.LLM_MODEL, temperature=settings.LLM_TEMPERATURE)
 
 # Initialize toolkit
 toolkit = SQLDatabaseToolkit(db=db, llm=model)
@@ -0,0 +1,259 @@
+"""
+SSE Events - Typed Pipeline Events and Batched Frames
+=====================================================
+The chat pipeline yields typed events (Status, CacheHit, Query, Chunk, Done,
+Error) instead of ready-made `data: {json}` strings. Only the transport turns
+them into Server-Sent Events:
+
+- consecutive answer chunks are coalesced into one `chunk` frame
+- frames are buffered and written together once SSE_FLUSH_MS has passed since
+  the first buffered event, or the buffer reaches SSE_FLUSH_BYTES. Status,
+  query, done and error events are flushed at once, so progress isn't delayed
+- payloads are encoded with orjson when installed (stdlib json otherwise)
+
+The wire format is unchanged: every frame is still `data: {"type": ...}\\n\\n`,
+a `chunk` frame may just carry several tokens. Events numbered by the replay
+buffer (stream_replay.py) get an `id:` line; a merged chunk frame carries the
+id of its last chunk, so resuming after it skips exactly those tokens.
+Consumers (the answer accumulator, coalesced followers) read the event
+objects directly, with no JSON round trip.
+"""
+
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.metrics import SSE_EVENTS, SSE_WRITES
+
+try:
+    import orjson
+
+    def _dumps(payload: Dict[str, Any]) -> bytes:
+        return orjson.dumps(payload)
+except ImportError:
+    orjson = None
+
+    def _dumps(payload: Dict[str, Any]) -> bytes:
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# ============================================================================
+# EVENTS
+# ============================================================================
+
+class Event:
+    """One pipeline event; `fields` are the JSON payload besides 'type'"""
+
+    type = "event"
+    urgent = True  # Flush as soon as it is buffered
+    __slots__ = ("fields",)
+
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": self.type, **self.fields}
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "Event":
+        """Rebuild a stored event (see to_dict)"""
+        event = object.__new__(EVENT_TYPES.get(data.get("type"), Event))
+        event.fields = {k: v for k, v in data.items() if k != "type"}
+        return event
+
+    def encode(self, event_id: Optional[int] = None) -> bytes:
+        frame = b"data: " + _dumps(self.to_dict()) + b"\n\n"
+        return frame if event_id is None else b"id: %d\n" % event_id + frame
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.fields!r})"
+
+
+class Status(Event):
+    """Progress update; front stages carry 'stage' + 'elapsed_ms'"""
+
+    type = "status"
+    __slots__ = ()
+
+    def __init__(self, message: str, **fields):
+        super().__init__(message=message, **fields)
+
+
+class CacheHit(Event):
+    type = "cache_hit"
+    __slots__ = ()
+
+    def __init__(self, value: bool):
+        super().__init__(value=value)
+
+
+class Query(Event):
+    """SQL about to run (generated, cached or template)"""
+
+    type = "query"
+    __slots__ = ()
+
+    def __init__(self, sql: str):
+        super().__init__(content=sql)
+
+    @property
+    def sql(self) -> str:
+        return self.fields["content"]
+
+
+class Chunk(Event):
+    """A piece of the answer text"""
+
+    type = "chunk"
+    urgent = False
+    __slots__ = ()
+
+    def __init__(self, content: str):
+        super().__init__(content=content)
+
+    @property
+    def content(self) -> str:
+        return self.fields["content"]
+
+
+class Done(Event):
+    type = "done"
+    __slots__ = ()
+
+
+class Error(Event):
+    type = "error"
+    __slots__ = ()
+
+    def __init__(self, message: str):
+        super().__init__(message=message)
+
+
+EVENT_TYPES = {cls.type: cls for cls in (Status, CacheHit, Query, Chunk, Done, Error)}
+
+
+# ============================================================================
+# TRANSPORT
+# ============================================================================
+
+_END = object()
+
+
+class _FrameBuffer:
+    """Encoded frames waiting for the next write, with adjacent chunks merged"""
+
+    def __init__(self):
+        self.frames: List[bytes] = []
+        self.size = 0
+        self.chunks: List[str] = []
+        self.chunk_id: Optional[int] = None  # Id of the last merged chunk
+        self.first_at: Optional[float] = None
+        self.events = 0
+        self.counts: Counter = Counter()  # Events per type, for the metrics
+
+    def add(self, event: Event, event_id: Optional[int] = None) -> None:
+        if self.first_at is None:
+            self.first_at = time.monotonic()
+        self.events += 1
+        self.counts[event.type] += 1
+        if isinstance(event, Chunk):
+            self.chunks.append(event.content)
+            self.chunk_id = event_id
+            self.size += len(event.content)
+            return
+        self._close_chunk()
+        self._append(event.encode(event_id))
+
+    def _close_chunk(self) -> None:
+        if self.chunks:
+            content, self.chunks = "".join(self.chunks), []
+            self.size -= len(content)
+            self._append(Chunk(content).encode(self.chunk_id))
+
+    def _append(self, frame: bytes) -> None:
+        self.frames.append(frame)
+        self.size += len(frame)
+
+    def take(self) -> bytes:
+        self._close_chunk()
+        data = b"".join(self.frames)
+        for event_type, count in self.counts.items():
+            SSE_EVENTS.inc(count, type=event_type)
+        SSE_WRITES.inc()
+        self.frames, self.size, self.first_at, self.events, self.chunk_id = [], 0, None, 0, None
+        self.counts = Counter()
+        return data
+
+
+async def unnumbered(events: AsyncIterator[Event]) -> AsyncIterator[Tuple[Optional[int], Event]]:
+    """Events without SSE ids, for streams that can't be resumed"""
+    async for event in events:
+        yield None, event
+
+
+async def sse_frames(
+    events: AsyncIterator[Tuple[Optional[int], Event]],
+    flush_ms: float = settings.SSE_FLUSH_MS,
+    flush_bytes: int = settings.SSE_FLUSH_BYTES
+) -> AsyncIterator[bytes]:
+    """
+    Encode (event id, event) pairs as SSE, batching writes. The source runs in
+    its own task so a flush deadline can pass while it is waiting on the LLM.
+    """
+    if flush_ms <= 0:
+        async for event_id, event in events:
+            SSE_EVENTS.inc(type=event.type)
+            SSE_WRITES.inc()
+            yield event.encode(event_id)
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for event in events:
+                queue.put_nowait(event)
+        except Exception as e:
+            queue.put_nowait(e)  # Re-raised by the transport after a final flush
+        finally:
+            queue.put_nowait(_END)
+
+    task = asyncio.create_task(pump())
+    buffer = _FrameBuffer()
+    interval = flush_ms / 1000
+    error: Optional[Exception] = None
+    finished = False
+    try:
+        while not finished:
+            timeout = None if buffer.first_at is None else max(buffer.first_at + interval - time.monotonic(), 0)
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+                flush = False
+            except asyncio.TimeoutError:
+                item, flush = None, True  # Flush deadline of the oldest buffered event
+
+            # Take everything already queued into this write
+            while item is not None:
+                if item is _END or isinstance(item, Exception):
+                    error = item if item is not _END else None
+                    finished = True
+                    break
+                event_id, event = item
+                buffer.add(event, event_id)
+                flush = flush or event.urgent
+                item = queue.get_nowait() if not queue.empty() else None
+
+            if buffer.events and (flush or finished or buffer.size >= flush_bytes):
+                yield buffer.take()
+        if error is not None:
+            raise error
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
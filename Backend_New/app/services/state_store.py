@@ -0,0 +1,267 @@
+"""
+Shared State Store
+==================
+Pluggable key/value backend for state that must be consistent across
+uvicorn workers and replicas: conversation context, query-cache statistics
+and LangGraph checkpoints.
+
+Backends (STATE_BACKEND):
+- memory: in-process dict (single worker, default)
+- sql:    a table in STATE_DATABASE_URL (SQLite file shared by local workers,
+          or PostgreSQL shared by all nodes)
+- redis:  any Redis-compatible server at REDIS_URL (requires `redis`)
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class StateStore:
+    """Interface for shared state. Values must be JSON-serializable."""
+
+    # True when the state is visible to other processes
+    shared = False
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        raise NotImplementedError
+
+    def get_counter(self, key: str) -> int:
+        value = self.get(key)
+        return int(value) if value is not None else 0
+
+
+class MemoryStateStore(StateStore):
+    """In-process store (state is lost on restart and not shared between workers)"""
+
+    shared = False
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            value, expires_at = self._data.get(key, (0, None))
+            value = int(value) + amount
+            self._data[key] = (value, expires_at)
+            return value
+
+
+class SQLStateStore(StateStore):
+    """Key/value table in SQLite or PostgreSQL (same SQL works on both)"""
+
+    shared = True
+
+    # Purge expired rows every N writes
+    PURGE_EVERY = 500
+
+    def __init__(self, url: str):
+        connect_args = {"timeout": 30} if url.startswith("sqlite") else {}
+        self.engine = create_engine(url, pool_pre_ping=True, connect_args=connect_args)
+        self._writes = 0
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize state table"""
+        with self.engine.begin() as conn:
+            if self.engine.dialect.name == "sqlite":
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS shared_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at DOUBLE PRECISION
+                )
+            """))
+
+    def _maybe_purge(self, conn):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute(
+                text("DELETE FROM shared_state WHERE expires_at IS NOT NULL AND expires_at <= :now"),
+                {"now": time.time()}
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("""
+                    SELECT value FROM shared_state
+                    WHERE key = :key AND (expires_at IS NULL OR expires_at > :now)
+                """),
+                {"key": key, "now": time.time()}
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO shared_state (key, value, expires_at)
+                    VALUES (:key, :value, :expires_at)
+                    ON CONFLICT (key) DO UPDATE
+                    SET value = excluded.value, expires_at = excluded.expires_at
+                """),
+                {"key": key, "value": json.dumps(value, default=str), "expires_at": expires_at}
+            )
+            self._maybe_purge(conn)
+
+    def delete(self, key: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM shared_state WHERE key = :key"), {"key": key})
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO shared_state (key, value, expires_at)
+                    VALUES (:key, :initial, NULL)
+                    ON CONFLICT (key) DO UPDATE
+                    SET value = CAST(CAST(shared_state.value AS INTEGER) + :amount AS TEXT)
+                """),
+                {"key": key, "initial": str(amount), "amount": amount}
+            )
+            row = conn.execute(
+                text("SELECT value FROM shared_state WHERE key = :key"), {"key": key}
+            ).fetchone()
+        return int(json.loads(row[0]))
+
+
+class RedisStateStore(StateStore):
+    """Redis (or Redis-compatible) store"""
+
+    shared = True
+
+    def __init__(self, url: str):
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self.client.set(key, json.dumps(value, default=str), ex=ttl or None)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        return int(self.client.incrby(key, amount))
+
+
+def create_state_store(backend: str = None) -> StateStore:
+    """Create the configured state store, falling back to memory on failure"""
+    backend = (backend or settings.STATE_BACKEND).lower()
+
+    try:
+        if backend == "sql":
+            store = SQLStateStore(settings.STATE_DATABASE_URL)
+            print(f"✅ Shared state: SQL ({make_url(settings.STATE_DATABASE_URL).get_backend_name()})")
+            return store
+        if backend == "redis":
+            if not REDIS_AVAILABLE:
+                raise ImportError("redis package not installed")
+            store = RedisStateStore(settings.REDIS_URL)
+            store.client.ping()
+            print("✅ Shared state: Redis")
+            return store
+    except Exception as e:
+        print(f"❌ Shared state backend '{backend}' failed: {e}. Falling back to in-process state.")
+
+    return MemoryStateStore()
+
+
+def get_checkpointer():
+    """
+    LangGraph checkpointer matching STATE_BACKEND.
+
+    Shared checkpointers need the optional langgraph-checkpoint-sqlite /
+    -postgres / -redis packages; without them the graph falls back to an
+    in-process MemorySaver.
+    """
+    from langgraph.checkpoint.memory import MemorySaver
+
+    backend = settings.STATE_BACKEND.lower()
+
+    try:
+        if backend == "sql":
+            url = make_url(settings.STATE_DATABASE_URL)
+            if url.get_backend_name() == "sqlite":
+                import sqlite3
+                from langgraph.checkpoint.sqlite import SqliteSaver
+
+                conn = sqlite3.connect(url.database, check_same_thread=False, timeout=30)
+                conn.execute("PRAGMA journal_mode=WAL")
+                return SqliteSaver(conn)
+
+            from psycopg import Connection
+            from psycopg.rows import dict_row
+            from langgraph.checkpoint.postgres import PostgresSaver
+
+            conn = Connection.connect(
+                url.set(drivername="postgresql").render_as_string(hide_password=False),
+                autocommit=True,
+                prepare_threshold=0,
+                row_factory=dict_row
+            )
+            saver = PostgresSaver(conn)
+            saver.setup()
+            return saver
+
+        if backend == "redis":
+            from langgraph.checkpoint.redis import RedisSaver
+
+            saver = RedisSaver(redis_url=settings.REDIS_URL)
+            saver.setup()
+            return saver
+    except Exception as e:
+        print(f"⚠️ Shared checkpointer unavailable ({e}). Using in-process MemorySaver.")
+
+    return MemorySaver()
+
+
+# Global instance
+state_store = create_state_store()
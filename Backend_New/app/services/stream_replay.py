@@ -0,0 +1,154 @@
+"""
+Stream Replay - Resumable SSE Streams
+=====================================
+On plant Wi-Fi a phone often loses the connection mid-answer. Without this,
+the pipeline dies with the connection and the question is paid for twice.
+Instead every /chat/stream request runs detached from its connection:
+
+- the request's pipeline runs in its own task and publishes its events into a
+  per-request replay buffer, numbered 1, 2, 3, ... (the SSE `id:` field)
+- the original response is just the first subscriber of that buffer; when the
+  client drops, the pipeline keeps running (and stores the answer as usual)
+- GET /chat/stream/{request_id} with `Last-Event-ID: n` replays the events
+  after n and then follows the live ones
+- a finished buffer is kept for STREAM_RESUME_TTL_SECONDS, at most
+  STREAM_RESUME_MAX_STREAMS of them (oldest finished dropped first)
+
+Buffers live in the worker that ran the request, like coalesced runs, so
+resuming needs sticky sessions when running several workers.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.metrics import STREAM_DETACHED, STREAM_RESUMES
+from app.services.sse import Error, Event
+
+
+class _Stream:
+    """One request's events so far, in id order (id = index + 1)"""
+
+    def __init__(self, request_id: str, owner: Optional[str]):
+        self.request_id = request_id
+        self.owner = owner
+        self.events: List[Event] = []
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def publish(self, event: Event) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    def _notify(self) -> None:
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class StreamReplay:
+    """Runs request pipelines detached from their connection and replays their events"""
+
+    def __init__(
+        self,
+        enabled: bool = settings.STREAM_RESUME_ENABLED,
+        ttl_seconds: int = settings.STREAM_RESUME_TTL_SECONDS,
+        max_streams: int = settings.STREAM_RESUME_MAX_STREAMS
+    ):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_streams = max_streams
+        self._streams: "OrderedDict[str, _Stream]" = OrderedDict()
+        self.stats = {"started": 0, "detached": 0, "resumed": 0, "replayed_events": 0, "expired": 0}
+
+    def start(self, request_id: str, factory: Callable[[], AsyncIterator[Event]], owner: Optional[str] = None) -> None:
+        """Start the request's pipeline in its own task"""
+        self._purge()
+        stream = _Stream(request_id, owner)
+        self._streams[request_id] = stream
+        stream.task = asyncio.create_task(self._run(stream, factory))
+        self.stats["started"] += 1
+
+    async def _run(self, stream: _Stream, factory: Callable[[], AsyncIterator[Event]]) -> None:
+        try:
+            async for event in factory():
+                stream.publish(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Detached stream {stream.request_id} failed: {e}")
+            stream.publish(Error(f'Error: {str(e)}'))
+        finally:
+            stream.finish()
+
+    def get(self, request_id: str) -> Optional[_Stream]:
+        """The request's buffer, unless it has expired"""
+        self._purge()
+        return self._streams.get(request_id)
+
+    async def subscribe(self, request_id: str, after: int = 0, resumed: bool = False) -> AsyncGenerator[Tuple[int, Event], None]:
+        """(id, event) pairs after `after`: the buffered ones, then live ones until the run ends"""
+        stream = self._streams.get(request_id)
+        if stream is None:
+            return
+        if resumed:
+            replayed = max(len(stream.events) - after, 0)
+            self.stats["resumed"] += 1
+            self.stats["replayed_events"] += replayed
+            STREAM_RESUMES.inc(outcome="resumed")
+            print(f"🔁 Resuming stream {request_id} after event {after} ({replayed} buffered)")
+
+        stream.subscribers += 1
+        index = max(after, 0)
+        try:
+            while True:
+                while index < len(stream.events):
+                    yield index + 1, stream.events[index]
+                    index += 1
+                if stream.done:
+                    return
+                await stream.changed.wait()
+        finally:
+            stream.subscribers -= 1
+            if stream.subscribers == 0 and not stream.done:
+                self.stats["detached"] += 1  # Client gone, the pipeline carries on
+                STREAM_DETACHED.inc()
+
+    def _purge(self) -> None:
+        """Drop expired buffers, then the oldest finished ones beyond max_streams"""
+        now = time.monotonic()
+        for request_id, stream in list(self._streams.items()):
+            if stream.done and now - stream.finished_at > self.ttl_seconds:
+                del self._streams[request_id]
+                self.stats["expired"] += 1
+        excess = len(self._streams) - self.max_streams
+        if excess > 0:
+            for request_id in [rid for rid, s in self._streams.items() if s.done][:excess]:
+                del self._streams[request_id]
+                self.stats["expired"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._purge()
+        running = sum(1 for s in self._streams.values() if not s.done)
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            **self.stats,
+            "running": running,
+            "running_detached": sum(1 for s in self._streams.values() if not s.done and s.subscribers == 0),
+            "retained": len(self._streams) - running,
+            "buffered_events": sum(len(s.events) for s in self._streams.values())
+        }
+
+
+# Global instance
+stream_replay = StreamReplay()
@@ -0,0 +1,412 @@
+"""
+Template Store - Parameterised SQL for Frequent Intents
+=======================================================
+Answers frequent question shapes ("pending tasks of <person> last month")
+from vetted, parameterised SQL without the router, generator or validator
+LLMs. Literals come from the slot extractor; a question only matches a
+template when its slots, status word, count intent and every remaining
+content word are covered by the template, so a dropped filter never
+produces a silently wrong answer - anything unexplained goes to the LLM.
+
+Sources:
+- built-in: SQL_TEMPLATES in app/domains/*/templates.py
+- promoted: TEMPLATE_STORE_PATH (JSON), shared by all workers
+- harvested candidates: generated SQL whose literals map onto the question's
+  slots, kept in the shared state store and promoted automatically once
+  TEMPLATE_HARVEST_MIN_QUESTIONS distinct questions produced them
+"""
+
+from datetime import date
+from typing import Dict, Any, List, Optional, Set
+import hashlib
+import json
+import os
+import re
+import threading
+
+from app.core.config import settings
+from app.core.security import validate_sql_security
+from app.services.slot_extractor import (
+    SlotExtractor, slot_extractor, normalize, parameterise_sql, slot_bindings, unexplained_dates,
+    PLACEHOLDER_PATTERN, TYPE_HINTS
+)
+from app.services.state_store import StateStore, state_store
+
+
+# ============================================================================
+# MATCHING VOCABULARY
+# ============================================================================
+
+# Words that carry no intent of their own
+FILLER_WORDS = {
+    "a", "an", "the", "all", "any", "of", "for", "in", "on", "at", "by", "to", "from", "with",
+    "and", "or", "me", "us", "my", "our", "show", "list", "give", "get", "find", "tell", "display",
+    "what", "which", "who", "whose", "are", "is", "was", "were", "be", "been", "how", "many", "much",
+    "number", "count", "total", "do", "does", "did", "have", "has", "had", "there", "please",
+    "that", "this", "these", "those", "can", "you", "i", "wise",
+}
+
+OPTIONAL_BLOCK_PATTERN = re.compile(r"\[\[(.*?)\]\]", re.DOTALL)
+
+# SQL placeholder -> slot type it binds
+PLACEHOLDER_SLOTS = {
+    "person": "person", "department": "department", "division": "division",
+    "date_from": "date_range", "date_to": "date_range", "number": "number",
+}
+
+CANDIDATE_TTL_SECONDS = 7 * 24 * 3600
+MAX_CANDIDATES = 200
+MAX_EXAMPLES = 10
+
+
+def content_tokens(tokens: List[str]) -> Set[str]:
+    """Masked question tokens that carry intent, with light plural stemming"""
+    words = set()
+    for i, token in enumerate(tokens):
+        if token.startswith("<") or token in FILLER_WORDS:
+            continue
+        # "<department> department" - the hint belongs to the slot, a bare one means grouping
+        if token in TYPE_HINTS and i and tokens[i - 1] == f"<{TYPE_HINTS[token]}>":
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        words.add(token)
+    return words
+
+
+class TemplateStore:
+    """Parameterised SQL templates with harvesting from generated SQL"""
+
+    # Shared counter keys
+    MATCHES_KEY = "templates:matches"
+    MISSES_KEY = "templates:misses"
+    CANDIDATES_KEY = "templates:candidates"
+
+    def __init__(
+        self,
+        path: str = settings.TEMPLATE_STORE_PATH,
+        threshold: float = settings.TEMPLATE_MATCH_THRESHOLD,
+        min_questions: int = settings.TEMPLATE_HARVEST_MIN_QUESTIONS,
+        extractor: SlotExtractor = None,
+        store: StateStore = None
+    ):
+        self.enabled = settings.TEMPLATES_ENABLED
+        self.path = path
+        self.threshold = threshold
+        self.min_questions = min_questions
+        self.extractor = extractor or slot_extractor
+        self.store = store or state_store
+        self._builtin: Dict[str, Dict[str, Any]] = {}
+        self._promoted: Dict[str, Dict[str, Any]] = {}
+        self._promoted_mtime = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------------
+    # REGISTRATION & PERSISTENCE
+    # ------------------------------------------------------------------------
+
+    def _prepare(self, template: Dict[str, Any], domain: str, source: str) -> Dict[str, Any]:
+        """Precompute the matching fields of a template definition"""
+        prepared = dict(template, domain=domain, source=source)
+        prepared.setdefault("status", {"any": ""})
+        prepared.setdefault("count", None)
+        prepared.setdefault("requires", [])
+
+        optional_sql = " ".join(OPTIONAL_BLOCK_PATTERN.findall(template["sql"]))
+        required_sql = OPTIONAL_BLOCK_PATTERN.sub("", template["sql"])
+        prepared["_required"] = {PLACEHOLDER_SLOTS[p] for p in PLACEHOLDER_PATTERN.findall(required_sql) if p in PLACEHOLDER_SLOTS}
+        prepared["_optional"] = {PLACEHOLDER_SLOTS[p] for p in PLACEHOLDER_PATTERN.findall(optional_sql) if p in PLACEHOLDER_SLOTS}
+        prepared["_examples"] = [
+            content_tokens(normalize(PLACEHOLDER_PATTERN.sub(r"<\1>", example)).split())
+            for example in template["examples"]
+        ]
+        prepared["_vocabulary"] = set().union(*prepared["_examples"])
+        prepared["_requires"] = [set(group.split("|")) for group in prepared["requires"]]
+        return prepared
+
+    def register_domain(self, domain: str, templates: List[Dict[str, Any]], slot_sources: Dict[str, Any]) -> None:
+        """Add a domain's built-in templates and gazetteer sources"""
+        for template in templates:
+            self._builtin[template["id"]] = self._prepare(template, domain, "builtin")
+        self.extractor.add_sources(slot_sources)
+
+    def _public(self, template: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in template.items() if not k.startswith("_")}
+
+    def _reload_promoted(self) -> None:
+        """Re-read the promoted templates file when another worker changed it"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._promoted_mtime:
+            return
+
+        promoted = {}
+        if mtime is not None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    for template in json.load(f).get("templates", []):
+                        promoted[template["id"]] = self._prepare(template, template["domain"], "promoted")
+            except Exception as e:
+                print(f"[WARNING] Could not load SQL templates from {self.path}: {e}")
+        self._promoted = promoted
+        self._promoted_mtime = mtime
+
+    def _write_promoted(self) -> None:
+        """Atomically rewrite the promoted templates file"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"templates": [self._public(t) for t in self._promoted.values()]}, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._promoted_mtime = os.path.getmtime(self.path)
+
+    def _templates(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._reload_promoted()
+            return list(self._builtin.values()) + list(self._promoted.values())
+
+    # ------------------------------------------------------------------------
+    # MATCHING
+    # ------------------------------------------------------------------------
+
+    def _fits(self, template: Dict[str, Any], extracted: Dict[str, Any], slot_types: Set[str], words: Set[str]) -> bool:
+        """Whether every part of the question is accounted for by the template"""
+        if (extracted["status"] or "any") not in template["status"]:
+            return False
+        if template["count"] is not None and template["count"] != extracted["count"]:
+            return False
+        if not template["_required"] <= slot_types <= template["_required"] | template["_optional"]:
+            return False
+        if any(not group & words for group in template["_requires"]):
+            return False
+        return words <= template["_vocabulary"]
+
+    def _render(self, template: Dict[str, Any], extracted: Dict[str, Any]) -> Optional[str]:
+        """Bind the question's literals into the template SQL; None if a placeholder stays unbound"""
+        bindings = slot_bindings(extracted["slots"])
+
+        def optional_block(match):
+            block = match.group(1)
+            return block if all(p in bindings for p in PLACEHOLDER_PATTERN.findall(block)) else ""
+
+        sql = OPTIONAL_BLOCK_PATTERN.sub(optional_block, template["sql"])
+        bindings["status"] = template["status"][extracted["status"] or "any"]
+        if any(p not in bindings for p in PLACEHOLDER_PATTERN.findall(sql)):
+            return None
+        return PLACEHOLDER_PATTERN.sub(lambda m: bindings[m.group(1)], sql)
+
+    def match(self, question: str, today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        """
+        Best template for a question, with its SQL already bound and security-checked.
+
+        Returns:
+            {"template_id", "domain", "sql", "similarity", "slots", "masked"} or None
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            extracted = self.extractor.extract(question, today=today)
+        except Exception as e:
+            print(f"[WARNING] Slot extraction failed: {e}")
+            return None
+
+        slots = extracted["slots"]
+        result = None
+        # Opaque quoted text, conflicting statuses or repeated slots need the LLM
+        if "text" not in slots and "status" not in slots and all(len(v) == 1 for v in slots.values()):
+            slot_types = set(slots)
+            words = content_tokens(extracted["tokens"])
+            best = None
+            for template in self._templates():
+                if not self._fits(template, extracted, slot_types, words):
+                    continue
+                similarity = max(
+                    (len(words & example) / len(words | example) if words | example else 1.0)
+                    for example in template["_examples"]
+                )
+                if similarity >= self.threshold and (best is None or similarity > best[0]):
+                    best = (similarity, template)
+
+            if best:
+                similarity, template = best
+                sql = self._render(template, extracted)
+                is_safe, error, sanitized = validate_sql_security(sql) if sql else (False, "unbound placeholder", "")
+                if is_safe:
+                    result = {
+                        "template_id": template["id"],
+                        "domain": template["domain"],
+                        "sql": sanitized,
+                        "similarity": round(similarity, 4),
+                        "slots": slots,
+                        "masked": extracted["masked"]
+                    }
+                else:
+                    print(f"[WARNING] Template {template['id']} rejected: {error}")
+
+        if result:
+            self.store.incr(self.MATCHES_KEY)
+            self.store.incr(f"templates:hits:{result['template_id']}")
+            print(f"🧩 TEMPLATE MATCH: {result['template_id']} ({result['similarity']:.0%}) for '{extracted['masked']}'")
+        else:
+            self.store.incr(self.MISSES_KEY)
+        return result
+
+    def report_failure(self, template_id: str) -> None:
+        """Count a template whose SQL failed to execute"""
+        self.store.incr(f"templates:failures:{template_id}")
+
+    # ------------------------------------------------------------------------
+    # HARVESTING
+    # ------------------------------------------------------------------------
+
+    def harvest(self, question: str, sql: str, db_name: str) -> Optional[str]:
+        """
+        Record generated SQL (successful, non-empty) as a template candidate.
+        Returns the candidate id, or None when the SQL can't be parameterised.
+        """
+        if not self.enabled or not sql or "{" in sql or "[[" in sql:
+            return None
+
+        try:
+            extracted = self.extractor.extract(question)
+        except Exception as e:
+            print(f"[WARNING] Slot extraction failed: {e}")
+            return None
+
+        # Literal-free questions are the semantic cache's job
+        slots = extracted["slots"]
+        if not slots or any(t in slots for t in ("text", "status", "number")) or any(len(v) != 1 for v in slots.values()):
+            return None
+        template_sql = parameterise_sql(sql.strip().rstrip(";"), slots)
+        if not template_sql or unexplained_dates(template_sql, question, {}):
+            return None  # Literal not located, or "now" baked into the SQL
+
+        template_id = "h_" + hashlib.md5(f"{db_name}:{extracted['status']}:{template_sql}".encode()).hexdigest()[:12]
+        if template_id in self._builtin or template_id in self._promoted:
+            return template_id
+
+        example = re.sub(r"<(\w+)>", r"{\1}", extracted["masked"])
+        question_hash = hashlib.md5(normalize(question).encode()).hexdigest()
+        key = f"templates:candidate:{template_id}"
+        candidate = self.store.get(key) or {
+            "template": {
+                "id": template_id,
+                "description": f"Harvested from: {question[:80]}",
+                "examples": [],
+                "sql": template_sql,
+                "status": {extracted["status"] or "any": ""},
+                "count": extracted["count"],
+                "domain": db_name
+            },
+            "questions": []
+        }
+        if example not in candidate["template"]["examples"] and len(candidate["template"]["examples"]) < MAX_EXAMPLES:
+            candidate["template"]["examples"].append(example)
+        if question_hash not in candidate["questions"]:
+            candidate["questions"].append(question_hash)
+        self.store.set(key, candidate, ttl=CANDIDATE_TTL_SECONDS)
+
+        index = self.store.get(self.CANDIDATES_KEY) or []
+        if template_id not in index:
+            self.store.set(self.CANDIDATES_KEY, (index + [template_id])[-MAX_CANDIDATES:])
+
+        print(f"🌾 Template candidate {template_id}: {len(candidate['questions'])} question(s) for '{example}'")
+        if self.min_questions and len(candidate["questions"]) >= self.min_questions:
+            self.promote(template_id)
+        return template_id
+
+    def promote(self, template_id: str) -> bool:
+        """Move a harvested candidate into the promoted templates file"""
+        key = f"templates:candidate:{template_id}"
+        candidate = self.store.get(key)
+        if not candidate:
+            return False
+
+        template = candidate["template"]
+        with self._lock:
+            self._reload_promoted()
+            self._promoted[template_id] = self._prepare(template, template["domain"], "promoted")
+            self._write_promoted()
+
+        self.store.delete(key)
+        index = self.store.get(self.CANDIDATES_KEY) or []
+        self.store.set(self.CANDIDATES_KEY, [i for i in index if i != template_id])
+        print(f"✅ Template {template_id} promoted ({len(candidate['questions'])} questions)")
+        return True
+
+    def delete(self, template_id: str) -> bool:
+        """Remove a promoted template or a candidate (built-ins are code)"""
+        with self._lock:
+            self._reload_promoted()
+            if template_id in self._promoted:
+                del self._promoted[template_id]
+                self._write_promoted()
+                return True
+
+        key = f"templates:candidate:{template_id}"
+        if self.store.get(key) is None:
+            return False
+        self.store.delete(key)
+        index = self.store.get(self.CANDIDATES_KEY) or []
+        self.store.set(self.CANDIDATES_KEY, [i for i in index if i != template_id])
+        return True
+
+    # ------------------------------------------------------------------------
+    # STATS
+    # ------------------------------------------------------------------------
+
+    def list_templates(self) -> Dict[str, Any]:
+        templates = []
+        for template in self._templates():
+            templates.append({
+                **{k: template[k] for k in ("id", "domain", "source", "description", "examples")},
+                "hits": self.store.get_counter(f"templates:hits:{template['id']}"),
+                "failures": self.store.get_counter(f"templates:failures:{template['id']}")
+            })
+
+        candidates = []
+        for template_id in self.store.get(self.CANDIDATES_KEY) or []:
+            candidate = self.store.get(f"templates:candidate:{template_id}")
+            if candidate:
+                candidates.append({
+                    "id": template_id,
+                    "domain": candidate["template"]["domain"],
+                    "examples": candidate["template"]["examples"],
+                    "sql": candidate["template"]["sql"],
+                    "questions": len(candidate["questions"])
+                })
+        return {"templates": templates, "candidates": candidates}
+
+    def get_stats(self) -> Dict[str, Any]:
+        matches = self.store.get_counter(self.MATCHES_KEY)
+        misses = self.store.get_counter(self.MISSES_KEY)
+        total = matches + misses
+        return {
+            "enabled": self.enabled,
+            "templates": len(self._templates()),
+            "candidates": len(self.store.get(self.CANDIDATES_KEY) or []),
+            "matches": matches,
+            "misses": misses,
+            "match_rate": matches / total if total > 0 else 0.0,
+            "threshold": self.threshold,
+            **self.extractor.get_stats()
+        }
+
+
+def _create_template_store() -> TemplateStore:
+    from app.domains.hr_operations import templates as hr_templates
+    from app.domains.sales_crm import templates as sales_templates
+    from app.domains.maintenance import templates as maintenance_templates
+
+    store = TemplateStore()
+    for module in (hr_templates, sales_templates, maintenance_templates):
+        store.register_domain(module.DOMAIN, module.SQL_TEMPLATES, module.SLOT_SOURCES)
+    return store
+
+
+# Global instance
+template_store = _create_template_store()
@@ -0,0 +1,303 @@
+"""
+Request Tracing
+===============
+Lightweight per-request span recording for the chat pipeline.
+
+Each /chat/stream request gets a trace keyed by its request id. Stages
+(route, cache lookup, LangGraph nodes, SQL execution, answer streaming,
+technical note) are recorded as nested spans with attributes such as LLM
+token counts and DB rows. Finished traces are kept in a bounded in-memory
+buffer and appended to TRACE_EXPORT_PATH as OpenTelemetry (OTLP/JSON)
+lines, readable by an OTel Collector `otlpjsonfile` receiver.
+
+Once the export file reaches TRACE_EXPORT_MAX_BYTES it is renamed to
+`<path>.1` (replacing the previous one) and a new file is started, so the
+export takes at most twice that on disk and a lookup of a trace from another
+worker scans at most that much.
+"""
+
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+
+class Span:
+    """A single timed stage within a trace"""
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"] = None, attributes: Dict[str, Any] = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else ""
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_to_attribute(self, key: str, amount: float) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+
+class Trace:
+    """All spans recorded for one request"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+
+# Span active in the current task/thread (copied into asyncio tasks and LangGraph workers)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class _SpanContext:
+    """Context manager that opens a span under the current one (no-op outside a trace)"""
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any], trace: Trace = None):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace = trace
+        self.span: Optional[Span] = None
+        self.parent: Optional[Span] = None
+
+    def __enter__(self) -> Optional[Span]:
+        self.parent = _current_span.get()
+        trace = self.trace or (self.parent.trace if self.parent else None)
+        if trace is None or not self.tracer.recording:
+            return None
+
+        self.span = Span(trace, self.name, self.parent if self.parent and self.parent.trace is trace else None, self.attributes)
+        trace.add(self.span)
+        _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is None:
+            return False
+        if exc is not None and exc_type is not GeneratorExit:
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        self.span.end()
+        self.tracer._notify(self.span)
+        # Restore explicitly (a token reset fails if an async generator is closed from another context)
+        _current_span.set(self.parent)
+        return False
+
+
+class Tracer:
+    """Records spans per request id and exports finished traces"""
+
+    def __init__(
+        self,
+        enabled: bool = settings.TRACING_ENABLED,
+        export_path: str = settings.TRACE_EXPORT_PATH,
+        max_traces: int = settings.TRACE_BUFFER_SIZE,
+        export_max_bytes: int = settings.TRACE_EXPORT_MAX_BYTES
+    ):
+        self.enabled = enabled
+        self.export_path = export_path
+        self.export_max_bytes = export_max_bytes
+        self.max_traces = max_traces
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._listeners: List[Callable[[Span], None]] = []
+
+    # ------------------------------------------------------------------------
+    # RECORDING
+    # ------------------------------------------------------------------------
+
+    @property
+    def recording(self) -> bool:
+        """Spans are recorded when tracing is on or a listener (e.g. metrics) needs them"""
+        return self.enabled or bool(self._listeners)
+
+    def add_listener(self, listener: Callable[[Span], None]) -> None:
+        """Call listener(span) whenever a span ends"""
+        self._listeners.append(listener)
+
+    def _notify(self, span: Span) -> None:
+        for listener in self._listeners:
+            try:
+                listener(span)
+            except Exception as e:
+                print(f"[TRACE ERROR] Span listener failed: {e}")
+
+    def start_trace(self, request_id: str, name: str = "chat.request", **attributes) -> _SpanContext:
+        """Open the root span of a new trace for request_id"""
+        trace = Trace(request_id)
+        if self.enabled:
+            with self._lock:
+                self._traces[request_id] = trace
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+        attributes.setdefault("request.id", request_id)
+        return _SpanContext(self, name, attributes, trace=trace)
+
+    def span(self, name: str, **attributes) -> _SpanContext:
+        """Open a child span of the current span"""
+        return _SpanContext(self, name, attributes)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set an attribute on the current span (if any)"""
+        span = _current_span.get()
+        if span is not None:
+            span.set_attribute(key, value)
+
+    def record_llm_usage(self, message: Any, model: str = None) -> None:
+        """Add token counts from an LLM response/chunk (usage_metadata) to the current span"""
+        span = _current_span.get()
+        usage = getattr(message, "usage_metadata", None)
+        if span is None or not usage:
+            return
+        span.add_to_attribute("llm.input_tokens", usage.get("input_tokens", 0))
+        span.add_to_attribute("llm.output_tokens", usage.get("output_tokens", 0))
+        model = model or (getattr(message, "response_metadata", None) or {}).get("model_name")
+        if model:
+            span.set_attribute("llm.model", model)
+
+    # ------------------------------------------------------------------------
+    # EXPORT (OTLP/JSON)
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def _otlp_value(value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def to_otlp(self, trace: Trace) -> Dict[str, Any]:
+        """Serialize a trace as an OTLP ExportTraceServiceRequest (JSON encoding)"""
+        with trace.lock:
+            spans = list(trace.spans)
+
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": trace.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id,
+                "name": span.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or time.time_ns()),
+                "attributes": [
+                    {"key": key, "value": self._otlp_value(value)}
+                    for key, value in span.attributes.items()
+                ],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+            }
+            otlp_spans.append(otlp_span)
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": settings.APP_NAME}},
+                    {"key": "process.pid", "value": {"intValue": str(os.getpid())}}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.services.tracing"},
+                    "spans": otlp_spans
+                }]
+            }]
+        }
+
+    def finish_trace(self, request_id: str) -> None:
+        """Append the finished trace to the export file (one OTLP/JSON document per line)"""
+        trace = self._traces.get(request_id)
+        if trace is None or not self.export_path:
+            return
+
+        try:
+            line = json.dumps(self.to_otlp(trace), default=str)
+            directory = os.path.dirname(self.export_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._export_lock:
+                self._rotate()
+                with open(self.export_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except Exception as e:
+            print(f"[TRACE ERROR] Export failed: {e}")
+
+    def _rotate(self) -> None:
+        """Move a full export file to <path>.1 (0 = never rotate)"""
+        if self.export_max_bytes <= 0:
+            return
+        try:
+            if os.path.getsize(self.export_path) < self.export_max_bytes:
+                return
+        except OSError:
+            return  # Not created yet
+        os.replace(self.export_path, f"{self.export_path}.1")
+        print(f"🔄 Trace export rotated to {self.export_path}.1")
+
+    def get_trace(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """OTLP/JSON for a request: from memory, else from the export file (other workers)"""
+        trace = self._traces.get(request_id)
+        if trace is not None:
+            return self.to_otlp(trace)
+
+        if not self.export_path:
+            return None
+
+        # Newest file first; each is at most export_max_bytes (blocking: call off the loop)
+        needle = f'"stringValue": "{request_id}"'
+        for path in (self.export_path, f"{self.export_path}.1"):
+            match = None
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if needle in line:
+                            match = line
+            except FileNotFoundError:
+                continue
+            if match:
+                return json.loads(match)
+        return None
+
+
+def traced_node(name: str, func):
+    """Wrap a LangGraph node so each execution is recorded as a span"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracer.span(name, **{"graph.node": name}):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# Global instance
+tracer = Tracer()
@@ -0,0 +1,617 @@
+"""
+Vector Store - Pluggable Backends for the Query Cache
+=====================================================
+The query cache needs a small vector index: a few thousand question
+embeddings with flat metadata, filtered by domain and shape and searched for
+the nearest neighbour. Both backends return the same squared-L2 distance on
+unit vectors (Chroma's default), so `1 / (1 + distance)` and the similarity
+thresholds mean the same thing whichever backend is configured.
+
+Backends (CACHE_VECTOR_BACKEND):
+- chroma: a Chroma collection, local (CHROMA_PERSIST_DIR) or on a shared
+          server (CHROMA_HOST). Default.
+- numpy:  in-process matrices under VECTOR_STORE_PATH, one per domain
+          partition, searched with a matrix-vector product. Rows are
+          float32, or int8 with a per-row scale (VECTOR_STORE_INT8, 4x
+          smaller, slightly slower to scan). No Chroma import, client or
+          SQLite.
+
+NumPy on-disk format (one directory per store):
+- manifest.json:            dimension, row format, generation, store metadata
+- <partition>.<gen>.f32|i8: append-only vector rows, memory-mapped for search
+- journal.<gen>.jsonl:      append-only add/update/delete records (documents,
+                            metadata and the row of each vector)
+
+Writers append under an exclusive file lock; every process tails the journal
+and re-maps grown vector files before each operation, so uvicorn workers on
+one host share the store. Once dead rows and superseded records outweigh the
+live ones, the store is rewritten into a new generation.
+"""
+
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only
+    fcntl = None
+
+# (id, document, metadata, distance)
+QueryRow = Tuple[str, str, Dict[str, Any], float]
+
+
+class VectorStore:
+    """Interface the query cache uses. Metadata values are str/int/float/bool."""
+
+    backend = "none"
+    name = ""
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def get(self, ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Metadata of the given entries (all entries when ids is None); missing ids are left out"""
+        raise NotImplementedError
+
+    def query(self, embedding: Any, n_results: int, where: Optional[Dict[str, Any]] = None) -> List[QueryRow]:
+        """Nearest entries matching a Chroma-style where filter, closest first"""
+        raise NotImplementedError
+
+    def add(self, ids: List[str], documents: List[str], embeddings: List[Any], metadatas: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def update(
+        self,
+        ids: List[str],
+        metadatas: List[Dict[str, Any]],
+        documents: Optional[List[str]] = None,
+        embeddings: Optional[List[Any]] = None
+    ) -> None:
+        """Merge metadata into existing entries, optionally replacing document and vector"""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]) -> None:
+        raise NotImplementedError
+
+    def get_metadata(self) -> Dict[str, Any]:
+        """Store-level metadata, read fresh (other workers write it too)"""
+        raise NotImplementedError
+
+    def set_metadata(self, metadata: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Drop every entry, keeping the store metadata"""
+        raise NotImplementedError
+
+
+# ============================================================================
+# CHROMA
+# ============================================================================
+
+class ChromaVectorStore(VectorStore):
+    """A Chroma collection; embeddings are always passed in by the caller"""
+
+    backend = "chroma"
+
+    # Ids per delete call
+    DELETE_CHUNK = 500
+
+    def __init__(self, client: Any, name: str, metadata: Optional[Dict[str, Any]] = None):
+        self.client = client
+        self.name = name
+        self.collection = client.get_or_create_collection(name=name, metadata=metadata)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def get(self, ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        result = self.collection.get(ids=ids, include=["metadatas"])
+        return dict(zip(result["ids"], result["metadatas"]))
+
+    def query(self, embedding: Any, n_results: int, where: Optional[Dict[str, Any]] = None) -> List[QueryRow]:
+        result = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+            where=where
+        )
+        if not result or not result["ids"] or not result["ids"][0]:
+            return []
+        return list(zip(result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]))
+
+    def add(self, ids, documents, embeddings, metadatas) -> None:
+        self.collection.add(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+    def update(self, ids, metadatas, documents=None, embeddings=None) -> None:
+        self.collection.update(ids=ids, metadatas=metadatas, documents=documents, embeddings=embeddings)
+
+    def delete(self, ids: List[str]) -> None:
+        for start in range(0, len(ids), self.DELETE_CHUNK):
+            self.collection.delete(ids=ids[start:start + self.DELETE_CHUNK])
+
+    def get_metadata(self) -> Dict[str, Any]:
+        return dict(self.client.get_collection(self.name).metadata or {})
+
+    def set_metadata(self, metadata: Dict[str, Any]) -> None:
+        self.collection.modify(metadata=metadata)
+
+    def clear(self) -> None:
+        metadata = self.get_metadata() or None
+        self.client.delete_collection(self.name)
+        self.collection = self.client.get_or_create_collection(name=self.name, metadata=metadata)
+
+
+# ============================================================================
+# NUMPY
+# ============================================================================
+
+def matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Chroma's where syntax the cache uses: equality, $eq, $ne, $in, $and, $or"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator not in ("$eq", "$ne", "$in"):
+                    raise ValueError(f"Unsupported where operator: {operator}")
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class _Partition:
+    """One partition's rows: memory-mapped vectors plus per-row id/document/metadata"""
+
+    def __init__(self, path: str, dtype: np.dtype):
+        self.path = path
+        self.dtype = dtype
+        self.matrix: Optional[np.memmap] = None
+        self.ids: List[Optional[str]] = []          # None = dead row
+        self.documents: List[Optional[str]] = []
+        self.metadatas: List[Optional[Dict[str, Any]]] = []
+        self.alive = np.zeros(0, dtype=bool)
+
+    @property
+    def rows(self) -> int:
+        return len(self.ids)
+
+    def set_row(self, row: int, entry_id: str, document: str, metadata: Dict[str, Any]) -> None:
+        missing = row + 1 - len(self.ids)
+        if missing > 0:
+            self.ids.extend([None] * missing)
+            self.documents.extend([None] * missing)
+            self.metadatas.extend([None] * missing)
+        if row >= len(self.alive):
+            # Grown by doubling; replaced, never resized in place, so readers keep a consistent copy
+            self.alive = np.concatenate([self.alive, np.zeros(max(row + 1, 2 * len(self.alive)) - len(self.alive), dtype=bool)])
+        self.ids[row], self.documents[row], self.metadatas[row] = entry_id, document, metadata
+        self.alive[row] = True
+
+    def kill(self, row: int) -> None:
+        self.ids[row] = self.documents[row] = self.metadatas[row] = None
+        self.alive[row] = False
+
+    def remap(self) -> None:
+        """Map the vector file again if rows were appended since the last mapping"""
+        mapped = 0 if self.matrix is None else self.matrix.shape[0]
+        if self.rows <= mapped:
+            return
+        available = os.path.getsize(self.path) // self.dtype.itemsize if os.path.exists(self.path) else 0
+        if available > mapped:
+            self.matrix = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(available,))
+
+    def scores(self, query: np.ndarray, chunk_rows: int = 8192) -> np.ndarray:
+        """Cosine similarity of every row to a unit query vector (-inf for dead rows)"""
+        total, matrix, alive = self.rows, self.matrix, self.alive  # Writers may append meanwhile
+        rows = min(total, 0 if matrix is None else matrix.shape[0], len(alive))
+        scores = np.full(total, -np.inf, dtype=np.float32)
+        if rows == 0:
+            return scores
+        if self.dtype.names:
+            # int8 rows: dequantise a block at a time so the scan never holds a float copy
+            for start in range(0, rows, chunk_rows):
+                block = matrix[start:min(start + chunk_rows, rows)]
+                scores[start:start + len(block)] = (block["v"].astype(np.float32) @ query) * block["scale"]
+        else:
+            scores[:rows] = matrix[:rows] @ query
+        scores[:rows][~alive[:rows]] = -np.inf
+        return scores
+
+
+class NumpyVectorStore(VectorStore):
+    """Per-partition embedding matrices in append-only, memory-mapped files"""
+
+    backend = "numpy"
+
+    # Rewrite into a new generation once the journal holds this many records per live entry
+    REWRITE_RATIO = 3
+    REWRITE_MIN_RECORDS = 1000
+
+    def __init__(self, path: str, name: str, quantize: bool = False, partition_key: str = "database"):
+        self.name = name
+        self.root = os.path.join(path, name)
+        self.partition_key = partition_key
+        os.makedirs(self.root, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._lock_path = os.path.join(self.root, "store.lock")
+        self._manifest_path = os.path.join(self.root, "manifest.json")
+        self._manifest_mtime = None
+        self._quantize = quantize
+
+        if not os.path.exists(self._manifest_path):
+            with self._file_lock():
+                if not os.path.exists(self._manifest_path):
+                    self._write_manifest({"generation": 1, "dimension": None, "int8": quantize, "metadata": {}})
+        self._load()
+        if self.manifest["int8"] != quantize:
+            print(f"⚠️ Vector store '{name}' is {'int8' if self.manifest['int8'] else 'float32'}; "
+                  f"the configured format applies from its next rewrite")
+
+    # ------------------------------------------------------------------------
+    # FILES
+    # ------------------------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock across threads and processes for appends and rewrites (not re-entrant)"""
+        with self._lock, open(self._lock_path, "a+") as handle:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        with open(self._manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        temp_path = f"{self._manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self._manifest_path)
+
+    def _journal_path(self, generation: int) -> str:
+        return os.path.join(self.root, f"journal.{generation}.jsonl")
+
+    def _partition_path(self, partition: str, generation: int, int8: bool) -> str:
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", partition) or "_"
+        return os.path.join(self.root, f"{safe}.{generation}.{'i8' if int8 else 'f32'}")
+
+    def _row_dtype(self, int8: bool, dimension: int) -> np.dtype:
+        if int8:
+            return np.dtype([("scale", "<f4"), ("v", "i1", (dimension,))])
+        return np.dtype(("<f4", (dimension,)))
+
+    def _encode(self, vectors: np.ndarray, int8: bool) -> bytes:
+        if not int8:
+            return vectors.astype("<f4").tobytes()
+        scale = np.abs(vectors).max(axis=1) / 127
+        scale[scale == 0] = 1.0
+        rows = np.empty(len(vectors), dtype=self._row_dtype(True, vectors.shape[1]))
+        rows["scale"] = scale
+        rows["v"] = np.round(vectors / scale[:, None]).astype(np.int8)
+        return rows.tobytes()
+
+    # ------------------------------------------------------------------------
+    # LOAD & REFRESH
+    # ------------------------------------------------------------------------
+
+    def _load(self) -> None:
+        """(Re)build in-memory state from the current generation"""
+        with self._lock:
+            self._manifest_mtime = os.stat(self._manifest_path).st_mtime_ns
+            self.manifest = self._read_manifest()
+            self._partitions: Dict[str, _Partition] = {}
+            self._where: Dict[str, Tuple[str, int]] = {}  # id -> (partition, row)
+            self._journal_offset = 0
+            self._journal_records = 0
+            self._replay()
+
+    def _partition(self, partition: str) -> _Partition:
+        if partition not in self._partitions:
+            int8, dimension = self.manifest["int8"], self.manifest["dimension"]
+            self._partitions[partition] = _Partition(
+                self._partition_path(partition, self.manifest["generation"], int8),
+                self._row_dtype(int8, dimension)
+            )
+        return self._partitions[partition]
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        entry_id = record["id"]
+        previous = self._where.get(entry_id)
+        if record["op"] == "add":
+            if previous:
+                self._partitions[previous[0]].kill(previous[1])
+            partition = self._partition(record["p"])
+            partition.set_row(record["row"], entry_id, record["doc"], record["meta"])
+            self._where[entry_id] = (record["p"], record["row"])
+        elif record["op"] == "update" and previous:
+            self._partitions[previous[0]].metadatas[previous[1]].update(record["meta"])
+        elif record["op"] == "delete" and previous:
+            self._partitions[previous[0]].kill(previous[1])
+            del self._where[entry_id]
+
+    def _replay(self) -> None:
+        """Apply journal records appended since the last replay (complete lines only)"""
+        path = self._journal_path(self.manifest["generation"])
+        if not os.path.exists(path) or os.path.getsize(path) <= self._journal_offset:
+            return
+        with open(path, "rb") as f:
+            f.seek(self._journal_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+                self._journal_records += 1
+        self._journal_offset += len(complete)
+        for partition in self._partitions.values():
+            partition.remap()
+
+    def _refresh(self) -> None:
+        """Pick up other processes' writes: a new generation reloads, new records are replayed"""
+        with self._lock:
+            try:
+                mtime = os.stat(self._manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                return
+            journal_gone = self._journal_records and not os.path.exists(self._journal_path(self.manifest["generation"]))
+            if mtime != self._manifest_mtime or journal_gone:
+                manifest = self._read_manifest()
+                if manifest["generation"] != self.manifest["generation"]:
+                    self._load()
+                    return
+                self.manifest, self._manifest_mtime = manifest, mtime
+            self._replay()
+
+    # ------------------------------------------------------------------------
+    # WRITES
+    # ------------------------------------------------------------------------
+
+    def _append(self, records: List[Dict[str, Any]], vectors: Optional[np.ndarray] = None) -> None:
+        """Append vectors (for "add" records, in order) and journal records; caller holds the file lock"""
+        self._refresh()
+        if vectors is not None and len(vectors):
+            if self.manifest["dimension"] is None:
+                self.manifest["dimension"] = int(vectors.shape[1])
+                self._write_manifest(self.manifest)
+                self._manifest_mtime = os.stat(self._manifest_path).st_mtime_ns
+            elif vectors.shape[1] != self.manifest["dimension"]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} != store dimension {self.manifest['dimension']}")
+
+            # Rows are assigned from the current file sizes while holding the lock
+            adds = [record for record in records if record["op"] == "add"]
+            by_partition: Dict[str, List[int]] = {}
+            for index, record in enumerate(adds):
+                by_partition.setdefault(record["p"], []).append(index)
+            for partition_name, indexes in by_partition.items():
+                partition = self._partition(partition_name)
+                size = os.path.getsize(partition.path) if os.path.exists(partition.path) else 0
+                first_row = size // partition.dtype.itemsize
+                for offset, index in enumerate(indexes):
+                    adds[index]["row"] = first_row + offset
+                with open(partition.path, "ab") as f:
+                    f.write(self._encode(vectors[indexes], self.manifest["int8"]))
+
+        with open(self._journal_path(self.manifest["generation"]), "ab") as f:
+            f.write(b"".join(json.dumps(record, separators=(",", ":")).encode() + b"\n" for record in records))
+        self._replay()
+        if self._journal_records > max(self.REWRITE_MIN_RECORDS, self.REWRITE_RATIO * len(self._where)):
+            self._rewrite()
+
+    @staticmethod
+    def _unit(embeddings: List[Any]) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add(self, ids, documents, embeddings, metadatas) -> None:
+        records = [
+            {"op": "add", "id": entry_id, "p": str(metadata.get(self.partition_key, "")), "doc": document, "meta": metadata}
+            for entry_id, document, metadata in zip(ids, documents, metadatas)
+        ]
+        with self._file_lock():
+            self._append(records, self._unit(embeddings))
+
+    def update(self, ids, metadatas, documents=None, embeddings=None) -> None:
+        with self._file_lock():
+            self._refresh()
+            if embeddings is None:
+                records = [{"op": "update", "id": i, "meta": m} for i, m in zip(ids, metadatas) if i in self._where]
+                if records:
+                    self._append(records)
+                return
+            # A new vector is a new row; the entry's old row dies on replay
+            records, vectors = [], []
+            for index, entry_id in enumerate(ids):
+                if entry_id not in self._where:
+                    continue
+                partition_name, row = self._where[entry_id]
+                partition = self._partitions[partition_name]
+                metadata = {**partition.metadatas[row], **metadatas[index]}
+                document = documents[index] if documents else partition.documents[row]
+                records.append({"op": "add", "id": entry_id, "p": partition_name, "doc": document, "meta": metadata})
+                vectors.append(embeddings[index])
+            if records:
+                self._append(records, self._unit(vectors))
+
+    def delete(self, ids: List[str]) -> None:
+        with self._file_lock():
+            self._refresh()
+            records = [{"op": "delete", "id": entry_id} for entry_id in ids if entry_id in self._where]
+            if records:
+                self._append(records)
+
+    def _rewrite(self, keep_entries: bool = True) -> None:
+        """Write live entries into a new generation and drop the old files; caller holds the file lock"""
+        old_generation, old_partitions = self.manifest["generation"], self._partitions
+        generation, int8 = old_generation + 1, self._quantize
+        dimension = self.manifest["dimension"]
+
+        journal = []
+        if keep_entries and dimension:
+            for partition_name, partition in old_partitions.items():
+                rows = np.flatnonzero(partition.alive[:partition.rows])
+                if not len(rows):
+                    continue
+                matrix = partition.matrix[rows]
+                vectors = matrix["v"].astype(np.float32) * matrix["scale"][:, None] if partition.dtype.names else np.asarray(matrix)
+                with open(self._partition_path(partition_name, generation, int8), "wb") as f:
+                    f.write(self._encode(vectors, int8))
+                for new_row, row in enumerate(rows):
+                    journal.append({"op": "add", "id": partition.ids[row], "p": partition_name,
+                                    "doc": partition.documents[row], "meta": partition.metadatas[row], "row": new_row})
+        with open(self._journal_path(generation), "wb") as f:
+            f.write(b"".join(json.dumps(record, separators=(",", ":")).encode() + b"\n" for record in journal))
+
+        self._write_manifest({**self.manifest, "generation": generation, "int8": int8})
+        for partition in old_partitions.values():
+            partition.matrix = None
+        for file_name in os.listdir(self.root):
+            if re.search(rf"\.{old_generation}\.(f32|i8|jsonl)$", file_name):
+                os.remove(os.path.join(self.root, file_name))
+        self._load()
+        print(f"🗜️ Vector store '{self.name}' rewritten: {len(self._where)} entries (generation {generation})")
+
+    # ------------------------------------------------------------------------
+    # READS
+    # ------------------------------------------------------------------------
+
+    def count(self) -> int:
+        self._refresh()
+        return len(self._where)
+
+    def get(self, ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        self._refresh()
+        with self._lock:
+            wanted = self._where if ids is None else [entry_id for entry_id in ids if entry_id in self._where]
+            return {
+                entry_id: dict(self._partitions[self._where[entry_id][0]].metadatas[self._where[entry_id][1]])
+                for entry_id in wanted
+            }
+
+    def query(self, embedding: Any, n_results: int, where: Optional[Dict[str, Any]] = None) -> List[QueryRow]:
+        self._refresh()
+        query = self._unit([embedding])[0]
+
+        # Top-level equality on the partition key selects one partition
+        clauses = where.get("$and", [where]) if where else []
+        partition_name = next(
+            (clause[self.partition_key] for clause in clauses
+             if isinstance(clause.get(self.partition_key), (str, int, float))),
+            None
+        )
+        with self._lock:
+            if partition_name is not None:
+                selected = [self._partitions[str(partition_name)]] if str(partition_name) in self._partitions else []
+            else:
+                selected = list(self._partitions.values())
+
+        candidates: List[QueryRow] = []
+        for partition in selected:
+            scores = partition.scores(query)
+            # Best rows first: a partial sort of the top slice, widened only if the filter rejects them
+            width = min(len(scores), max(64, n_results * 16))
+            while width:
+                top = np.argpartition(-scores, width - 1)[:width] if width < len(scores) else np.arange(len(scores))
+                top = top[np.argsort(-scores[top], kind="stable")]
+                found = []
+                for row in top:
+                    if not np.isfinite(scores[row]):
+                        break
+                    metadata = partition.metadatas[row]
+                    if metadata is not None and matches(metadata, where):
+                        found.append((partition.ids[row], partition.documents[row], metadata,
+                                      max(0.0, 2.0 - 2.0 * float(scores[row]))))
+                        if len(found) == n_results:
+                            break
+                if len(found) == n_results or width == len(scores) or not np.isfinite(scores[top[-1]]):
+                    candidates.extend(found)
+                    break
+                width = min(len(scores), width * 8)
+
+        candidates.sort(key=lambda row: row[3])
+        return [(entry_id, document, dict(metadata), distance) for entry_id, document, metadata, distance in candidates[:n_results]]
+
+    # ------------------------------------------------------------------------
+    # STORE METADATA
+    # ------------------------------------------------------------------------
+
+    def get_metadata(self) -> Dict[str, Any]:
+        return dict(self._read_manifest().get("metadata", {}))
+
+    def set_metadata(self, metadata: Dict[str, Any]) -> None:
+        with self._file_lock():
+            manifest = self._read_manifest()
+            manifest["metadata"] = metadata
+            self._write_manifest(manifest)
+
+    def clear(self) -> None:
+        with self._file_lock():
+            self._refresh()
+            self._rewrite(keep_entries=False)
+
+
+# ============================================================================
+# FACTORY
+# ============================================================================
+
+def create_vector_store(
+    name: str,
+    backend: str = None,
+    persist_directory: str = settings.CHROMA_PERSIST_DIR,
+    metadata: Optional[Dict[str, Any]] = None
+) -> Optional[VectorStore]:
+    """Create the configured vector store, or None if it can't be opened"""
+    backend = (backend or settings.CACHE_VECTOR_BACKEND).lower()
+
+    try:
+        if backend == "numpy":
+            store = NumpyVectorStore(settings.VECTOR_STORE_PATH, name, quantize=settings.VECTOR_STORE_INT8)
+            if metadata and not store.get_metadata():
+                store.set_metadata(metadata)
+            print(f"✅ Vector store: NumPy ({'int8' if store.manifest['int8'] else 'float32'}, {settings.VECTOR_STORE_PATH})")
+            return store
+
+        try:
+            import chromadb
+        except ImportError:
+            print("⚠️ ChromaDB not installed. Query caching disabled.")
+            return None
+        if settings.CHROMA_HOST:
+            # Shared server: one collection for every worker and node
+            client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+        else:
+            os.makedirs(persist_directory, exist_ok=True)
+            client = chromadb.PersistentClient(path=persist_directory)
+        return ChromaVectorStore(client, name, metadata)
+    except Exception as e:
+        print(f"❌ Vector store '{backend}' failed: {e}")
+        return None
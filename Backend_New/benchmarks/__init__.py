@@ -0,0 +1,15 @@
+"""
+Benchmarks
+==========
+Offline end-to-end benchmark suite for the chat pipeline.
+
+- schema.py:   table definitions parsed from Database_Schemas/*/schema_report.md
+- seed.py:     creates and fills the domain tables in a local SQLite/PostgreSQL DB
+- datagen.py:  production-scale (10k/1M/10M) referentially consistent data, loaded with COPY
+- mock_llm.py: OpenAI-compatible mock server with scripted SQL and configurable latency
+- run.py:      starts mock + app, replays a question corpus against /chat/stream
+               and writes a JSON report (throughput, p50/p95/p99 per stage, cache hits)
+
+Usage (from Backend_New):
+    python -m benchmarks.run --concurrency 8 --requests 200 --output bench.json
+"""
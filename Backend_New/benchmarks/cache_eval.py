@@ -0,0 +1,365 @@
+"""
+Cache Threshold Evaluation
+==========================
+Measures how the query cache's similarity threshold trades hits for wrong
+answers, per domain, on labelled question pairs (benchmarks/cache_pairs.json):
+a question whose SQL gets cached, a later question probing for it, and whether
+the cached SQL - with the later question's literals bound in - answers it.
+
+The pairs cover paraphrases and swapped names/departments (should hit) and the
+traps (should not): another status ("completed" vs all), period (this vs last
+month), table (checklist vs delegation, leads vs enquiries), column, unknown
+literals, and the HR vs maintenance "pending" questions that meet in the
+speculative per-domain probes.
+
+For every pair the harness runs the cache's own code - prepare_entry() for the
+cached question, _shape()/_bind() for the probe - so the shape filter rejects
+exactly what it rejects in production, then scores the remaining pairs under
+each distance metric and sweeps the threshold:
+
+- inverse_l2: 1 / (1 + squared L2 distance), what the cache compares today
+- cosine: cosine similarity of the two embeddings
+
+On unit-length embeddings (MiniLM's are) squared L2 = 2 - 2 cos, so both
+metrics rank pairs identically; they differ only in the threshold scale
+(inverse_l2 0.92 = cosine 0.957).
+
+Reported per domain: precision / recall / F1 per threshold, the threshold with
+the best recall at --min-precision (as a CACHE_THRESHOLD_BY_DOMAIN line), the
+closest negatives and furthest positives, and lookup latency - embedding and
+filtered vector search - on a cache populated with the pairs.
+
+--embedding lexical swaps MiniLM for a hashed bag-of-words baseline, for
+machines that can't download the model; its thresholds don't transfer.
+
+Usage (from Backend_New):
+    python -m benchmarks.cache_eval --output cache_eval.json
+    python -m benchmarks.cache_eval --min-precision 0.98 --backend numpy
+    python -m benchmarks.cache_eval --embedding lexical
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.run import _git_commit, summarize
+
+PAIRS_PATH = Path(__file__).resolve().with_name("cache_pairs.json")
+DIMENSION = 384
+TOKEN_PATTERN = re.compile(r"<\w+>|[a-z0-9]+")
+
+
+def load_pairs(path: str = None) -> Dict[str, Any]:
+    """{"gazetteer": {slot type: [values]}, "pairs": [{"domain", "cached", "sql", "probe", "same_sql", "kind"}]}"""
+    with open(path or PAIRS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ============================================================================
+# EMBEDDINGS & METRICS
+# ============================================================================
+
+class LexicalEmbedding:
+    """Hashed unigrams + bigrams, L2-normalised: a model-free baseline"""
+
+    def __init__(self, dimension: int = DIMENSION):
+        self.dimension = dimension
+
+    def __call__(self, texts: List[str]) -> List[Any]:
+        import numpy as np
+
+        vectors = []
+        for text in texts:
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            vector = np.zeros(self.dimension, dtype=np.float32)
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                digest = hashlib.md5(feature.encode("utf-8")).digest()
+                vector[int.from_bytes(digest[:4], "little") % self.dimension] += 1.0 if digest[4] & 1 else -1.0
+            norm = np.linalg.norm(vector)
+            vectors.append(vector / norm if norm else vector)
+        return vectors
+
+
+def _inverse_l2(a, b) -> float:
+    return float(1 / (1 + ((a - b) ** 2).sum()))
+
+
+def _cosine(a, b) -> float:
+    import numpy as np
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+METRICS: Dict[str, Callable[[Any, Any], float]] = {"inverse_l2": _inverse_l2, "cosine": _cosine}
+
+
+def _embedding_function(name: str):
+    if name == "lexical":
+        return LexicalEmbedding()
+    from app.services.embedding_service import _default_function
+    function = _default_function()
+    if function is None:
+        sys.exit("❌ Embedding model unavailable - install chromadb/onnxruntime or use --embedding lexical")
+    return function
+
+
+# ============================================================================
+# PAIR SCORING
+# ============================================================================
+
+def score_pairs(cache, embed: Callable[[List[str]], List[Any]], pairs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Run each pair through the cache's shape filter and score the embeddings"""
+    import numpy as np
+
+    scored = []
+    for pair in pairs:
+        result = dict(pair)
+        entry = cache.prepare_entry(pair["cached"], pair["sql"], pair["domain"])
+        if entry is None:
+            result["error"] = "not cacheable"
+            scored.append(result)
+            continue
+
+        probe_shape = cache._shape(pair["probe"])
+        served_sql = cache._bind(entry["metadata"], probe_shape)
+        cached_vector, probe_vector = (np.asarray(v, dtype=np.float32) for v in
+                                       embed([entry["shape"]["document"], probe_shape["document"]]))
+        result.update({
+            "cached_document": entry["shape"]["document"],
+            "probe_document": probe_shape["document"],
+            "parameterised": entry["metadata"]["parameterised"] == "true",
+            "compatible": served_sql is not None,
+            "served_sql": served_sql,
+            "similarity": {name: round(metric(cached_vector, probe_vector), 4) for name, metric in METRICS.items()},
+        })
+        scored.append(result)
+    return scored
+
+
+def _confusion(scored: List[Dict[str, Any]], metric: str, threshold: float,
+               by_domain: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Pairs served at this threshold (or per-domain overrides) vs their labels"""
+    tp = fp = fn = tn = 0
+    for r in scored:
+        served = r["compatible"] and r["similarity"][metric] >= (by_domain or {}).get(r["domain"], threshold)
+        if r["same_sql"]:
+            tp, fn = tp + served, fn + (not served)
+        else:
+            fp, tn = fp + served, tn + (not served)
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"threshold": round(threshold, 3), "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+            "precision": round(precision, 3), "recall": round(recall, 3), "f1": round(f1, 3)}
+
+
+def sweep(scored: List[Dict[str, Any]], metric: str, thresholds: List[float]) -> List[Dict[str, Any]]:
+    return [_confusion(scored, metric, t) for t in thresholds]
+
+
+def recommend(rows: List[Dict[str, Any]], min_precision: float) -> Dict[str, Any]:
+    """Best recall at the required precision; among ties the highest (safest) threshold"""
+    safe = [r for r in rows if r["precision"] >= min_precision]
+    if not safe:
+        return {**rows[-1], "meets_precision": False}
+    best = max(safe, key=lambda r: (r["recall"], r["threshold"]))
+    return {**best, "meets_precision": True}
+
+
+def _by_domain(scored: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for r in scored:
+        groups.setdefault(r["domain"], []).append(r)
+    groups["all"] = scored
+    return groups
+
+
+def _filter_stats(scored: List[Dict[str, Any]]) -> Dict[str, int]:
+    """What the shape filter decides before any threshold is applied"""
+    return {
+        "positives": sum(r["same_sql"] for r in scored),
+        "negatives": sum(not r["same_sql"] for r in scored),
+        "positives_rejected": sum(r["same_sql"] and not r["compatible"] for r in scored),
+        "negatives_rejected": sum(not r["same_sql"] and not r["compatible"] for r in scored),
+    }
+
+
+# ============================================================================
+# LOOKUP LATENCY
+# ============================================================================
+
+def _vector_store(backend: str, path: Path):
+    from app.services.vector_store import ChromaVectorStore, NumpyVectorStore
+    if backend == "chroma":
+        import chromadb
+        return ChromaVectorStore(chromadb.PersistentClient(path=str(path)), "cache_eval")
+    return NumpyVectorStore(str(path), "cache_eval", quantize=backend == "numpy-int8")
+
+
+def measure_latency(function, pairs: List[Dict[str, Any]], backend: str, repeats: int) -> Dict[str, Any]:
+    """
+    Populate a real cache with the pairs' cached questions, then time each
+    probe: slot extraction + embedding (memo off) + filtered vector search.
+    """
+    from app.services.cache_service import QueryCacheService
+    from app.services.embedding_service import EmbeddingService
+    from app.services.slot_extractor import slot_extractor
+
+    workdir = Path(tempfile.mkdtemp(prefix="cache_eval_"))
+    try:
+        embedder = EmbeddingService(function=function, memo_size=0)
+        cache = QueryCacheService(embedder=embedder, vectors=_vector_store(backend, workdir))
+        for key in dict.fromkeys((p["domain"], p["cached"], p["sql"]) for p in pairs):
+            cache.cache_query(key[1], key[2], key[0])
+
+        timings: Dict[str, List[float]] = {"shape": [], "embed": [], "search": [], "total": []}
+        for _ in range(repeats):
+            for pair in pairs:
+                slot_extractor._memo.clear()  # Cold extraction, as for a new question
+                started = time.perf_counter()
+                shape = cache._shape(pair["probe"])
+                shaped = time.perf_counter()
+                embedding = cache._embedding(shape)
+                embedded = time.perf_counter()
+                cache.probe(pair["probe"], pair["domain"], shape=shape, embedding=embedding)
+                searched = time.perf_counter()
+                timings["shape"].append((shaped - started) * 1_000_000)
+                timings["embed"].append((embedded - shaped) * 1_000_000)
+                timings["search"].append((searched - embedded) * 1_000_000)
+                timings["total"].append((searched - started) * 1_000_000)
+        return {"backend": backend, "entries": cache.vectors.count(),
+                **{stage: summarize(values) for stage, values in timings.items()}}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def run_evaluation(args) -> Dict[str, Any]:
+    from app.core.config import settings
+    from app.services.cache_service import QueryCacheService
+    from app.services.embedding_service import EmbeddingService
+    from app.services.slot_extractor import slot_extractor
+
+    data = load_pairs(args.pairs)
+    pairs = [p for p in data["pairs"] if not args.domains or p["domain"] in args.domains]
+    slot_extractor.use_values(data.get("gazetteer", {}))
+
+    function = _embedding_function(args.embedding)
+    embedder = EmbeddingService(function=function)
+    # Scoring never touches the vector store; the cache only lends its shape logic
+    cache = QueryCacheService(embedder=embedder, vectors=_vector_store("numpy", Path(args.scratch)))
+    scored = score_pairs(cache, embedder.embed, pairs)
+    evaluated = [r for r in scored if "error" not in r]
+
+    steps = round((1 - args.min_threshold) / args.step)
+    thresholds = [args.min_threshold + i * args.step for i in range(steps)]
+    current = {domain: cache.threshold_for(domain) for domain in {p["domain"] for p in pairs}}
+
+    domains = _by_domain(evaluated)
+    report: Dict[str, Any] = {"filter": {d: _filter_stats(rows) for d, rows in domains.items()},
+                              "sweep": {}, "recommended": {}, "current": {}}
+    for metric in METRICS:
+        report["sweep"][metric] = {d: sweep(rows, metric, thresholds) for d, rows in domains.items()}
+        report["recommended"][metric] = {d: recommend(rows, args.min_precision)
+                                         for d, rows in report["sweep"][metric].items()}
+    for domain, rows in domains.items():
+        report["current"][domain] = _confusion(rows, "inverse_l2", settings.CACHE_SIMILARITY_THRESHOLD, current)
+
+    if args.latency_repeats:
+        print(f"⏱️ Timing lookups ({args.backend})...")
+        report["latency_us"] = measure_latency(function, pairs, args.backend, args.latency_repeats)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "settings": {"embedding": args.embedding, "pairs": len(pairs), "not_cacheable": len(scored) - len(evaluated),
+                         "min_precision": args.min_precision, "step": args.step, "current_thresholds": current},
+        },
+        **report,
+        "pairs": scored,
+    }
+
+
+def format_report(report: Dict[str, Any], show: int = 5) -> str:
+    lines = [f"{'domain':14} {'pairs +/-':>10} {'filter rejects +/-':>19}   "
+             f"{'configured P / R / F1':>24}   {'inverse_l2 best':>16} {'cosine best':>12}"]
+    for domain, f in report["filter"].items():
+        now = report["current"][domain]
+        best = {m: report["recommended"][m][domain] for m in METRICS}
+        cells = []
+        for metric in METRICS:
+            r = best[metric]
+            mark = "" if r["meets_precision"] else "!"
+            cells.append(f"{r['threshold']:.3f}{mark} R={r['recall']:.2f}")
+        lines.append(
+            f"{domain:14} {f['positives']:>5}/{f['negatives']:<4} {f['positives_rejected']:>12}/{f['negatives_rejected']:<6} "
+            f"{now['precision']:>10.2f} / {now['recall']:.2f} / {now['f1']:.2f}   {cells[0]:>16} {cells[1]:>12}"
+        )
+
+    evaluated = [r for r in report["pairs"] if "error" not in r and r["compatible"]]
+    negatives = sorted((r for r in evaluated if not r["same_sql"]), key=lambda r: -r["similarity"]["inverse_l2"])
+    positives = sorted((r for r in evaluated if r["same_sql"]), key=lambda r: r["similarity"]["inverse_l2"])
+    lines.append("\nClosest negatives past the shape filter (inverse_l2 / cosine):")
+    lines += [f"  {r['similarity']['inverse_l2']:.3f} / {r['similarity']['cosine']:.3f}  [{r['domain']}, {r['kind']}] "
+              f"'{r['cached']}' -> '{r['probe']}'" for r in negatives[:show]]
+    lines.append("Furthest positives:")
+    lines += [f"  {r['similarity']['inverse_l2']:.3f} / {r['similarity']['cosine']:.3f}  [{r['domain']}, {r['kind']}] "
+              f"'{r['cached']}' -> '{r['probe']}'" for r in positives[:show]]
+
+    if "latency_us" in report:
+        latency = report["latency_us"]
+        lines.append(f"\nLookup latency ({latency['backend']}, {latency['entries']} entries), us p50 / p95:")
+        lines += [f"  {stage:7} {latency[stage]['p50']:>10} / {latency[stage]['p95']}" for stage in ["shape", "embed", "search", "total"]]
+
+    domains = [(d, r) for d, r in report["recommended"]["inverse_l2"].items() if d != "all" and r["meets_precision"]]
+    if domains:
+        lines.append("\nCACHE_THRESHOLD_BY_DOMAIN=" + ",".join(f"{d}={r['threshold']:.3f}" for d, r in sorted(domains)))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query-cache threshold evaluation on labelled question pairs")
+    parser.add_argument("--pairs", default=None, help="Labelled pairs JSON (default: benchmarks/cache_pairs.json)")
+    parser.add_argument("--embedding", choices=["default", "lexical"], default="default",
+                        help="default = the cache's MiniLM model; lexical = hashed bag-of-words baseline")
+    parser.add_argument("--domains", default="", help="Comma-separated subset of domains")
+    parser.add_argument("--min-precision", type=float, default=1.0, help="Precision a recommended threshold must keep")
+    parser.add_argument("--min-threshold", type=float, default=0.70)
+    parser.add_argument("--step", type=float, default=0.005)
+    parser.add_argument("--backend", choices=["numpy", "numpy-int8", "chroma"], default="numpy",
+                        help="Vector store for the latency run")
+    parser.add_argument("--latency-repeats", type=int, default=5, help="Timed passes over the probes (0 = skip)")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+    args.domains = [d for d in args.domains.split(",") if d]
+
+    # Offline: in-memory counters, and the module-level cache must not open ./chroma_db
+    args.scratch = tempfile.mkdtemp(prefix="cache_eval_scratch_")
+    os.environ["STATE_BACKEND"] = "memory"
+    os.environ["CACHE_VECTOR_BACKEND"] = "numpy"
+    os.environ["VECTOR_STORE_PATH"] = args.scratch
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    try:
+        report = run_evaluation(args)
+    finally:
+        shutil.rmtree(args.scratch, ignore_errors=True)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+        print(f"✅ Report written to {args.output}")
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+Lexical Benchmark App
+=====================
+main:app with the query cache embedding MiniLM swapped for cache_eval's
+hashed bag-of-words LexicalEmbedding, so benchmarks.run can measure the cache
+on machines that can't download the model (--embedding lexical).
+
+Hit rates are only comparable between runs using the same embedding.
+
+Usage (what benchmarks.run starts):
+    python -m uvicorn benchmarks.lexical_app:app --port 8800
+"""
+
+from app.services.embedding_service import embedding_service
+from benchmarks.cache_eval import LexicalEmbedding
+
+# Before main imports: startup warm-up and every cache lookup use it
+embedding_service.function = LexicalEmbedding()
+
+from main import app  # noqa: E402
@@ -0,0 +1,222 @@
+"""
+Mock LLM Server
+===============
+OpenAI-compatible /v1/chat/completions for offline benchmarks.
+
+Requests are classified by the prompts the app sends (router, reformulation,
+SQL generation, validation, answer, technical note) and answered from the
+benchmark corpus: the router returns the question's domain, generation
+returns its scripted SQL (as a sql_db_query tool call when tools are bound),
+the validator approves. Each call sleeps for a configurable per-kind latency
+and streamed answers emit tokens with a per-token delay, so the app's
+concurrency behaviour can be measured without network or API cost.
+
+Usage:
+    python -m benchmarks.mock_llm --port 8765 --latency route=0.3,generate=1.0,answer=0.4
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.run import load_corpus
+
+# Seconds per request kind (time before the first token for streamed calls)
+DEFAULT_LATENCY = {
+    "route": 0.3,
+    "reformulate": 0.3,
+    "generate": 1.0,
+    "validate": 0.8,
+    "answer": 0.4,
+    "note": 0.5,
+}
+
+ANSWER_TEXT = (
+    "Based on the query results, here is the summary you asked for. "
+    "The figures come directly from the database and cover all matching records."
+)
+
+app = FastAPI(title="Mock LLM")
+config: Dict[str, Any] = {
+    "corpus": [],
+    "latency": dict(DEFAULT_LATENCY),
+    "jitter": 0.1,
+    "token_delay": 0.01,
+    "answer_tokens": 40,
+}
+stats: Dict[str, int] = {}
+
+
+def parse_latency(spec: str) -> Dict[str, float]:
+    """'route=0.3,generate=1.0' -> {...} on top of the defaults"""
+    latency = dict(DEFAULT_LATENCY)
+    for part in filter(None, (spec or "").split(",")):
+        kind, _, value = part.partition("=")
+        if kind.strip() not in latency:
+            raise ValueError(f"Unknown latency kind '{kind}' (expected one of {sorted(latency)})")
+        latency[kind.strip()] = float(value)
+    return latency
+
+
+def _text(message: Dict[str, Any]) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def _match(text: str) -> Optional[Dict[str, Any]]:
+    """Longest corpus question contained in text"""
+    text = text.lower()
+    best = None
+    for entry in config["corpus"]:
+        if entry["question"].lower() in text and (best is None or len(entry["question"]) > len(best["question"])):
+            best = entry
+    return best
+
+
+def classify(body: Dict[str, Any]) -> str:
+    messages = body.get("messages", [])
+    system = " ".join(_text(m) for m in messages if m.get("role") == "system")
+    user = " ".join(_text(m) for m in messages if m.get("role") == "user")
+
+    if "ALLOWED TABLES/SCHEMA" in system:
+        return "route"
+    if "Context Awareness Engine" in system:
+        return "reformulate"
+    if body.get("tools"):
+        return "generate"
+    if "SQL VALIDATOR" in system:
+        return "validate"
+    if user.startswith("You are a SQL Expert"):
+        return "note"
+    if "SQL Result:" in user:
+        return "answer"
+    return "generate"
+
+
+def respond(kind: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """{"content": str} or {"tool_query": str} for a classified request"""
+    messages = body.get("messages", [])
+    user = " ".join(_text(m) for m in messages if m.get("role") == "user")
+    entry = _match(user)
+
+    if kind == "route":
+        domain = entry["domain"] if entry else "checklist"
+        return {"content": json.dumps({"database": domain, "reason": "mock routing", "clarification_question": ""})}
+    if kind == "reformulate":
+        return {"content": user.split("Current Question:")[-1].strip()}
+    if kind == "validate":
+        return {"content": json.dumps({"status": "APPROVED", "confidence": 95, "errors": [], "improvement_steps": []})}
+    if kind == "note":
+        return {"content": "(Note: Mock technical note describing the tables and columns used.)"}
+    if kind == "answer":
+        words = ANSWER_TEXT.split(" ")
+        return {"content": " ".join(words[i % len(words)] for i in range(config["answer_tokens"]))}
+
+    sql = entry["sql"] if entry else "SELECT COUNT(*) AS total FROM checklist"
+    return {"tool_query": sql} if body.get("tools") else {"content": sql}
+
+
+async def _sleep(kind: str) -> None:
+    base = config["latency"].get(kind, 0.0)
+    jitter = config["jitter"]
+    await asyncio.sleep(max(0.0, base * random.uniform(1 - jitter, 1 + jitter)))
+
+
+def _usage(body: Dict[str, Any], completion: str) -> Dict[str, int]:
+    prompt_tokens = sum(len(_text(m)) for m in body.get("messages", [])) // 4
+    completion_tokens = max(1, len(completion) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _chunk(cid: str, model: str, delta: Dict[str, Any], finish_reason: str = None, usage: Dict[str, int] = None) -> str:
+    payload = {
+        "id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    if usage:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    kind = classify(body)
+    stats[kind] = stats.get(kind, 0) + 1
+    result = respond(kind, body)
+    model = body.get("model", "mock")
+    cid = f"chatcmpl-{uuid.uuid4().hex}"
+
+    if "tool_query" in result:
+        arguments = json.dumps({"query": result["tool_query"]})
+        tool_call = {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": {"name": "sql_db_query", "arguments": arguments}}
+        message = {"role": "assistant", "content": None, "tool_calls": [tool_call]}
+        finish_reason, completion = "tool_calls", arguments
+    else:
+        message = {"role": "assistant", "content": result["content"]}
+        finish_reason, completion = "stop", result["content"]
+    usage = _usage(body, completion)
+
+    await _sleep(kind)
+
+    if not body.get("stream"):
+        return JSONResponse({
+            "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage
+        })
+
+    async def stream():
+        if "tool_query" in result:
+            yield _chunk(cid, model, {"role": "assistant", "tool_calls": [dict(message["tool_calls"][0], index=0)]})
+        else:
+            for i, word in enumerate(result["content"].split(" ")):
+                yield _chunk(cid, model, {"content": word if i == 0 else f" {word}"})
+                await asyncio.sleep(config["token_delay"])
+        yield _chunk(cid, model, {}, finish_reason)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield f"data: {json.dumps({'id': cid, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def get_stats():
+    """Requests served per kind"""
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--corpus", default=None, help="Question corpus JSON (default: benchmarks/corpus.json)")
+    parser.add_argument("--latency", default="", help="Per-kind seconds, e.g. route=0.3,generate=1.0")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Relative latency jitter (0.1 = ±10%%)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed tokens")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    args = parser.parse_args()
+
+    config.update({
+        "corpus": load_corpus(args.corpus),
+        "latency": parse_latency(args.latency),
+        "jitter": args.jitter,
+        "token_delay": args.token_delay,
+        "answer_tokens": args.answer_tokens,
+    })
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Benchmark Runner
+================
+Starts the mock LLM and the FastAPI app against a freshly seeded database,
+replays the question corpus against /chat/stream at a fixed concurrency and
+writes a JSON report:
+
+- throughput (requests/s) and error count
+- client-side latency: time to first event, time to first answer token, total
+- server-side p50/p95/p99 per pipeline stage (from /debug/traces/{X-Request-ID})
+- cache hit rate and LLM calls per request kind
+
+The mock LLM and the app listen on free ports unless --mock-port/--app-port
+are given. The query cache embeds with MiniLM, which Chroma downloads on first
+use: the runner loads it before starting and stops if it can't. Offline, use
+--embedding lexical (benchmarks/lexical_app.py); its hit rates are only
+comparable to other lexical runs.
+
+Usage (from Backend_New):
+    python -m benchmarks.run --concurrency 8 --requests 200 --output bench.json
+    python -m benchmarks.run --output new.json --compare bench.json
+    python -m benchmarks.run --embedding lexical
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+CORPUS_PATH = Path(__file__).resolve().with_name("corpus.json")
+
+# uvicorn app per --embedding
+APPS = {"default": "main:app", "lexical": "benchmarks.lexical_app:app"}
+
+# Identity accepted by require_admin
+BENCH_USER = {"id": 835, "user_name": "AAKASH AGRAWAL", "email_id": "benchmark@local", "role": "admin"}
+
+
+def load_corpus(path: str = None) -> List[Dict[str, Any]]:
+    """Question corpus: [{"question", "domain", "sql"}, ...]"""
+    with open(path or CORPUS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ============================================================================
+# STATISTICS
+# ============================================================================
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 1),
+        "p50": round(_percentile(values, 50), 1),
+        "p95": round(_percentile(values, 95), 1),
+        "p99": round(_percentile(values, 99), 1),
+        "max": round(values[-1], 1),
+    }
+
+
+# ============================================================================
+# PROCESSES
+# ============================================================================
+
+def _free_port() -> int:
+    """A port nothing listens on right now (the OS picks it)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _check_embedding_model() -> None:
+    """Load MiniLM here (downloading it if needed) so an offline run fails now, not as 0% cache hits"""
+    from app.services.embedding_service import _default_function
+
+    function = _default_function()
+    try:
+        if function is None:
+            raise RuntimeError("chromadb/onnxruntime not installed")
+        function(["warm up"])
+    except Exception as e:
+        sys.exit(f"❌ Embedding model unavailable ({e}) - run online once to download it, or use --embedding lexical")
+
+
+def _start(args: List[str], env: Dict[str, str], log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w", encoding="utf-8")
+    return subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _stop(process: Optional[subprocess.Popen]) -> None:
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def _wait_ready(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Process exited with code {process.returncode} before {url} was ready")
+            try:
+                response = await client.get(url)
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+# ============================================================================
+# LOAD GENERATION
+# ============================================================================
+
+async def _ask(client: httpx.AsyncClient, question: str, headers: Dict[str, str]) -> Dict[str, Any]:
+    """One /chat/stream request with client-side timings (ms)"""
+    result = {"question": question, "request_id": None, "ttfb_ms": None, "ttft_ms": None,
+              "total_ms": None, "cache_hit": None, "error": None}
+    started = time.perf_counter()
+    try:
+        async with client.stream("POST", "/chat/stream", json={"question": question}, headers=headers) as response:
+            result["request_id"] = response.headers.get("x-request-id")
+            if response.status_code != 200:
+                result["error"] = f"HTTP {response.status_code}"
+                return result
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                if result["ttfb_ms"] is None:
+                    result["ttfb_ms"] = elapsed
+
+                event = json.loads(line[6:])
+                if event.get("type") == "chunk" and result["ttft_ms"] is None:
+                    result["ttft_ms"] = elapsed
+                elif event.get("type") == "cache_hit":
+                    result["cache_hit"] = bool(event.get("value"))
+                elif event.get("type") == "error":
+                    result["error"] = event.get("message")
+    except httpx.HTTPError as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    result["total_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+async def replay(base_url: str, questions: List[str], concurrency: int, headers: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Send all questions with `concurrency` requests in flight"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+    results: List[Dict[str, Any]] = []
+
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def worker():
+            while True:
+                try:
+                    question = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                results.append(await _ask(client, question, headers))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def fetch_stage_timings(base_url: str, request_ids: List[str], headers: Dict[str, str]) -> Dict[str, List[float]]:
+    """Span durations (ms) per stage name across all traced requests"""
+    stages: Dict[str, List[float]] = {}
+    semaphore = asyncio.Semaphore(16)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        async def fetch(request_id: str):
+            async with semaphore:
+                response = await client.get(f"/debug/traces/{request_id}", headers=headers)
+            if response.status_code != 200:
+                return
+            for resource in response.json().get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    for span in scope.get("spans", []):
+                        duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+                        name = span["name"] if span.get("parentSpanId") else "request"
+                        stages.setdefault(name, []).append(duration)
+
+        await asyncio.gather(*(fetch(request_id) for request_id in request_ids if request_id))
+    return stages
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_report(results: List[Dict[str, Any]], stages: Dict[str, List[float]], wall_seconds: float,
+                 llm_calls: Dict[str, int], settings: Dict[str, Any]) -> Dict[str, Any]:
+    ok = [r for r in results if not r["error"]]
+    cache_flags = [r["cache_hit"] for r in ok if r["cache_hit"] is not None]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "settings": settings,
+        },
+        "summary": {
+            "requests": len(results),
+            "errors": len(results) - len(ok),
+            "wall_seconds": round(wall_seconds, 2),
+            "throughput_rps": round(len(ok) / wall_seconds, 2) if wall_seconds else 0.0,
+            "cache_hit_rate": round(sum(cache_flags) / len(cache_flags), 3) if cache_flags else 0.0,
+        },
+        "latency_ms": {
+            "total": summarize([r["total_ms"] for r in ok]),
+            "first_event": summarize([r["ttfb_ms"] for r in ok]),
+            "first_token": summarize([r["ttft_ms"] for r in ok]),
+            "total_cache_hit": summarize([r["total_ms"] for r in ok if r["cache_hit"]]),
+            "total_cache_miss": summarize([r["total_ms"] for r in ok if r["cache_hit"] is False]),
+        },
+        "stages_ms": {name: summarize(values) for name, values in sorted(stages.items())},
+        "llm_calls": llm_calls,
+        "errors": sorted({r["error"] for r in results if r["error"]})[:20],
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> str:
+    """Side-by-side p50/p95 of the current report against a baseline report"""
+    lines = [f"{'metric':32} {'baseline':>10} {'current':>10} {'change':>8}"]
+
+    def row(label: str, old: float, new: float, higher_is_better: bool = False):
+        change = ((new - old) / old * 100) if old else 0.0
+        flag = "" if abs(change) < 5 else ("✅" if (change > 0) == higher_is_better else "⚠️")
+        lines.append(f"{label:32} {old:>10} {new:>10} {change:>+7.1f}% {flag}")
+
+    row("throughput_rps", baseline["summary"]["throughput_rps"], report["summary"]["throughput_rps"], higher_is_better=True)
+    row("cache_hit_rate", baseline["summary"]["cache_hit_rate"], report["summary"]["cache_hit_rate"], higher_is_better=True)
+    for section, names in (("latency_ms", report["latency_ms"]), ("stages_ms", report["stages_ms"])):
+        for name in names:
+            old = baseline.get(section, {}).get(name, {})
+            new = report[section][name]
+            for q in ("p50", "p95"):
+                if q in old and q in new:
+                    row(f"{name}.{q}", old[q], new[q])
+    return "\n".join(lines)
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    from app.core.auth import create_jwt_token
+    from benchmarks.seed import seed_database
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="bench_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    database_url = args.database_url or f"sqlite:///{workdir / 'bench.db'}"
+    corpus_path = str(Path(args.corpus).resolve()) if args.corpus else str(CORPUS_PATH)
+
+    if args.embedding == "default":
+        _check_embedding_model()
+    if not args.skip_seed:
+        seed_database(database_url, rows=args.rows, seed=args.seed)
+
+    mock_port = args.mock_port or _free_port()
+    app_port = args.app_port or _free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_API_BASE": f"{mock_url}/v1",
+        "OPENAI_BASE_URL": f"{mock_url}/v1",
+        "DATABASE_URL": database_url,
+        "SESSION_DB_PATH": str(workdir / "chat_sessions.db"),
+        "CHROMA_PERSIST_DIR": str(workdir / "chroma_cache"),
+        "TRACING_ENABLED": "true",
+        "TRACE_EXPORT_PATH": str(workdir / "traces.jsonl"),
+    })
+    if args.workers > 1:
+        env["METRICS_MULTIPROC_DIR"] = str(workdir / "metrics")
+
+    mock = app = None
+    try:
+        mock = _start([
+            sys.executable, "-m", "benchmarks.mock_llm", "--port", str(mock_port),
+            "--corpus", corpus_path, "--latency", args.llm_latency,
+            "--token-delay", str(args.token_delay), "--answer-tokens", str(args.answer_tokens),
+        ], env, workdir / "mock_llm.log")
+        await _wait_ready(f"{mock_url}/stats", mock, timeout=30)
+
+        app = _start([
+            sys.executable, "-m", "uvicorn", APPS[args.embedding], "--host", "127.0.0.1",
+            "--port", str(app_port), "--workers", str(args.workers), "--log-level", "warning",
+        ], env, workdir / "app.log")
+        await _wait_ready(f"{app_url}/ping", app, timeout=args.startup_timeout)
+
+        headers = {"Authorization": f"Bearer {create_jwt_token(BENCH_USER)}"}
+        corpus = load_corpus(corpus_path)
+        rng = random.Random(args.seed)
+
+        if args.warmup:
+            await replay(app_url, [entry["question"] for entry in corpus[:args.warmup]], 1, headers)
+
+        questions = [rng.choice(corpus)["question"] for _ in range(args.requests)]
+        print(f"🚀 Replaying {len(questions)} questions at concurrency {args.concurrency}...")
+        started = time.perf_counter()
+        results = await replay(app_url, questions, args.concurrency, headers)
+        wall_seconds = time.perf_counter() - started
+
+        stages = await fetch_stage_timings(app_url, [r["request_id"] for r in results], headers)
+        async with httpx.AsyncClient(timeout=5) as client:
+            llm_calls = (await client.get(f"{mock_url}/stats")).json()
+    finally:
+        _stop(app)
+        _stop(mock)
+
+    report = build_report(results, stages, wall_seconds, llm_calls, {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "rows_per_table": args.rows,
+        "llm_latency": args.llm_latency or "default",
+        "token_delay": args.token_delay,
+        "embedding": args.embedding,
+        "database": database_url.split(":", 1)[0],
+    })
+
+    if not args.keep_workdir and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    else:
+        print(f"📁 Logs and state kept in {workdir}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark for /chat/stream")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--warmup", type=int, default=0, help="Corpus questions sent once before measuring")
+    parser.add_argument("--corpus", default=None)
+    parser.add_argument("--rows", type=int, default=500, help="Seeded rows per table")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None, help="Default: SQLite file in the work dir")
+    parser.add_argument("--skip-seed", action="store_true", help="Use --database-url as is")
+    parser.add_argument("--llm-latency", default="", help="Per-kind mock latency, e.g. route=0.3,generate=1.0")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--embedding", choices=sorted(APPS), default="default",
+                        help="Cache embedding: MiniLM (downloaded once) or model-free lexical")
+    parser.add_argument("--mock-port", type=int, default=None, help="Default: a free port")
+    parser.add_argument("--app-port", type=int, default=None, help="Default: a free port")
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--workdir", default=None, help="Directory for DB, cache, sessions, logs (kept)")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--compare", default=None, help="Baseline report to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+        print(f"✅ Report written to {args.output}")
+    else:
+        print(text)
+
+    summary = report["summary"]
+    print(f"📊 {summary['requests']} requests, {summary['errors']} errors, "
+          f"{summary['throughput_rps']} req/s, cache hit rate {summary['cache_hit_rate']:.0%}, "
+          f"p95 total {report['latency_ms']['total'].get('p95', 0)} ms")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print(compare(report, json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
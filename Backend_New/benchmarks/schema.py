@@ -0,0 +1,142 @@
+"""
+Benchmark Schema
+================
+Table definitions and categorical values parsed from the schema reports in
+Database_Schemas/<domain>/schema_report.md, turned into SQLAlchemy tables
+that work on both SQLite and PostgreSQL.
+"""
+
+import ast
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import (
+    JSON, BigInteger, Boolean, Column, Date, DateTime, Integer, Interval,
+    MetaData, Numeric, SmallInteger, String, Table, Text, Time, Uuid
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+SCHEMAS_DIR = Path(__file__).resolve().parent.parent.parent / "Database_Schemas"
+DOMAIN_DIRS = ["hr_operations", "sales_crm", "maintenance"]
+
+TABLE_PATTERN = re.compile(r"^## 📋 Table: `(\w+)`", re.M)
+COLUMN_PATTERN = re.compile(r"^\| \*\*(\w+)\*\* \| `([^`]+)` \| (True|False) \|", re.M)
+CATEGORICAL_PATTERN = re.compile(r"^- \*\*`(\w+)`\*\* \(\d+ values\): `(\[.*\])`$", re.M)
+TYPE_PATTERN = re.compile(r"^(\w+)(?:\((\d+)(?:,\s*(\d+))?\))?")
+
+
+def _parse_report(text: str) -> Dict[str, Dict[str, Any]]:
+    """Parse one schema_report.md into {table: {"columns": [...], "categorical": {...}}}"""
+    tables = {}
+    matches = list(TABLE_PATTERN.finditer(text))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        section = text[match.end():end]
+
+        columns = [
+            {"name": name, "type": type_str, "nullable": nullable == "True"}
+            for name, type_str, nullable in COLUMN_PATTERN.findall(section)
+        ]
+
+        categorical = {}
+        for name, values in CATEGORICAL_PATTERN.findall(section):
+            try:
+                categorical[name] = [v for v in ast.literal_eval(values) if v not in ("", None)]
+            except (ValueError, SyntaxError):
+                continue
+
+        tables[match.group(1)] = {"columns": columns, "categorical": categorical}
+    return tables
+
+
+def load_schema(domains: List[str] = None) -> Dict[str, Dict[str, Any]]:
+    """All tables across the domain reports (first report describing a table wins)"""
+    schema: Dict[str, Dict[str, Any]] = {}
+    for domain in domains or DOMAIN_DIRS:
+        report = SCHEMAS_DIR / domain / "schema_report.md"
+        if not report.exists():
+            print(f"[WARNING] Schema report not found: {report}")
+            continue
+        for name, table in _parse_report(report.read_text(encoding="utf-8")).items():
+            schema.setdefault(name, table)
+    return schema
+
+
+def benchmark_tables() -> List[str]:
+    """Tables the domains are allowed to query (all must exist for the app to start)"""
+    return list(dict.fromkeys(settings.ALLOWED_TABLES))
+
+
+def column_type(type_str: str):
+    """SQLAlchemy type for a report type such as VARCHAR(255) or NUMERIC(12, 2)"""
+    match = TYPE_PATTERN.match(type_str.upper())
+    base = match.group(1) if match else "TEXT"
+    length = int(match.group(2)) if match and match.group(2) else None
+    scale = int(match.group(3)) if match and match.group(3) else None
+
+    if base == "VARCHAR":
+        return String(length)
+    if base == "BIGINT":
+        return BigInteger()
+    if base == "INTEGER":
+        return Integer()
+    if base == "SMALLINT":
+        return SmallInteger()
+    if base == "BOOLEAN":
+        return Boolean()
+    if base == "DATE":
+        return Date()
+    if base == "TIMESTAMP":
+        return DateTime()
+    if base == "TIME":
+        return Time()
+    if base == "INTERVAL":
+        return Interval()
+    if base == "NUMERIC":
+        return Numeric(length, scale) if length else Numeric()
+    if base == "JSONB":
+        return JSON().with_variant(JSONB(), "postgresql")
+    if base == "UUID":
+        return Uuid(as_uuid=False)
+    return Text()  # TEXT, ARRAY and anything unknown
+
+
+def primary_key(table: Dict[str, Any]) -> Optional[str]:
+    """First non-nullable id/task_id column"""
+    for column in table["columns"]:
+        if column["name"] in ("id", "task_id") and not column["nullable"]:
+            return column["name"]
+    return None
+
+
+def build_metadata(schema: Dict[str, Dict[str, Any]], tables: List[str]) -> MetaData:
+    metadata = MetaData()
+    for name in tables:
+        if name not in schema:
+            print(f"[WARNING] No schema for table '{name}', skipping")
+            continue
+        pk = primary_key(schema[name])
+        Table(name, metadata, *[
+            Column(
+                column["name"],
+                column_type(column["type"]),
+                primary_key=column["name"] == pk,
+                autoincrement=False,
+                nullable=column["nullable"]
+            )
+            for column in schema[name]["columns"]
+        ])
+    return metadata
+
+
+def create_tables(engine: Engine, schema: Dict[str, Dict[str, Any]], tables: List[str], drop: bool = True) -> MetaData:
+    """(Re)create the benchmark tables"""
+    metadata = build_metadata(schema, tables)
+    if drop:
+        metadata.drop_all(engine)
+    metadata.create_all(engine)
+    return metadata
@@ -0,0 +1,276 @@
+"""
+SQL Generation Mode Evaluation
+==============================
+Side-by-side comparison of the HR generator's two prompt modes on a fixed
+question set (benchmarks/sql_questions.json):
+
+- fast: the SQL-only prompt, answered with the tool call alone (output
+  capped at SQL_FAST_MAX_TOKENS)
+- reasoning: the prompt with the mandatory intent analysis, which the
+  pipeline now keeps for retries after a validator rejection
+
+Every question is sent in both modes, interleaved, through the same code the
+pipeline uses (prompts.generator_system_prompt and workflow.bind_generator)
+on the same model. Per mode the report shows latency, input/output tokens,
+calls without SQL and accuracy: the generated SQL passes the security check
+and returns the same rows as the question's reference SQL (column order and
+extra columns don't matter, row counts do).
+
+Run it against a seeded database. The reference SQL is portable; generated
+SQL may use PostgreSQL-only functions, so use PostgreSQL (benchmarks.datagen)
+for accuracy numbers you can trust. Against benchmarks.mock_llm the harness
+runs end to end, but the mock answers every mode with the same scripted SQL.
+
+Usage (from Backend_New):
+    python -m benchmarks.seed --database-url sqlite:///bench.db
+    python -m benchmarks.sql_mode_eval --database-url sqlite:///bench.db --repeats 3 --output sql_modes.json
+    python -m benchmarks.sql_mode_eval --database-url postgresql://... --model gpt-4o-mini
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.run import _git_commit, summarize
+
+QUESTIONS_PATH = Path(__file__).resolve().with_name("sql_questions.json")
+MODES = ["fast", "reasoning"]
+
+
+def load_questions(path: str = None) -> List[Dict[str, Any]]:
+    """Fixed question set: [{"question", "sql"}, ...] (HR domain)"""
+    with open(path or QUESTIONS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ============================================================================
+# RESULT COMPARISON
+# ============================================================================
+
+def _value(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return round(float(value), 2)
+    return str(value).strip().lower()
+
+
+def fetch_rows(engine, sql: str) -> List[Counter]:
+    """Rows as multisets of normalized values (column names and order ignored)"""
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        try:
+            return [Counter(_value(v) for v in row) for row in conn.execute(text(sql))]
+        finally:
+            conn.rollback()
+
+
+def rows_match(generated: List[Counter], reference: List[Counter]) -> bool:
+    """Same number of rows, and every reference row is contained in its own generated row"""
+    if len(generated) != len(reference):
+        return False
+    unmatched = list(generated)
+    for row in reference:
+        hit = next((i for i, candidate in enumerate(unmatched) if not row - candidate), None)
+        if hit is None:
+            return False
+        unmatched.pop(hit)
+    return True
+
+
+# ============================================================================
+# GENERATION
+# ============================================================================
+
+def generate(workflow, prompts, llm, mode: str, question: str, schema: str) -> Dict[str, Any]:
+    """One generator call as the pipeline makes it, with timing and token counts"""
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    messages = [
+        SystemMessage(content=prompts.generator_system_prompt(
+            mode, schema=schema, current_date=datetime.now().strftime("%Y-%m-%d")
+        )),
+        HumanMessage(content=question)
+    ]
+    started = time.perf_counter()
+    response = workflow.bind_generator(llm, mode).invoke(messages)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    usage = getattr(response, "usage_metadata", None) or {}
+    sql = response.tool_calls[0]["args"].get("query") if response.tool_calls else None
+    return {
+        "latency_ms": round(elapsed_ms, 1),
+        "input_tokens": usage.get("input_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+        "text_chars": len(response.content or ""),  # Anything written outside the tool call
+        "sql": sql,
+    }
+
+
+def score(engine, result: Dict[str, Any], reference: List[Counter]) -> None:
+    """Execute the generated SQL and compare its rows with the reference"""
+    from app.core.security import validate_sql_security
+
+    if not result["sql"]:
+        result["correct"], result["error"] = False, "no SQL"
+        return
+    is_valid, error, sanitized = validate_sql_security(result["sql"])
+    if not is_valid:
+        result["correct"], result["error"] = False, f"security: {error}"
+        return
+    try:
+        result["correct"] = rows_match(fetch_rows(engine, sanitized), reference)
+    except Exception as e:
+        result["correct"], result["error"] = False, f"{type(e).__name__}: {str(e).splitlines()[0][:200]}"
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def _mode_summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    correct = sum(1 for r in results if r.get("correct"))
+    return {
+        "calls": len(results),
+        "accuracy": round(correct / len(results), 3) if results else 0.0,
+        "no_sql": sum(1 for r in results if not r["sql"]),
+        "errors": sum(1 for r in results if r.get("error") and r["sql"]),
+        "latency_ms": summarize([r["latency_ms"] for r in results]),
+        "input_tokens": summarize([r["input_tokens"] for r in results]),
+        "output_tokens": summarize([r["output_tokens"] for r in results]),
+        "text_chars": summarize([r["text_chars"] for r in results]),
+    }
+
+
+def build_report(results: List[Dict[str, Any]], modes: List[str], meta: Dict[str, Any]) -> Dict[str, Any]:
+    by_question: Dict[str, Dict[str, Any]] = {}
+    for r in results:
+        entry = by_question.setdefault(r["question"], {})
+        entry.setdefault(r["mode"], []).append(r)
+    per_question = [
+        {"question": q, **{mode: {"correct": sum(1 for r in runs.get(mode, []) if r.get("correct")),
+                                  "runs": len(runs.get(mode, [])),
+                                  "output_tokens": summarize([r["output_tokens"] for r in runs.get(mode, [])]).get("p50"),
+                                  "sql": (runs.get(mode) or [{}])[0].get("sql")}
+                           for mode in modes}}
+        for q, runs in by_question.items()
+    ]
+    return {
+        "meta": meta,
+        "modes": {mode: _mode_summary([r for r in results if r["mode"] == mode]) for mode in modes},
+        "questions": per_question,
+        "results": results,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    modes = report["modes"]
+    rows = [
+        ("accuracy", lambda m: f"{m['accuracy']:.1%}"),
+        ("latency p50 ms", lambda m: m["latency_ms"].get("p50")),
+        ("latency p95 ms", lambda m: m["latency_ms"].get("p95")),
+        ("output tokens p50", lambda m: m["output_tokens"].get("p50")),
+        ("output tokens mean", lambda m: m["output_tokens"].get("mean")),
+        ("input tokens mean", lambda m: m["input_tokens"].get("mean")),
+        ("text chars mean", lambda m: m["text_chars"].get("mean")),
+        ("calls without SQL", lambda m: m["no_sql"]),
+        ("SQL errors", lambda m: m["errors"]),
+    ]
+    lines = [f"{'':20}" + "".join(f"{mode:>14}" for mode in modes)]
+    for label, cell in rows:
+        lines.append(f"{label:20}" + "".join(f"{str(cell(modes[mode])):>14}" for mode in modes))
+
+    if len(modes) == 2:
+        a, b = (modes[m] for m in modes)
+        if a["latency_ms"].get("p50") and b["latency_ms"].get("p50"):
+            lines.append(f"\n{list(modes)[0]} vs {list(modes)[1]}: p50 latency x{a['latency_ms']['p50'] / b['latency_ms']['p50']:.2f}, "
+                         f"accuracy {100 * (a['accuracy'] - b['accuracy']):+.1f} pts")
+
+    disagreements = [q for q in report["questions"] if len({q[m]["correct"] for m in modes}) > 1]
+    if disagreements:
+        lines.append("\nQuestions where the modes differ (correct runs per mode):")
+        lines += [f"  {' / '.join(str(q[m]['correct']) for m in modes)}  {q['question']}" for q in disagreements]
+    return "\n".join(lines)
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def run_evaluation(args) -> Dict[str, Any]:
+    from app.core.config import settings
+    from app.core.database import get_engine
+    from app.core.security import validate_sql_security
+    from app.domains.hr_operations import config, prompts, workflow
+    from app.services.llm_gateway import llm_gateway
+
+    questions = load_questions(args.questions)
+    if args.limit:
+        questions = questions[:args.limit]
+    model = args.model or settings.LLM_MODEL
+    llm = llm_gateway.chat(model, temperature=settings.LLM_TEMPERATURE)
+    engine = get_engine()
+    # References pass the same security gate (it appends LIMIT MAX_RESULT_ROWS)
+    references = {q["question"]: fetch_rows(engine, validate_sql_security(q["sql"])[2]) for q in questions}
+
+    results = []
+    for repeat in range(args.repeats):
+        for index, item in enumerate(questions, 1):
+            # Alternate which mode goes first so neither always gets a warm connection
+            for mode in (args.modes if (index + repeat) % 2 else args.modes[::-1]):
+                result = {"question": item["question"], "mode": mode, "repeat": repeat}
+                try:
+                    result.update(generate(workflow, prompts, llm, mode, item["question"], config.SEMANTIC_SCHEMA))
+                except Exception as e:
+                    result.update({"latency_ms": None, "input_tokens": None, "output_tokens": None,
+                                   "text_chars": 0, "sql": None})
+                    print(f"[WARNING] {mode} call failed for '{item['question']}': {e}")
+                score(engine, result, references[item["question"]])
+                results.append(result)
+            print(f"  [{repeat + 1}/{args.repeats}] {index}/{len(questions)} {item['question']}")
+
+    meta = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {"model": model, "questions": len(questions), "repeats": args.repeats,
+                     "fast_max_tokens": settings.SQL_FAST_MAX_TOKENS, "database": engine.dialect.name},
+    }
+    return build_report(results, args.modes, meta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast (SQL-only) vs reasoning SQL generation: latency, tokens, accuracy")
+    parser.add_argument("--database-url", required=True, help="Seeded database the SQL is executed against")
+    parser.add_argument("--questions", default=None, help="Question set JSON (default: benchmarks/sql_questions.json)")
+    parser.add_argument("--model", default=None, help="Generator model (default: MODEL_NAME)")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated subset of fast,reasoning")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the question set")
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N questions")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+    args.modes = [m for m in args.modes.split(",") if m in MODES]
+
+    # The app reads these at import: point it at the benchmark DB, keep state in memory
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["STATE_BACKEND"] = "memory"
+    os.environ["CACHE_VECTOR_BACKEND"] = "numpy"
+    os.environ.setdefault("VECTOR_STORE_PATH", tempfile.mkdtemp(prefix="sql_mode_eval_"))
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    report = run_evaluation(args)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+        print(f"✅ Report written to {args.output}")
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
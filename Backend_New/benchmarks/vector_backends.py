@@ -0,0 +1,289 @@
+"""
+Vector Backend Benchmark
+========================
+Compares the query-cache vector stores (app/services/vector_store.py) at
+cache sizes of 1k/10k/100k entries:
+
+- startup: importing the backend, opening the persisted store and answering
+  the first lookup, in a fresh process (what a restarted worker pays)
+- lookup latency: p50/p95/p99 of the cache's filtered nearest-neighbour query
+  (domain + shape filter, n_results=3), half near-duplicates of stored
+  entries, half unrelated questions
+- memory: resident set size added by the backend after opening and querying,
+  and how much of it is private (file-backed pages are shared between workers)
+- build: time to insert the entries (batched) and the size on disk
+
+Entries are synthetic: random unit vectors with the MiniLM dimension and
+cache-shaped metadata spread over the three domains, so no embedding model
+is needed and every backend sees identical data. Each measurement runs in
+its own process.
+
+Usage (from Backend_New):
+    python -m benchmarks.vector_backends --output vector_bench.json
+    python -m benchmarks.vector_backends --sizes 1000,10000 --backends numpy,numpy-int8
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.run import BACKEND_DIR, _git_commit, summarize
+
+BACKENDS = ["chroma", "numpy", "numpy-int8"]
+DIMENSION = 384
+DOMAINS = ["checklist", "lead_to_order", "sagar_db"]
+SLOT_TYPES = ["", "person", "department", "person,date_range", "division"]
+STATUSES = ["", "pending", "completed"]
+BATCH = 4000  # Below Chroma's maximum batch size
+
+
+def _rss_mb() -> Dict[str, float]:
+    """
+    Resident set size, split into private (anonymous) and file-backed pages
+    where /proc is available - memory-mapped vectors are file-backed, shared
+    by every worker mapping the same file and reclaimable by the OS.
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) / 1024 for line in f if line.startswith(("VmRSS", "RssAnon", "RssFile"))}
+        return {"total": fields["VmRSS"], "anon": fields.get("RssAnon", 0.0), "file": fields.get("RssFile", 0.0)}
+    except (OSError, KeyError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        return {"total": peak, "anon": 0.0, "file": 0.0}
+
+
+def _dir_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / (1024 * 1024)
+
+
+# ============================================================================
+# SYNTHETIC ENTRIES
+# ============================================================================
+
+def _metadata(index: int) -> Dict[str, Any]:
+    """Cache-shaped metadata; the first half of each domain is parameterised"""
+    return {
+        "database": DOMAINS[index % len(DOMAINS)],
+        "slot_types": SLOT_TYPES[index % len(SLOT_TYPES)],
+        "date_kind": "",
+        "status": STATUSES[index % len(STATUSES)],
+        "count": "true" if index % 4 == 0 else "false",
+        "parameterised": "true" if index % 2 == 0 else "false",
+        "slot_values": "{}" if index % 2 == 0 else json.dumps({"person": [f"person {index}"]}),
+        "sql": f"SELECT * FROM t WHERE id = {index}",
+        "question": f"synthetic question {index}",
+        "hit_count": 0,
+        "cached_ts": 0.0,
+    }
+
+
+def _filter(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """The where clause QueryCacheService._compatible_filter builds for such an entry"""
+    return {"$and": [
+        {"database": metadata["database"]},
+        {"slot_types": metadata["slot_types"]},
+        {"date_kind": metadata["date_kind"]},
+        {"status": metadata["status"]},
+        {"count": metadata["count"]},
+        {"$or": [{"parameterised": "true"}, {"slot_values": metadata["slot_values"]}]},
+    ]}
+
+
+def _vectors(np, seed: int, count: int):
+    vectors = np.random.default_rng(seed).normal(size=(count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _queries(np, size: int, count: int, seed: int):
+    """(embedding, where) pairs: near-duplicates of stored entries and unrelated vectors"""
+    rng = np.random.default_rng(seed + 1)
+    stored = _vectors(np, seed, size)
+    noise = _vectors(np, seed + 2, count)
+    queries = []
+    for i in range(count):
+        index = int(rng.integers(size))
+        if i % 2 == 0:
+            vector = stored[index] + 0.05 * noise[i]
+            vector /= np.linalg.norm(vector)
+        else:
+            vector = noise[i]
+        queries.append((vector, _filter(_metadata(index))))
+    return queries
+
+
+# ============================================================================
+# CHILD PROCESSES
+# ============================================================================
+
+def _open_store(backend: str, path: Path):
+    if backend == "chroma":
+        import chromadb
+        from app.services.vector_store import ChromaVectorStore
+        return ChromaVectorStore(chromadb.PersistentClient(path=str(path)), "bench")
+    from app.services.vector_store import NumpyVectorStore
+    return NumpyVectorStore(str(path), "bench", quantize=backend == "numpy-int8")
+
+
+def child_build(backend: str, size: int, path: Path, seed: int) -> Dict[str, Any]:
+    import numpy as np
+
+    vectors = _vectors(np, seed, size)
+    store = _open_store(backend, path)
+    started = time.perf_counter()
+    for start in range(0, size, BATCH):
+        end = min(start + BATCH, size)
+        store.add(
+            ids=[f"entry-{i}" for i in range(start, end)],
+            documents=[f"synthetic question {i}" for i in range(start, end)],
+            embeddings=vectors[start:end].tolist() if backend == "chroma" else vectors[start:end],
+            metadatas=[_metadata(i) for i in range(start, end)],
+        )
+    build_seconds = time.perf_counter() - started
+    return {"build_seconds": round(build_seconds, 2), "entries": store.count(), "disk_mb": round(_dir_mb(path), 1)}
+
+
+def child_measure(backend: str, size: int, path: Path, seed: int, queries: int) -> Dict[str, Any]:
+    import numpy as np
+
+    import app.core.config  # noqa: F401 - loaded by every worker anyway, not part of either backend
+
+    workload = _queries(np, size, queries, seed)
+    rss_before = _rss_mb()
+
+    started = time.perf_counter()
+    if backend == "chroma":
+        import chromadb  # noqa: F401 - the import is part of what a worker pays
+    else:
+        import app.services.vector_store  # noqa: F401
+    imported = time.perf_counter()
+    store = _open_store(backend, path)
+    opened = time.perf_counter()
+    store.query(workload[0][0], 3, workload[0][1])
+    first_lookup = time.perf_counter()
+
+    latencies, hits = [], 0
+    for vector, where in workload:
+        lookup_started = time.perf_counter()
+        rows = store.query(vector, 3, where)
+        latencies.append((time.perf_counter() - lookup_started) * 1_000_000)
+        hits += bool(rows) and 1 / (1 + rows[0][3]) >= 0.92
+    rss_after = _rss_mb()
+
+    return {
+        "startup_ms": {
+            "import": round((imported - started) * 1000, 1),
+            "open": round((opened - imported) * 1000, 1),
+            "first_lookup": round((first_lookup - opened) * 1000, 1),
+            "total": round((first_lookup - started) * 1000, 1),
+        },
+        "lookup_us": summarize(latencies),
+        "above_threshold": round(hits / len(workload), 3),
+        "rss_mb": {
+            "added": round(rss_after["total"] - rss_before["total"], 1),
+            "added_anon": round(rss_after["anon"] - rss_before["anon"], 1),
+            "added_file": round(rss_after["file"] - rss_before["file"], 1),
+            "total": round(rss_after["total"], 1),
+        },
+    }
+
+
+def _run_child(mode: str, backend: str, size: int, path: Path, args) -> Dict[str, Any]:
+    command = [sys.executable, "-m", "benchmarks.vector_backends", "--child", mode, "--backends", backend,
+               "--sizes", str(size), "--path", str(path), "--seed", str(args.seed), "--queries", str(args.queries)]
+    env = {**os.environ, "ANONYMIZED_TELEMETRY": "False"}
+    completed = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{mode} {backend}/{size} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def run_benchmark(args) -> Dict[str, Any]:
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="vector_bench_"))
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for size in args.sizes:
+            for backend in args.backends:
+                path = workdir / f"{backend}-{size}"
+                shutil.rmtree(path, ignore_errors=True)
+                print(f"⏱️ {backend} @ {size:,} entries...")
+                build = _run_child("build", backend, size, path, args)
+                measured = [_run_child("measure", backend, size, path, args) for _ in range(args.repeats)]
+                # Startup is noisy (page cache, imports): keep the fastest run's startup
+                best = min(measured, key=lambda m: m["startup_ms"]["total"])
+                results.setdefault(str(size), {})[backend] = {**build, **best}
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "settings": {"dimension": DIMENSION, "queries": args.queries, "repeats": args.repeats, "seed": args.seed},
+        },
+        "results": results,
+    }
+
+
+def format_table(report: Dict[str, Any]) -> str:
+    lines = [f"{'entries':>8} {'backend':11} {'startup ms':>10} {'p50 us':>8} {'p95 us':>8} "
+             f"{'p99 us':>8} {'RSS +MB':>8} {'(anon)':>8} {'disk MB':>8} {'build s':>8}"]
+    for size, backends in report["results"].items():
+        for backend, r in backends.items():
+            lines.append(
+                f"{int(size):>8,} {backend:11} {r['startup_ms']['total']:>10} {r['lookup_us']['p50']:>8} "
+                f"{r['lookup_us']['p95']:>8} {r['lookup_us']['p99']:>8} {r['rss_mb']['added']:>8} {r['rss_mb']['added_anon']:>8} "
+                f"{r['disk_mb']:>8} {r['build_seconds']:>8}"
+            )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query-cache vector backend benchmark")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated entry counts")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help=f"Comma-separated subset of {BACKENDS}")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=2, help="Measurement processes per backend and size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=None, help="Keep the built stores here")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--child", choices=["build", "measure"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+    args.backends = [backend for backend in args.backends.split(",") if backend]
+
+    if args.child:
+        backend, size, path = args.backends[0], args.sizes[0], Path(args.path)
+        if args.child == "build":
+            result = child_build(backend, size, path, args.seed)
+        else:
+            result = child_measure(backend, size, path, args.seed, args.queries)
+        print(json.dumps(result))
+        return
+
+    unknown = set(args.backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"Unknown backends: {', '.join(sorted(unknown))}")
+
+    report = run_benchmark(args)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"✅ Report written to {args.output}")
+    print(format_table(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -16,8 +16,13 @@ from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 import uvicorn
 
-from app.api.routes import chat, health, sessions, auth
+from app.api.routes import chat, health, sessions, auth, debug
 from app.core.config import settings
+from app.core.database import dispose_engine
+from app.services.metrics import metrics
+from app.services.cache_service import query_cache
+from app.services.embedding_service import embedding_service
+from app.services.llm_gateway import llm_gateway
 
 # Create FastAPI app
 app = FastAPI(
@@ -50,6 +55,7 @@ app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 app.include_router(sessions.router, prefix="/chat/sessions", tags=["sessions"])
 app.include_router(health.router, tags=["health"])
+app.include_router(debug.router, prefix="/debug", tags=["debug"])
 
 # Serve Frontend
 frontend_path = Path(__file__).parent.parent / "Frontend"
@@ -60,6 +66,21 @@ if frontend_path.exists():
     async def serve_frontend():
         return FileResponse(str(frontend_path / "index.html"))
 
+@app.on_event("startup")
+async def startup():
+    """Start metrics sharing and cache compaction; load the embedding model before serving"""
+    metrics.start_flusher()
+    query_cache.start_compactor()
+    await embedding_service.awarm_up()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Release pooled database and LLM connections and write final metrics and cache hits"""
+    dispose_engine()
+    await llm_gateway.aclose()
+    metrics.flush()
+    query_cache.flush()
+
 @app.get("/")
 async def root():
     return {
@@ -0,0 +1,52 @@
+"""
+Regression check for admission control: a freed slot must admit the next
+waiting request right away, not when its queue timeout runs out.
+
+Run: python test_admission.py   (or: python -m pytest test_admission.py)
+"""
+import asyncio
+import time
+
+from app.services.admission import AdmissionController, AdmissionTimeout
+
+
+async def _freed_slot_admits_next_waiter(queue_timeout: float = 5.0) -> float:
+    """Seconds between freeing the only slot and the queued request being admitted"""
+    admission = AdmissionController(max_in_flight=1, max_per_user=5, max_queue=5,
+                                    queue_timeout_seconds=queue_timeout, enabled=True)
+    running = admission.enqueue("a")
+    waiting = admission.enqueue("b")
+    assert running.admitted and not waiting.admitted
+
+    admitted_at = None
+
+    async def wait():
+        nonlocal admitted_at
+        async for _ in admission.wait(waiting):
+            pass
+        admitted_at = time.perf_counter()
+
+    task = asyncio.create_task(wait())
+    await asyncio.sleep(0.1)
+    freed_at = time.perf_counter()
+    admission.release(running)
+    try:
+        await asyncio.wait_for(task, timeout=queue_timeout + 1)
+    except AdmissionTimeout:
+        raise AssertionError("queued request timed out although a slot was freed")
+    return admitted_at - freed_at
+
+
+def test_freed_slot_admits_next_waiter():
+    delay = asyncio.run(_freed_slot_admits_next_waiter())
+    assert delay < 0.5, f"queued request admitted {delay:.2f}s after the slot was freed"
+
+
+def main():
+    delay = asyncio.run(_freed_slot_admits_next_waiter())
+    status = "PASS" if delay < 0.5 else "FAIL"
+    print(f"{status}: queued request admitted {delay * 1000:.1f} ms after the slot was freed")
+
+
+if __name__ == "__main__":
+    main()